@@ -14,12 +14,12 @@ from tkinter import ttk, filedialog, messagebox, simpledialog
 import os
 import shutil
 import json
-import subprocess
 import threading
-from datetime import date
 import logging
 from logging.handlers import RotatingFileHandler
 
+from pipeline import PipelineCancelled, run_session
+
 # --- Constants ---
 CONFIG_FILE = "config.json"
 LOG_FILE = "transcriber.log"
@@ -56,10 +56,6 @@ def save_config(config):
     with open(CONFIG_FILE, 'w') as f:
         json.dump(config, f, indent=4)
 
-# --- Script Runner ---
-def run_script(script_path):
-    subprocess.run(["python", script_path], check=True)
-
 # --- Player Mapping Window ---
 class PlayerMappingWindow:
     def __init__(self, parent, config):
@@ -277,7 +273,7 @@ class TranscriptionApp:
     def __init__(self, root):
         self.root = root
         self.root.title("D&D Session Transcriber")
-        self.root.geometry("600x300")
+        self.root.geometry("600x380")
         self.root.configure(bg="#1e1e1e")
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(0, weight=1)
@@ -293,6 +289,8 @@ class TranscriptionApp:
 
         self.zip_path = tk.StringVar()
         self.status = tk.StringVar()
+        self.cancel_event = threading.Event()
+        self.last_metrics = None
 
         self.create_widgets()
 
@@ -313,92 +311,78 @@ class TranscriptionApp:
         ttk.Button(frame, text="Run All (Full Pipeline)", command=lambda: threading.Thread(target=self.run_all).start()).grid(row=4, column=0, columnspan=3, pady=5)
 
 
-        ttk.Label(frame, textvariable=self.status, foreground="#80ff80").grid(row=5, column=0, columnspan=3, pady=5)
-        ttk.Button(frame, text="Settings ⚙️", command=self.open_settings).grid(row=6, column=0, columnspan=3, pady=10)
+        ttk.Button(frame, text="Cancel", command=self.cancel_run).grid(row=5, column=0, columnspan=3, pady=5)
+
+        ttk.Label(frame, textvariable=self.status, foreground="#80ff80").grid(row=6, column=0, columnspan=3, pady=5)
+        ttk.Button(frame, text="Performance Report 📊", command=self.show_metrics).grid(row=7, column=0, columnspan=3, pady=5)
+        ttk.Button(frame, text="Settings ⚙️", command=self.open_settings).grid(row=8, column=0, columnspan=3, pady=10)
 
     def browse_file(self):
         path = filedialog.askopenfilename(filetypes=[("Zip Files", "*.zip")])
         if path:
             self.zip_path.set(path)
 
-    def run_all(self):
-        threading.Thread(target=self.process).start()
+    def cancel_run(self):
+        # The running pipeline checks this between chunks and stops at a safe point.
+        self.cancel_event.set()
+        self.status.set("⏹️ Cancelling...")
 
-    def run_transcription(self):
+    def run_pipeline(self, steps, label):
+        self.cancel_event = cancel = threading.Event()
         try:
-            zip_file = self.zip_path.get()
-            if not zip_file.endswith(".zip"):
-                raise ValueError("Select a valid Craig .zip file")
-
-            self.status.set("🔁 Running transcription...")
-
-            today_str = date.today().isoformat()
-            transcript_path = os.path.join(self.config['local_transcript_dir'], f"{today_str} - transcript.txt")
-
-            os.makedirs(self.config['local_transcript_dir'], exist_ok=True)
-
-            os.environ['CRAIG_ZIP'] = zip_file
-            os.environ['TRANSCRIPT_OUTPUT'] = transcript_path
-            os.environ['WHISPER_MODEL'] = self.config['whisper_model']
-            os.environ['OPENAI_API_KEY'] = self.config['openai_api_key']
-            os.environ['OPENAI_MODEL'] = self.config['openai_model']
-
-            run_script("transcribe_audacity_zip.py")
-
-            self.status.set("✅ Transcription complete.")
+            zip_file = self.zip_path.get() or None
+            if zip_file is not None and not zip_file.endswith(".zip"):
+                if "transcribe" in steps:
+                    raise ValueError("Select a valid Craig .zip file")
+                zip_file = None
+
+            # Stages hand segments to each other in-process; files are named after the zip's
+            # recording date, so later steps find the files of the selected session (the newest
+            # one, when a day has several).
+            result = run_session(
+                self.config,
+                zip_file,
+                steps=steps,
+                model_name=self.config['whisper_model'],
+                use_service=self.config.get("use_transcription_service", False),
+                on_progress=self.status.set,
+                cancel=cancel,
+            )
+            log.info(f"{label} timings: {result['timings']}")
+            self.last_metrics = result["metrics"]
+            self.status.set(f"✅ {label} complete.")
+        except PipelineCancelled:
+            log.info(f"{label} cancelled")
+            self.status.set(f"⏹️ {label} cancelled.")
         except Exception as e:
-            log.exception("Transcription error")
+            log.exception(f"{label} error")
             messagebox.showerror("Error", str(e))
-            self.status.set("❌ Transcription failed")
-            
-    def run_preprocess(self):
-        try:
-            self.status.set("🧼 Cleaning transcript...")
-            today = date.today().isoformat()
-            input_path = os.path.join(self.config['local_transcript_dir'], f"{today} - transcript.txt")
-            output_path = os.path.join(self.config['local_transcript_dir'], f"{today} - cleaned_transcript.txt")
+            self.status.set(f"❌ {label} failed")
+
+    def show_metrics(self):
+        if self.last_metrics is None:
+            messagebox.showinfo("Performance Report", "Run a step first to see its figures.")
+            return
+        top = tk.Toplevel(self.root)
+        top.title("Performance Report")
+        top.configure(bg="#1e1e1e")
+        text = tk.Text(top, width=100, height=24, bg="#2e2e2e", fg="#ffffff", wrap="none")
+        text.insert("1.0", self.last_metrics.report())
+        text.configure(state="disabled")
+        text.grid(padx=10, pady=10, sticky="nsew")
 
-            os.environ['INPUT_TRANSCRIPT'] = input_path
-            os.environ['OUTPUT_CLEANED'] = output_path
-
-            run_script("preprocess_transcript.py")
+    def run_transcription(self):
+        self.run_pipeline(("transcribe",), "Transcription")
 
-            self.status.set("✅ Transcript cleaned.")
-        except Exception as e:
-            log.exception("Preprocessing error")
-            messagebox.showerror("Error", str(e))
-            self.status.set("❌ Preprocessing failed")
+    def run_preprocess(self):
+        self.run_pipeline(("preprocess",), "Preprocessing")
 
     def run_summarize(self):
-        try:
-            self.status.set("🧠 Summarizing cleaned transcript...")
-            today = date.today().isoformat()
-            input_path = os.path.join(self.config['local_transcript_dir'], f"{today} - cleaned_transcript.txt")
-            output_path = os.path.join(self.config['local_summary_dir'], f"{today} - summary.txt")
-
-            os.environ['CLEANED_TRANSCRIPT'] = input_path
-            os.environ['SUMMARY_OUTPUT'] = output_path
-            os.environ['OPENAI_API_KEY'] = self.config['openai_api_key']
-            os.environ['OPENAI_MODEL'] = self.config['openai_model']
-
-            run_script("dnd_transcript_summarizer.py")
-
-            self.status.set("✅ Summary complete.")
-        except Exception as e:
-            log.exception("Summarization error")
-            messagebox.showerror("Error", str(e))
-            self.status.set("❌ Summarization failed")
+        self.run_pipeline(("summarize",), "Summarization")
 
-            
     def run_all(self):
-        try:
-            self.run_transcription()
-            self.run_preprocess()
-            self.run_summarize()
-        except Exception as e:
-            log.exception("Pipeline error")
-            messagebox.showerror("Error", str(e))
-            self.status.set("❌ Full pipeline failed")
+        # One streaming pipeline: cleaning runs as segments arrive, summarizing as soon as the last track is done.
+        self.run_pipeline(("transcribe", "preprocess", "summarize"), "Full pipeline")
 
 
     def open_settings(self):
@@ -410,7 +394,10 @@ class TranscriptionApp:
         setup_logging(verbose=self.config.get("verbose_logging", False))
 
 # --- Run GUI ---
-if __name__ == "__main__":
+def main(argv=None):
     root = tk.Tk()
-    app = TranscriptionApp(root)
+    TranscriptionApp(root)
     root.mainloop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Batch Runner - The Dungeon Scribe
+
+Works through a backlog of Craig sessions without the GUI. Zips are given on the command
+line (files or folders) or picked up from watched folders, and go into a persistent SQLite
+job queue:
+
+- Jobs are keyed on the SHA-256 of the zip, so the same recording is only processed once,
+  however many copies or names it has.
+- Each job is named after the session's recording date (see session_files.session_from_zip);
+  a second recording from the same day, queued or already in the output folders, gets " (2)"
+  appended instead of overwriting the first (session_files.unique_session).
+- Up to --jobs sessions run at once, each as its own `python -m dungeonscribe run` process
+  with its share of the CPU cores, so one session's summarization (waiting on the API)
+  overlaps another's transcription and a crash in one job never takes down the runner.
+- The queue lives on disk: jobs left running by a killed runner are queued again on the
+  next start, and failed jobs are retried up to --max-attempts times.
+
+Usage:
+    python batch_runner.py <zip or folder> ... [--jobs 2] [--steps transcribe,preprocess,summarize]
+    python batch_runner.py --watch <folder> [--interval 60]
+    python batch_runner.py --status
+    python batch_runner.py --retry-failed
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from session_files import session_from_zip, unique_session
+
+CONFIG_FILE = "config.json"
+DEFAULT_DB_PATH = str(Path.home() / ".dungeonscribe" / "batch" / "jobs.sqlite3")
+DEFAULT_JOBS = 2
+DEFAULT_MAX_ATTEMPTS = 2
+DEFAULT_INTERVAL = 60      # seconds between scans of a watched folder
+SETTLE_SECONDS = 30        # a zip untouched this long is assumed to be fully downloaded
+POLL_SECONDS = 1.0
+HASH_CHUNK = 1024 * 1024
+STEPS = "transcribe,preprocess,summarize"
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# === Job Queue ===
+class JobQueue:
+    """Jobs and the hashes of files already seen, in one SQLite file."""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                hash TEXT UNIQUE,
+                zip TEXT,
+                session TEXT UNIQUE,
+                status TEXT,
+                attempts INTEGER DEFAULT 0,
+                error TEXT,
+                created REAL,
+                started REAL,
+                finished REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime REAL,
+                hash TEXT
+            );
+        """)
+        self.db.commit()
+
+    def recover(self) -> int:
+        """Queue again the jobs a previous runner left running when it died."""
+        count = self.db.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'").rowcount
+        self.db.commit()
+        return count
+
+    def content_hash(self, path: Path) -> str:
+        """The zip's SHA-256, remembered per (path, size, mtime) so rescans do not re-read it."""
+        stat = path.stat()
+        row = self.db.execute("SELECT size, mtime, hash FROM files WHERE path = ?", (str(path),)).fetchone()
+        if row and row["size"] == stat.st_size and row["mtime"] == stat.st_mtime:
+            return row["hash"]
+        content_hash = file_sha256(path)
+        self.db.execute("INSERT OR REPLACE INTO files (path, size, mtime, hash) VALUES (?, ?, ?, ?)",
+                        (str(path), stat.st_size, stat.st_mtime, content_hash))
+        self.db.commit()
+        return content_hash
+
+    def session_queued(self, session: str) -> bool:
+        return self.db.execute("SELECT 1 FROM jobs WHERE session = ?", (session,)).fetchone() is not None
+
+    def add(self, zip_path: Path, config: dict) -> dict | None:
+        """Queue a zip; returns the new job, or None when the same recording is already known."""
+        zip_path = zip_path.resolve()
+        content_hash = self.content_hash(zip_path)
+        if self.db.execute("SELECT 1 FROM jobs WHERE hash = ?", (content_hash,)).fetchone():
+            return None
+        session = unique_session(config, session_from_zip(zip_path), taken=self.session_queued)
+        cursor = self.db.execute(
+            "INSERT INTO jobs (hash, zip, session, status, created) VALUES (?, ?, ?, 'queued', ?)",
+            (content_hash, str(zip_path), session, time.time()),
+        )
+        self.db.commit()
+        return self.get(cursor.lastrowid)
+
+    def get(self, job_id: int) -> dict:
+        return dict(self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def claim(self) -> dict | None:
+        """Mark the oldest queued job as running and return it."""
+        row = self.db.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+        if row is None:
+            return None
+        self.db.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1, started = ?, error = NULL WHERE id = ?",
+                        (time.time(), row["id"]))
+        self.db.commit()
+        return self.get(row["id"])
+
+    def finish(self, job_id: int, error: str = None, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        job = self.get(job_id)
+        if error is None:
+            status = "done"
+        else:
+            status = "queued" if job["attempts"] < max_attempts else "failed"
+        self.db.execute("UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ?",
+                        (status, error, time.time(), job_id))
+        self.db.commit()
+        return status
+
+    def requeue(self, job_id: int):
+        """Put a job back without counting the attempt (the runner was stopped, not the job)."""
+        self.db.execute("UPDATE jobs SET status = 'queued', attempts = MAX(attempts - 1, 0) WHERE id = ?", (job_id,))
+        self.db.commit()
+
+    def retry_failed(self) -> int:
+        count = self.db.execute("UPDATE jobs SET status = 'queued', attempts = 0 WHERE status = 'failed'").rowcount
+        self.db.commit()
+        return count
+
+    def pending(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+
+    def jobs(self) -> list[dict]:
+        return [dict(row) for row in self.db.execute("SELECT * FROM jobs ORDER BY id")]
+
+    def close(self):
+        self.db.close()
+
+# === Discovery ===
+def find_zips(paths) -> list[Path]:
+    zips = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            zips.extend(sorted(path.glob("*.zip")))
+        elif path.suffix.lower() == ".zip" and path.exists():
+            zips.append(path)
+        else:
+            print(f"⚠️ Skipping {path}: not a zip or a folder.")
+    return zips
+
+def settled(path: Path, settle: float = SETTLE_SECONDS) -> bool:
+    """False while a zip may still be downloading or copying in."""
+    return time.time() - path.stat().st_mtime >= settle
+
+def enqueue(queue: JobQueue, zips, config: dict) -> int:
+    added = 0
+    for zip_path in zips:
+        try:
+            job = queue.add(zip_path, config)
+        except OSError as e:
+            print(f"⚠️ Could not read {zip_path}: {e}")
+            continue
+        if job is not None:
+            print(f"📥 Queued {zip_path.name} as session {job['session']}.")
+            added += 1
+    return added
+
+# === Scheduling ===
+def job_config(config: dict, jobs: int) -> dict:
+    """Each job's config: its share of the cores for transcription, in-process (no service)."""
+    config = dict(config)
+    if config.get("transcription_workers", "auto") == "auto":
+        threads = config.get("torch_threads_per_worker", 4)
+        config["transcription_workers"] = max(1, (os.cpu_count() or 1) // (threads * jobs))
+    return config
+
+def start_job(job: dict, config_path: Path, steps: str, log_dir: Path) -> tuple:
+    log_dir.mkdir(parents=True, exist_ok=True)
+    log = open(log_dir / f"{job['session']}.log", "a", encoding="utf-8")
+    cmd = [sys.executable, "-m", "dungeonscribe", "run", job["zip"],
+           "--session", job["session"], "--steps", steps, "--config", str(config_path)]
+    process = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, cwd=os.path.dirname(os.path.abspath(__file__)))
+    return process, log
+
+def run_queue(queue: JobQueue, config: dict, jobs: int = DEFAULT_JOBS, steps: str = STEPS, watch=(),
+              interval: float = DEFAULT_INTERVAL, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+    """
+    Keep `jobs` sessions running until the queue is empty (or forever when watching folders).
+    Ctrl+C stops the running jobs and leaves them queued for the next start.
+    """
+    runner_dir = queue.path.parent
+    config_path = runner_dir / "job_config.json"
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump(job_config(config, jobs), f, indent=2)
+
+    running = {}  # job id -> (job, process, log)
+    next_scan = 0.0
+    try:
+        while True:
+            if watch and time.monotonic() >= next_scan:
+                enqueue(queue, [path for path in find_zips(watch) if settled(path)], config)
+                next_scan = time.monotonic() + interval
+
+            for job_id, (job, process, log) in list(running.items()):
+                if process.poll() is None:
+                    continue
+                log.close()
+                del running[job_id]
+                error = None if process.returncode == 0 else f"exit code {process.returncode}, see {log.name}"
+                status = queue.finish(job_id, error, max_attempts)
+                print(f"{'✅' if status == 'done' else '❌' if status == 'failed' else '🔁'} {job['session']}: {status}"
+                      + (f" ({error})" if error else ""))
+
+            while len(running) < jobs:
+                job = queue.claim()
+                if job is None:
+                    break
+                process, log = start_job(job, config_path, steps, runner_dir / "logs")
+                running[job["id"]] = (job, process, log)
+                print(f"🚀 {job['session']}: started (attempt {job['attempts']}, {Path(job['zip']).name}).")
+
+            if not running and not watch and queue.pending() == 0:
+                break
+            time.sleep(POLL_SECONDS)
+    except KeyboardInterrupt:
+        print("⏹️ Stopping; running jobs will be picked up again on the next start.")
+        for job_id, (job, process, log) in running.items():
+            process.terminate()
+            process.wait()
+            log.close()
+            queue.requeue(job_id)
+
+def print_status(queue: JobQueue):
+    jobs = queue.jobs()
+    if not jobs:
+        print("No jobs.")
+        return
+    for job in jobs:
+        line = f"{job['id']:>4}  {job['status']:<8} {job['session']:<16} {Path(job['zip']).name}"
+        if job["error"]:
+            line += f"  ({job['error']})"
+        print(line)
+    counts = {}
+    for job in jobs:
+        counts[job["status"]] = counts.get(job["status"], 0) + 1
+    print(", ".join(f"{count} {status}" for status, count in counts.items()))
+
+# === Main Execution ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process a backlog of Craig sessions without the GUI.")
+    parser.add_argument("paths", nargs="*", help="Craig zips, or folders of them, to queue.")
+    parser.add_argument("--watch", action="append", default=[], metavar="FOLDER", help="Keep watching a folder for new zips.")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="Seconds between scans of watched folders.")
+    parser.add_argument("--jobs", type=int, default=None, help="Sessions to run at once (default: batch_jobs or 2).")
+    parser.add_argument("--steps", default=STEPS, help="Pipeline steps for every job.")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS, help="Tries before a job is marked failed.")
+    parser.add_argument("--db", default=None, help="Job queue database (default: batch_db or ~/.dungeonscribe/batch/jobs.sqlite3).")
+    parser.add_argument("--config", default=CONFIG_FILE)
+    parser.add_argument("--status", action="store_true", help="List the jobs and exit.")
+    parser.add_argument("--retry-failed", action="store_true", help="Queue failed jobs again.")
+    args = parser.parse_args(argv)
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    queue = JobQueue(args.db or config.get("batch_db") or DEFAULT_DB_PATH)
+    try:
+        if args.status:
+            print_status(queue)
+            return
+        recovered = queue.recover()
+        if recovered:
+            print(f"🔁 {recovered} job(s) from an interrupted run queued again.")
+        if args.retry_failed:
+            print(f"🔁 {queue.retry_failed()} failed job(s) queued again.")
+
+        enqueue(queue, find_zips(args.paths), config)
+        jobs = max(1, args.jobs or config.get("batch_jobs", DEFAULT_JOBS))
+        print(f"🗂️ {queue.pending()} job(s) queued; running {jobs} at a time.")
+        run_queue(queue, config, jobs, args.steps, args.watch, args.interval, args.max_attempts)
+        print_status(queue)
+    finally:
+        queue.close()
+
+if __name__ == "__main__":
+    main()
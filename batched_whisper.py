@@ -0,0 +1,159 @@
+"""
+Batched Whisper Decoding - The Dungeon Scribe
+
+Whisper works on fixed 30-second mel windows, but model.transcribe() walks one window of one
+track at a time. This engine packs the speech regions of every speaker track into 30-second
+windows, stacks windows from all tracks into batches, and runs the encoder and decoder over
+each batch in one forward pass. Each window remembers which track and which part of that
+track it came from, so the decoded segments go back to the right speaker and timestamp.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+from collections import deque
+
+import numpy as np
+import torch
+import whisper
+from whisper.audio import CHUNK_LENGTH
+from whisper.tokenizer import get_tokenizer
+
+from craig_audio import SAMPLE_RATE
+
+WINDOW_SECONDS = float(CHUNK_LENGTH)
+TIME_PRECISION = 0.02  # seconds per timestamp token
+
+# The same fallback rules model.transcribe() applies to each window.
+TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+# A window that falls back to sampling is re-decoded on its own from this seed, so it samples
+# the same way on every run, whichever windows shared its batch.
+FALLBACK_SEED = 0
+
+# === Decoding ===
+def _parse_segments(tokens: list[int], tokenizer, duration: float) -> list[tuple[float, float, str]]:
+    """Split a decoded token sequence into (start, end, text) on its timestamp tokens."""
+    segments = []
+    start, text_tokens, last_t = None, [], 0.0
+    for token in tokens:
+        if token >= tokenizer.timestamp_begin:
+            t = last_t = (token - tokenizer.timestamp_begin) * TIME_PRECISION
+            if start is not None and text_tokens:
+                segments.append((start, t, tokenizer.decode(text_tokens)))
+                start, text_tokens = None, []
+            else:
+                start = t
+        elif token < tokenizer.eot:
+            text_tokens.append(token)
+    if text_tokens:
+        # The decoder stopped without a closing timestamp; the segment runs to the window end.
+        segments.append((last_t if start is None else start, duration, tokenizer.decode(text_tokens)))
+    return segments
+
+def decode_windows(model, audios: list[np.ndarray], compression_ratio_threshold: float = 1.8, fp16: bool = None) -> list:
+    """
+    Decode a batch of <=30 s windows in one greedy forward pass.
+
+    A window that fails the compression-ratio or log-probability checks is retried at the
+    next temperature, as model.transcribe() does, on its own and seeded, so its result
+    depends only on its audio and never on the other windows in the batch. Windows that look
+    like silence come back as None.
+    """
+    mel = torch.stack([
+        whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels)
+        for audio in audios
+    ]).to(model.device)
+    fp16 = model.device.type == "cuda" if fp16 is None else fp16
+
+    def decode(mels, temperature):
+        options = whisper.DecodingOptions(task="transcribe", temperature=temperature, without_timestamps=False, fp16=fp16)
+        return whisper.decode(model, mels, options)
+
+    def needs_fallback(result) -> bool:
+        if result.no_speech_prob > NO_SPEECH_THRESHOLD:
+            return False
+        return result.compression_ratio > compression_ratio_threshold or result.avg_logprob < LOGPROB_THRESHOLD
+
+    results = decode(mel, TEMPERATURES[0])
+    for i, result in enumerate(results):
+        if not needs_fallback(result):
+            continue
+        torch.manual_seed(FALLBACK_SEED)
+        for temperature in TEMPERATURES[1:]:
+            results[i] = decode(mel[i:i + 1], temperature)[0]
+            if not needs_fallback(results[i]):
+                break
+
+    return [
+        None if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD else result
+        for result in results
+    ]
+
+# === Engine ===
+def transcribe_batched(model, tracks, batch_size: int = 8, compression_ratio_threshold: float = 1.8, fp16: bool = None):
+    """
+    Transcribe many tracks with cross-track batches.
+
+    `tracks` yields (key, windows): the speech windows of each track, as a list or as an
+    iterator (craig_audio.pack_speech) that decodes them as they are asked for, so a long
+    track is never held whole. Every track is opened first; batches are then filled
+    round-robin, one window from each track that still has some, in track order. A batch's
+    contents therefore depend only on the tracks' windows, never on timing, and all tracks
+    move through the session at the same pace, so the merged transcript streams.
+
+    A window's result depends only on its own audio (see decode_windows), so a track's
+    transcript is the same whichever tracks share its batches, and a run spread over worker
+    processes gives exactly the serial transcript.
+
+    Yields (key, segments, done) after every batch for each track that was in it, so callers
+    can stream results. A track's windows are decoded in order, so each chunk is time-sorted
+    and follows the previous one; `done` marks a track's last chunk. Segment times are on the
+    track's own timeline: dicts of start, end, text and the window's confidence fields.
+    """
+    tokenizer = get_tokenizer(
+        model.is_multilingual,
+        num_languages=getattr(model, "num_languages", 99),
+        task="transcribe",
+    )
+
+    def window_segments(audio, timeline, result) -> list[dict]:
+        segments = []
+        for start, end, text in _parse_segments(result.tokens, tokenizer, len(audio) / SAMPLE_RATE):
+            segments.append({
+                "start": timeline.to_original(start),
+                "end": timeline.to_original(end, end=True),
+                "text": text,
+                # Confidence is only known per window; every segment in it shares the values.
+                "avg_logprob": result.avg_logprob,
+                "no_speech_prob": result.no_speech_prob,
+                "compression_ratio": result.compression_ratio,
+            })
+        return segments
+
+    active = deque((key, iter(windows)) for key, windows in tracks)
+    while active:
+        batch, finished = [], []  # (key, audio, timeline) windows; keys whose windows ran out
+        while active and len(batch) < batch_size:
+            key, windows = active.popleft()
+            window = next(windows, None)
+            if window is None:
+                finished.append(key)
+                continue
+            batch.append((key, *window))
+            active.append((key, windows))
+
+        chunks = {}  # key -> segments of this batch, in track order of first appearance
+        if batch:
+            decoded = decode_windows(model, [audio for _, audio, _ in batch], compression_ratio_threshold, fp16)
+            for (key, audio, timeline), result in zip(batch, decoded):
+                chunk = chunks.setdefault(key, [])
+                if result is not None:
+                    chunk.extend(window_segments(audio, timeline, result))
+        for key, chunk in chunks.items():
+            yield key, sorted(chunk, key=lambda s: s["start"]), key in finished
+        for key in finished:
+            if key not in chunks:
+                yield key, [], True
@@ -0,0 +1,11 @@
+"""
+Benchmarks - The Dungeon Scribe
+
+Synthetic Craig sessions, a stand-in Whisper model and a fake chat-completions server, so
+every stage of the pipeline can be timed without a recording or an API key. Run with:
+
+    python -m benchmarks.run [--tracks 4] [--minutes 10] [--backend stub|tiny] [--baseline benchmarks/baseline.json]
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
@@ -0,0 +1,198 @@
+"""
+Backend Benchmark - The Dungeon Scribe
+
+Speed against accuracy for the Whisper backends and compute types in whisper_backends.py, on
+real speech. Every configuration transcribes the same clips with the pipeline's own options,
+and the report gives each one's load time, real-time factor and word error rate (WER).
+
+Clips are either audio files with a reference transcript next to them (clip.flac and
+clip.txt, e.g. a few LibriSpeech utterances), or the first --seconds of speech from each track
+of a Craig zip. Without references, the first configuration's output is the reference, and
+the WER of the others shows how far they drift from it.
+
+Usage:
+    python -m benchmarks.backends (--audio-dir DIR | --zip session.zip) [--model small]
+        [--configs whisper:float32,whisper:int8,faster-whisper:int8] [--threads 4]
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import argparse
+import gc
+import json
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from craig_audio import (
+    AUDIO_EXTENSIONS,
+    SAMPLE_RATE,
+    TrackScan,
+    decode_audio_file,
+    iter_source_chunks,
+    pack_speech,
+    source_track_name,
+    zip_track_sources,
+)
+from whisper_backends import backend_spec, describe, load_backend
+
+DEFAULT_CONFIGS = "whisper:float32,whisper:int8,faster-whisper:int8"
+DEFAULT_CLIP_SECONDS = 120.0
+DEFAULT_RESULTS_DIR = Path(__file__).parent / "results"
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+# === Word Error Rate ===
+def normalize_words(text: str) -> list[str]:
+    """Lowercase words without punctuation, so only the words themselves are compared."""
+    return WORD_PATTERN.findall(text.lower())
+
+def word_errors(reference: list[str], hypothesis: list[str]) -> int:
+    """Substitutions, deletions and insertions needed to turn the hypothesis into the reference."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(
+                previous[j] + 1,                            # deletion
+                current[j - 1] + 1,                         # insertion
+                previous[j - 1] + (ref_word != hyp_word),   # substitution or match
+            ))
+        previous = current
+    return previous[-1]
+
+def word_error_rate(references: list[str], hypotheses: list[str]) -> float:
+    """Corpus WER: all errors over all reference words."""
+    errors = words = 0
+    for reference, hypothesis in zip(references, hypotheses):
+        reference_words = normalize_words(reference)
+        errors += word_errors(reference_words, normalize_words(hypothesis))
+        words += len(reference_words)
+    return errors / max(words, 1)
+
+# === Clips ===
+def audio_dir_clips(folder: str) -> list[dict]:
+    clips = []
+    for path in sorted(Path(folder).iterdir()):
+        if path.suffix.lower() not in AUDIO_EXTENSIONS:
+            continue
+        reference = path.with_suffix(".txt")
+        clips.append({
+            "name": path.name,
+            "audio": decode_audio_file(str(path)),
+            "reference": reference.read_text(encoding="utf-8") if reference.exists() else None,
+        })
+    return clips
+
+def zip_clips(zip_path: str, seconds: float) -> list[dict]:
+    """The first `seconds` of speech of every track, packed the way model.transcribe() gets it."""
+    clips = []
+    for source in zip_track_sources(zip_path):
+        window = next(pack_speech(TrackScan(iter_source_chunks(source)), seconds), None)
+        if window is not None:
+            clips.append({"name": source_track_name(source), "audio": window[0], "reference": None})
+    return clips
+
+# === Runs ===
+def parse_config(text: str) -> dict:
+    backend, _, compute_type = text.strip().partition(":")
+    return {"whisper_backend": backend, "whisper_compute_type": compute_type or "auto"}
+
+def run_config(model_name: str, clips: list[dict], settings: dict) -> dict:
+    from transcribe_audacity_zip import TRACK_SEED, TRANSCRIBE_OPTIONS
+
+    spec = backend_spec(settings)
+    started = time.perf_counter()
+    model = load_backend(model_name, spec)
+    load_seconds = time.perf_counter() - started
+
+    try:
+        import torch
+    except ImportError:
+        torch = None
+    texts, transcribe_seconds = [], 0.0
+    for clip in clips:
+        if torch is not None:
+            torch.manual_seed(TRACK_SEED)
+        started = time.perf_counter()
+        result = model.transcribe(clip["audio"], **TRANSCRIBE_OPTIONS)
+        transcribe_seconds += time.perf_counter() - started
+        texts.append(" ".join(seg["text"].strip() for seg in result["segments"]))
+    del model
+    gc.collect()
+
+    audio_seconds = sum(len(clip["audio"]) for clip in clips) / SAMPLE_RATE
+    return {
+        "config": f"{spec['backend']}:{spec['compute_type']}",
+        "spec": spec,
+        "load_seconds": load_seconds,
+        "transcribe_seconds": transcribe_seconds,
+        "real_time_factor": transcribe_seconds / max(audio_seconds, 1e-9),
+        "texts": texts,
+    }
+
+def report(runs: list[dict], reference_label: str):
+    print(f"\n{'config':<26} {'load':>7} {'transcribe':>11} {'RTF':>7} {'speedup':>8} {'WER':>7}")
+    base = runs[0]["transcribe_seconds"]
+    for run in runs:
+        speedup = base / run["transcribe_seconds"] if run["transcribe_seconds"] else float("inf")
+        print(f"{run['config']:<26} {run['load_seconds']:6.1f}s {run['transcribe_seconds']:10.1f}s "
+              f"{run['real_time_factor']:7.3f} {speedup:7.2f}x {run['wer']:6.1%}")
+    print(f"WER against {reference_label}; speedup against {runs[0]['config']}.")
+
+# === Main Execution ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare Whisper backends for speed and word error rate.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--audio-dir", help="Audio clips, each with an optional reference <name>.txt.")
+    source.add_argument("--zip", help="A Craig zip; the first --seconds of speech of each track are used.")
+    parser.add_argument("--seconds", type=float, default=DEFAULT_CLIP_SECONDS, help="Speech per track with --zip.")
+    parser.add_argument("--model", default="small", help="Whisper model name.")
+    parser.add_argument("--configs", default=DEFAULT_CONFIGS, help="Comma-separated backend:compute_type list.")
+    parser.add_argument("--device", default="auto", help="auto, cpu or cuda.")
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads per backend (0: library default).")
+    parser.add_argument("--output", default=None, help="Results file (default: benchmarks/results/backends-<time>.json).")
+    args = parser.parse_args(argv)
+
+    clips = audio_dir_clips(args.audio_dir) if args.audio_dir else zip_clips(args.zip, args.seconds)
+    if not clips:
+        print("❌ No clips to transcribe.")
+        return 1
+    audio_seconds = sum(len(clip["audio"]) for clip in clips) / SAMPLE_RATE
+    print(f"🎧 {len(clips)} clip(s), {audio_seconds / 60:.1f} min of audio, model '{args.model}'.")
+
+    runs = []
+    for text in args.configs.split(","):
+        settings = {**parse_config(text), "whisper_device": args.device, "whisper_threads": args.threads}
+        try:
+            print(f"⏱️ {text.strip()} ({describe(backend_spec(settings))})...")
+            runs.append(run_config(args.model, clips, settings))
+        except (ImportError, ValueError, RuntimeError) as e:
+            print(f"⚠️ Skipping {text.strip()}: {e}")
+    if not runs:
+        return 1
+
+    if all(clip["reference"] is not None for clip in clips):
+        references, reference_label = [clip["reference"] for clip in clips], "the reference transcripts"
+    else:
+        references, reference_label = runs[0]["texts"], runs[0]["config"]
+    for run in runs:
+        run["wer"] = word_error_rate(references, run["texts"])
+    report(runs, reference_label)
+
+    output = Path(args.output) if args.output else DEFAULT_RESULTS_DIR / f"backends-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "model": args.model,
+        "clips": [{"name": clip["name"], "seconds": len(clip["audio"]) / SAMPLE_RATE} for clip in clips],
+        "reference": reference_label,
+        "runs": runs,
+    }, indent=2), encoding="utf-8")
+    print(f"📊 Results written to: {output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Fake Chat-Completions Server - The Dungeon Scribe
+
+A local stand-in for the OpenAI chat-completions endpoint, for benchmarking and exercising
+the summarizer without an API key. Point openai_base_url at it. Replies are deterministic:
+a fixed-length note that quotes the start of the prompt, after a latency of `latency` plus
+the reply's tokens at `tokens_per_second`. Token usage is reported as whitespace-separated
+words. Every `rate_limit_every`-th request can be answered with a 429 and a Retry-After, to
+exercise the client's backoff.
+
+Usage:
+    python -m benchmarks.fake_openai_server [--port 8799] [--latency 0.05] [--rate-limit-every 0]
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8799
+DEFAULT_LATENCY = 0.05        # seconds before the first token
+DEFAULT_TOKENS_PER_SECOND = 2000.0
+DEFAULT_REPLY_WORDS = 150
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass  # keep benchmark output readable
+
+    def send_json(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "not_found"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.requests += 1
+            number = server.requests
+
+        if server.rate_limit_every and number % server.rate_limit_every == 0:
+            self.send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit"}},
+                           headers={"retry-after": "0.2"})
+            return
+
+        prompt = request["messages"][-1]["content"]
+        prompt_tokens = sum(len(message["content"].split()) for message in request["messages"])
+        first_line = prompt.strip().splitlines()[0][:80] if prompt.strip() else ""
+        words = [f"note{i}" for i in range(server.reply_words)]
+        reply = f"Notes on a {len(prompt)}-character prompt ({first_line}): " + " ".join(words)
+        completion_tokens = len(reply.split())
+        time.sleep(server.latency + completion_tokens / server.tokens_per_second)
+
+        self.send_json(200, {
+            "id": f"chatcmpl-fake-{number}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": reply}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+class FakeChatServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = DEFAULT_PORT, latency: float = DEFAULT_LATENCY,
+                 tokens_per_second: float = DEFAULT_TOKENS_PER_SECOND, reply_words: int = DEFAULT_REPLY_WORDS,
+                 rate_limit_every: int = 0):
+        super().__init__(("127.0.0.1", port), _ChatHandler)
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.reply_words = reply_words
+        self.rate_limit_every = rate_limit_every
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def start(self) -> "FakeChatServer":
+        """Serve from a background thread; call shutdown() when done."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+# === Main Execution ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI chat-completions server.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY, help="Seconds before each reply.")
+    parser.add_argument("--tokens-per-second", type=float, default=DEFAULT_TOKENS_PER_SECOND)
+    parser.add_argument("--reply-words", type=int, default=DEFAULT_REPLY_WORDS)
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth request with a 429 (0: never).")
+    args = parser.parse_args(argv)
+
+    server = FakeChatServer(args.port, args.latency, args.tokens_per_second, args.reply_words, args.rate_limit_every)
+    print(f"🤖 Fake chat-completions server at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Stage Benchmarks - The Dungeon Scribe
+
+Times every stage of the pipeline on a synthetic Craig session, with a stand-in Whisper
+model (or a real one) and a local fake chat-completions server, so a change can be measured
+without a recording or an API key:
+
+    extract      extract_audio_from_zip
+    decode       ffmpeg decode of every extracted track to 16 kHz float32
+    onset        detect_audio_start on every track
+    vad          speech-region detection on every track
+    transcribe   transcribe_audio_files over the extracted tracks
+    stream       transcribe_sources straight from the zip (the default path)
+    preprocess   process_lines over a synthetic transcript
+    summarize    summarize_text against the fake server
+
+Each stage runs `--repeat` times and the best time is kept. Results are written as JSON;
+with --baseline they are compared against an earlier result and any stage slower than the
+baseline by more than --tolerance is reported as a regression (exit code 1). --save-baseline
+writes the run as the new baseline.
+
+Usage:
+    python -m benchmarks.run [--tracks 4] [--minutes 10] [--codec flac] [--backend stub|tiny]
+                             [--whisper-backend whisper|faster-whisper] [--compute-type int8]
+                             [--baseline benchmarks/baseline.json] [--save-baseline]
+
+Accuracy is not measured here (the synthetic tracks are not speech); benchmarks/backends.py
+compares backends for speed and word error rate on real recordings.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.fake_openai_server import FakeChatServer
+from benchmarks.stub_backend import DEFAULT_REAL_TIME_FACTOR, load_backend
+from benchmarks.synthetic_session import CODECS, make_craig_zip
+
+STAGES = ("extract", "decode", "onset", "vad", "transcribe", "stream", "preprocess", "summarize")
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+DEFAULT_RESULTS_DIR = Path(__file__).parent / "results"
+DEFAULT_TOLERANCE = 0.2  # fraction slower than the baseline that counts as a regression
+
+def best_of(fn, repeat: int, quiet: bool = True):
+    """Run `fn` `repeat` times; returns the best wall time and the last result."""
+    best, result = float("inf"), None
+    for _ in range(max(1, repeat)):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+            start = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+    return best, result
+
+# === Stages ===
+def run_benchmarks(args, workdir: Path) -> dict:
+    import transcribe_audacity_zip as transcriber
+    from craig_audio import load_track_source, zip_track_sources
+    from preprocess_transcript import process_lines, synthetic_lines
+
+    quiet = not args.verbose
+    stages = {}
+    selected = set(args.stages.split(",")) if args.stages else set(STAGES)
+
+    print(f"🎲 Generating {args.tracks} track(s) of {args.minutes:g} min ({args.codec}, speech ratio {args.speech_ratio})...")
+    zip_path = str(workdir / "session.zip")
+    session = make_craig_zip(zip_path, args.tracks, args.minutes, args.speech_ratio, args.codec, args.seed)
+
+    # The stand-in model has no batched engine, and a benchmark must never read a stale cache.
+    transcriber.load_settings({
+        "inference_batch_size": 1 if args.backend == "stub" else args.batch_size,
+        "transcription_workers": 1,
+        "transcription_cache": False,
+        "whisper_backend": args.whisper_backend,
+        "whisper_compute_type": args.compute_type,
+    })
+    model = load_backend(args.backend, args.real_time_factor)
+
+    def record(name: str, fn, **figures):
+        if name not in selected:
+            return None
+        seconds, result = best_of(fn, args.repeat, quiet)
+        stages[name] = {"seconds": seconds, **{key: value(result, seconds) for key, value in figures.items()}}
+        print(f"⏱️ {name:<11} {seconds:8.3f}s")
+        return result
+
+    def extract():
+        target = workdir / "extracted"
+        shutil.rmtree(target, ignore_errors=True)
+        transcriber.extract_audio_from_zip(zip_path, str(target))
+        return transcriber.find_audio_files(str(target))
+
+    audio_seconds = session["seconds"] * args.tracks
+    files = record("extract", extract)
+    if files is None:
+        files = extract()
+
+    tracks = record("decode", lambda: [load_track_source(f) for f in files],
+                    audio_seconds=lambda result, s: audio_seconds,
+                    times_real_time=lambda result, s: audio_seconds / s)
+    if tracks is None and selected & {"onset", "vad"}:
+        tracks = [load_track_source(f) for f in files]
+    record("onset", lambda: [transcriber.detect_audio_start(audio) for _, audio in tracks])
+    record("vad", lambda: [transcriber.track_regions(audio) for _, audio in tracks])
+    tracks = None  # free the decoded audio before inference
+
+    record("transcribe", lambda: transcriber.transcribe_audio_files(files, model=model),
+           segments=lambda lines, s: len(lines),
+           real_time_factor=lambda lines, s: s / audio_seconds)
+    record("stream", lambda: list(transcriber.transcribe_sources(zip_track_sources(zip_path), model=model)),
+           segments=lambda segments, s: len(segments),
+           real_time_factor=lambda segments, s: s / audio_seconds)
+
+    raw_lines = synthetic_lines(args.transcript_lines)
+    processed = record("preprocess", lambda: list(process_lines(raw_lines)),
+                       lines=lambda result, s: len(raw_lines),
+                       lines_per_second=lambda result, s: len(raw_lines) / s)
+
+    if "summarize" in selected:
+        if processed is None:
+            processed = list(process_lines(raw_lines))
+        stages.update(benchmark_summarize("\n".join(processed), args, quiet))
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "params": {
+            "tracks": args.tracks, "minutes": args.minutes, "speech_ratio": args.speech_ratio, "codec": args.codec,
+            "seed": args.seed, "backend": args.backend, "real_time_factor": args.real_time_factor,
+            "whisper_backend": args.whisper_backend, "compute_type": args.compute_type,
+            "transcript_lines": args.transcript_lines, "repeat": args.repeat,
+        },
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "machine": platform.machine()},
+        "stages": stages,
+    }
+
+def benchmark_summarize(transcript: str, args, quiet: bool) -> dict:
+    import dnd_transcript_summarizer as summarizer
+
+    server = FakeChatServer(port=0, latency=args.llm_latency).start()
+    settings = {
+        "openai_api_key": "benchmark",
+        "openai_base_url": server.base_url,
+        "llm_cache": False,
+        "summary_context_tokens": args.context_tokens,
+        "summary_chunk_tokens": min(args.context_tokens, 24000),
+    }
+
+    def summarize():
+        # A fresh client per run, as the pipeline does: its locks belong to one event loop.
+        summarizer.load_settings(settings)
+        return summarizer.summarize_text(transcript)
+
+    try:
+        seconds, _ = best_of(summarize, args.repeat, quiet)
+        figures = summarizer.get_llm().metrics.summary()
+    finally:
+        server.shutdown()
+        server.server_close()
+    print(f"⏱️ {'summarize':<11} {seconds:8.3f}s")
+    return {"summarize": {
+        "seconds": seconds,
+        "requests": figures["requests"],
+        "prompt_tokens": figures["prompt_tokens"],
+        "completion_tokens": figures["completion_tokens"],
+        "latency_p50": figures["latency_p50"],
+    }}
+
+# === Baseline ===
+def compare(results: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list[str]:
+    """Print each stage against the baseline; returns the stages that regressed."""
+    if baseline.get("params") != results["params"]:
+        print("⚠️ Baseline was recorded with different parameters; the comparison is only indicative.")
+    regressions = []
+    for name, figures in results["stages"].items():
+        before = baseline.get("stages", {}).get(name)
+        if not before or not before.get("seconds"):
+            print(f"   {name:<11} {figures['seconds']:8.3f}s  (not in baseline)")
+            continue
+        ratio = figures["seconds"] / before["seconds"]
+        regressed = ratio > 1 + tolerance
+        marker = "❌" if regressed else ("🚀" if ratio < 1 - tolerance else "✅")
+        print(f"{marker} {name:<11} {figures['seconds']:8.3f}s vs {before['seconds']:8.3f}s ({ratio - 1:+.0%})")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+# === Main Execution ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time every pipeline stage on a synthetic Craig session.")
+    parser.add_argument("--tracks", type=int, default=4)
+    parser.add_argument("--minutes", type=float, default=10.0, help="Length of every track.")
+    parser.add_argument("--speech-ratio", type=float, default=0.4)
+    parser.add_argument("--codec", choices=CODECS, default="flac")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", default="stub", help="'stub' for the stand-in model, or a Whisper model name such as tiny.")
+    parser.add_argument("--real-time-factor", type=float, default=DEFAULT_REAL_TIME_FACTOR, help="Stand-in model seconds per audio second.")
+    parser.add_argument("--batch-size", type=int, default=8, help="inference_batch_size for a real model.")
+    parser.add_argument("--whisper-backend", default="whisper", help="whisper_backend for a real model (see whisper_backends.py).")
+    parser.add_argument("--compute-type", default="auto", help="whisper_compute_type for a real model, e.g. int8.")
+    parser.add_argument("--transcript-lines", type=int, default=50_000, help="Lines in the synthetic transcript.")
+    parser.add_argument("--context-tokens", type=int, default=128000, help="summary_context_tokens for the summarize stage.")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Fake server seconds per request.")
+    parser.add_argument("--stages", default=None, help=f"Comma-separated subset of: {', '.join(STAGES)}.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the best is kept.")
+    parser.add_argument("--output", default=None, help="Results file (default: benchmarks/results/<time>.json).")
+    parser.add_argument("--baseline", default=None, help="Compare against this results file.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Slowdown that counts as a regression.")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Also write the results to {DEFAULT_BASELINE}.")
+    parser.add_argument("--verbose", action="store_true", help="Show the stages' own output.")
+    args = parser.parse_args(argv)
+
+    workdir = Path(tempfile.mkdtemp(prefix="dungeonscribe-bench-"))
+    try:
+        results = run_benchmarks(args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = Path(args.output) if args.output else DEFAULT_RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"📊 Results written to: {output}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+    if args.save_baseline:
+        DEFAULT_BASELINE.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"📌 Baseline saved to: {DEFAULT_BASELINE}")
+    if regressions:
+        print(f"❌ Slower than the baseline: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
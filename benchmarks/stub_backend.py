@@ -0,0 +1,52 @@
+"""
+Stand-in Whisper Backend - The Dungeon Scribe
+
+A model object with the same transcribe() call as a loaded Whisper model, for benchmarking
+everything around inference without torch, a GPU or model weights. It takes a fixed amount
+of time per second of audio (a configurable real-time factor) and returns one segment per
+few seconds of input, so runs are repeatable and stage timings are not drowned out by the
+model. Use it with inference_batch_size 1; the batched engine needs the real model.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import time
+
+from craig_audio import SAMPLE_RATE
+
+DEFAULT_REAL_TIME_FACTOR = 0.01  # seconds of "inference" per second of audio
+SEGMENT_SECONDS = 4.0
+
+class StubWhisperModel:
+    def __init__(self, real_time_factor: float = DEFAULT_REAL_TIME_FACTOR, segment_seconds: float = SEGMENT_SECONDS):
+        self.real_time_factor = real_time_factor
+        self.segment_seconds = segment_seconds
+        self.audio_seconds = 0.0
+
+    def transcribe(self, audio, **options) -> dict:
+        duration = len(audio) / SAMPLE_RATE
+        self.audio_seconds += duration
+        time.sleep(duration * self.real_time_factor)
+
+        segments = []
+        start = 0.0
+        while start < duration:
+            end = min(start + self.segment_seconds, duration)
+            segments.append({
+                "start": start,
+                "end": end,
+                "text": f" Segment {len(segments) + 1} of a stand-in transcription, {end - start:.1f} seconds.",
+                "avg_logprob": -0.3,
+                "no_speech_prob": 0.05,
+                "compression_ratio": 1.2,
+            })
+            start = end
+        return {"segments": segments}
+
+def load_backend(name: str, real_time_factor: float = DEFAULT_REAL_TIME_FACTOR):
+    """'stub' for the stand-in, or a Whisper model name (e.g. 'tiny') for the real thing."""
+    if name == "stub":
+        return StubWhisperModel(real_time_factor)
+    from transcribe_audacity_zip import load_whisper_model
+    return load_whisper_model(name)
@@ -0,0 +1,110 @@
+"""
+Synthetic Craig Sessions - The Dungeon Scribe
+
+Builds a Craig-style .zip (one "<n>-<username>.<codec>" track per speaker plus info.txt) from
+generated audio, so the audio stages can be benchmarked at any size without a real recording.
+
+Each track starts with a stretch of silence and then alternates "utterances" with silent
+gaps until the requested speech/silence ratio and length are reached. An utterance is a few
+harmonics on a wandering pitch under a syllable-rate envelope, loud enough (about -12 dBFS)
+that the -50 dBFS onset and silence detection treat it as speech, while the gaps are faint
+noise well below that threshold. The same seed always produces the same session.
+
+Usage:
+    python -m benchmarks.synthetic_session session.zip [--tracks 4] [--minutes 10] [--speech-ratio 0.4] [--codec flac]
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import argparse
+import os
+import subprocess
+import tempfile
+import zipfile
+
+import numpy as np
+
+from craig_audio import SAMPLE_RATE
+
+CRAIG_SAMPLE_RATE = 48000  # Craig records every track at 48 kHz
+CODECS = ("flac", "ogg", "mp3", "wav", "m4a")
+SPEAKERS = ["daddyiroh", "rogue_42", "wizard", "dm", "bard", "cleric", "ranger", "paladin"]
+
+def synth_track(seconds: float, speech_ratio: float, rng: np.random.Generator) -> tuple[np.ndarray, list]:
+    """Generate one speaker's track; returns float32 audio and its (start, end) speech regions."""
+    total = int(seconds * SAMPLE_RATE)
+    audio = (rng.standard_normal(total) * 1e-4).astype(np.float32)  # about -80 dBFS room noise
+    regions = []
+
+    t = rng.uniform(0.5, min(5.0, seconds / 4))
+    while t < seconds:
+        length = rng.uniform(1.0, 8.0)
+        end = min(t + length, seconds)
+        start_i, end_i = int(t * SAMPLE_RATE), int(end * SAMPLE_RATE)
+        n = end_i - start_i
+        if n > SAMPLE_RATE // 10:
+            time_axis = np.arange(n) / SAMPLE_RATE
+            pitch = rng.uniform(90, 220) * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(0.2, 1.0) * time_axis))
+            phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+            voice = sum(np.sin(k * phase) / k for k in range(1, 5))
+            envelope = 0.6 + 0.4 * np.sin(2 * np.pi * rng.uniform(3, 6) * time_axis)  # syllables
+            audio[start_i:end_i] += (0.25 * envelope * voice).astype(np.float32)
+            regions.append((t, end))
+        # Gaps sized so speech makes up `speech_ratio` of the time on average.
+        gap = length * (1 - speech_ratio) / max(speech_ratio, 0.01) * rng.uniform(0.5, 1.5)
+        t = end + max(gap, 0.6)
+    return np.clip(audio, -1.0, 1.0), regions
+
+def encode_track(audio: np.ndarray, path: str):
+    """Encode float32 16 kHz audio to `path` at 48 kHz; ffmpeg picks the codec from the extension."""
+    pcm = (audio * 32767).astype(np.int16).tobytes()
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-i", "pipe:0",
+        "-ar", str(CRAIG_SAMPLE_RATE), path,
+    ]
+    result = subprocess.run(cmd, input=pcm, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to encode {path}: {result.stderr.decode(errors='ignore').strip()}")
+
+def make_craig_zip(zip_path: str, tracks: int = 4, minutes: float = 10.0, speech_ratio: float = 0.4,
+                   codec: str = "flac", seed: int = 0) -> dict:
+    """
+    Write a synthetic Craig zip and return its description: track names, lengths and the
+    generated speech regions of each track.
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unsupported codec '{codec}'; choose one of {', '.join(CODECS)}.")
+    rng = np.random.default_rng(seed)
+    session = {"zip": zip_path, "codec": codec, "seconds": minutes * 60, "speech_ratio": speech_ratio, "tracks": {}}
+
+    with tempfile.TemporaryDirectory() as tmpdir, zipfile.ZipFile(zip_path, "w", zipfile.ZIP_STORED) as zf:
+        for i in range(tracks):
+            name = f"{i + 1}-{SPEAKERS[i % len(SPEAKERS)]}{'' if i < len(SPEAKERS) else i}"
+            audio, regions = synth_track(minutes * 60, speech_ratio, rng)
+            member = f"{name}.{codec}"
+            path = os.path.join(tmpdir, member)
+            encode_track(audio, path)
+            zf.write(path, member)
+            session["tracks"][name] = {"regions": regions, "speech_seconds": sum(e - s for s, e in regions)}
+        zf.writestr("info.txt", f"Synthetic Craig session: {tracks} tracks, {minutes} minutes, seed {seed}\n")
+    return session
+
+# === Main Execution ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Craig session zip.")
+    parser.add_argument("zip", help="Where to write the zip.")
+    parser.add_argument("--tracks", type=int, default=4, help="Number of speaker tracks.")
+    parser.add_argument("--minutes", type=float, default=10.0, help="Length of every track.")
+    parser.add_argument("--speech-ratio", type=float, default=0.4, help="Fraction of each track that is speech.")
+    parser.add_argument("--codec", choices=CODECS, default="flac", help="Track codec (Craig's default is flac).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    session = make_craig_zip(args.zip, args.tracks, args.minutes, args.speech_ratio, args.codec, args.seed)
+    speech = sum(track["speech_seconds"] for track in session["tracks"].values())
+    print(f"✅ Wrote {args.zip}: {args.tracks} track(s) of {args.minutes:g} min, {speech / 60:.1f} min of speech in total.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+D&D Transcript Compactor - The Dungeon Scribe
+
+A token-budget pass that runs after preprocessing and before summarization. Every line of the
+processed transcript is billed as prompt tokens, and a lot of them carry nothing new:
+
+- Whisper repetition loops, where a quiet track produces "Thank you." forty times, or the
+  same sentence repeated inside one segment.
+- One-line fragments from a speaker who kept talking, each with its own timestamp and name.
+
+Loops of a speaker saying the same line again and again within seconds are collapsed, and
+consecutive lines from the same
+speaker within a short gap are coalesced into one line with the first timestamp. The pass
+streams, so memory stays flat, and it reports the token savings with the summarizer's
+tiktoken encoding.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import argparse
+import json
+import os
+import re
+from collections import deque
+from difflib import SequenceMatcher
+from pathlib import Path
+
+from segment_io import format_processed_line, iter_segments, segment_record_line, segments_path_for
+from session_files import latest_processed_transcript
+
+CONFIG_FILE = "config.json"
+
+DEFAULT_MERGE_GAP = 10.0       # seconds between same-speaker lines that still count as one turn
+DEFAULT_REPEAT_WINDOW = 5.0    # seconds between a speaker's repeats that still make one loop
+DEFAULT_MIN_REPEATS = 3        # a line said this many times in a row is a loop, not speech
+DEFAULT_MAX_LINE_CHARS = 1200  # merged lines are split here so timestamps stay useful
+NEAR_DUPLICATE_RATIO = 0.9
+
+PROCESSED_LINE_PATTERN = re.compile(r"\[(\d+):(\d{2})\] (.+?): (.*)")
+SENTENCE_SPLIT_PATTERN = re.compile(r"(?<=[.!?])\s+")
+NORMALIZE_PATTERN = re.compile(r"[^a-z0-9]+")
+NUMBER_WORDS = {
+    "zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+    "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen",
+    "nineteen", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety",
+    "hundred", "thousand",
+}
+
+# === Parsing ===
+def parse_processed_lines(lines):
+    """Yield records from '[m:ss] Name: text' lines; the end time is unknown, so it equals the start."""
+    for line in lines:
+        match = PROCESSED_LINE_PATTERN.match(line.rstrip("\n"))
+        if not match:
+            continue
+        minutes, seconds, name, text = match.groups()
+        start = int(minutes) * 60 + int(seconds)
+        yield {"start": start, "end": start, "speaker": name, "name": name, "text": text}
+
+# === Repetition ===
+def normalize(text: str) -> str:
+    return NORMALIZE_PATTERN.sub(" ", text.lower()).strip()
+
+def numbers_in(text: str) -> list[str]:
+    """The digits and number words of normalized text, in order."""
+    return [word for word in text.split() if word.isdigit() or word in NUMBER_WORDS]
+
+def is_near_duplicate(a: str, b: str) -> bool:
+    """
+    True when normalized `a` and `b` are the same line, give or take a transcription wobble.
+
+    Lines whose numbers differ are never duplicates: "I rolled a 12" after "I rolled a 17"
+    is a new roll, not a loop.
+    """
+    if a == b:
+        return True
+    if not a or not b or numbers_in(a) != numbers_in(b):
+        return False
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    return matcher.real_quick_ratio() >= NEAR_DUPLICATE_RATIO and matcher.ratio() >= NEAR_DUPLICATE_RATIO
+
+def collapse_repeated_sentences(text: str, min_repeats: int = DEFAULT_MIN_REPEATS) -> str:
+    """
+    'Thank you. Thank you. Thank you.' -> 'Thank you.'
+
+    Only a run of at least `min_repeats` identical consecutive sentences is collapsed, so
+    "No. No." stays as it was said.
+    """
+    sentences = SENTENCE_SPLIT_PATTERN.split(text)
+    if len(sentences) < min_repeats:
+        return text
+    kept, run = [], []
+    for sentence in sentences + [None]:
+        key = normalize(sentence) if sentence is not None else None
+        if run and key and key == normalize(run[0]):
+            run.append(sentence)
+            continue
+        kept += run[:1] if len(run) >= min_repeats else run
+        run = [sentence]
+    return " ".join(kept)
+
+def drop_repeats(records, repeat_window: float = DEFAULT_REPEAT_WINDOW, min_repeats: int = DEFAULT_MIN_REPEATS):
+    """
+    Collapse Whisper repetition loops: a speaker saying the same line over and over.
+
+    A loop is a run of one speaker's consecutive segments that are the same line (see
+    is_near_duplicate), each starting within `repeat_window` seconds of the one before.
+    Only runs of at least `min_repeats` segments are collapsed, to their first segment;
+    anything shorter is real speech and passes through. Each speaker is compared only with
+    their own segments, so a loop on one quiet track is caught even when other speakers
+    talk in between.
+
+    A repeat is held back until its run is long enough or ends, which is never more than
+    `min_repeats` segments of one speaker; everything after it waits too, so the output
+    keeps the input's order.
+    """
+    pending = deque()  # [record, keep]: keep is None while undecided
+    runs = {}          # speaker -> (normalized text, last start, the run's entries)
+
+    def close(run):
+        for entry in run[2][1:]:
+            if entry[1] is None:
+                entry[1] = True
+
+    for record in records:
+        text = collapse_repeated_sentences(record["text"], min_repeats)
+        key = normalize(text)
+        entry = [{**record, "text": text}, None]
+        run = runs.get(record["speaker"])
+        if run and record["start"] - run[1] <= repeat_window and is_near_duplicate(key, run[0]):
+            run[2].append(entry)
+            if len(run[2]) >= min_repeats:
+                for repeat in run[2][1:]:
+                    repeat[1] = False
+            runs[record["speaker"]] = (run[0], record["start"], run[2])
+        else:
+            if run:
+                close(run)
+            entry[1] = True
+            runs[record["speaker"]] = (key, record["start"], [entry])
+        # A run nobody can join any more is over.
+        for speaker, other in list(runs.items()):
+            if record["start"] - other[1] > repeat_window:
+                close(other)
+                del runs[speaker]
+        pending.append(entry)
+        while pending and pending[0][1] is not None:
+            done, keep = pending.popleft()
+            if keep:
+                yield done
+
+    for run in runs.values():
+        close(run)
+    for done, keep in pending:
+        if keep:
+            yield done
+
+# === Merging ===
+def merge_turns(records, merge_gap: float = DEFAULT_MERGE_GAP, max_chars: int = DEFAULT_MAX_LINE_CHARS):
+    """Coalesce consecutive same-speaker records less than `merge_gap` seconds apart into one."""
+    current = None
+    for record in records:
+        if (
+            current is not None
+            and record["speaker"] == current["speaker"]
+            and record["start"] - current["end"] <= merge_gap
+            and len(current["text"]) + len(record["text"]) < max_chars
+        ):
+            current["text"] = f"{current['text']} {record['text']}"
+            current["end"] = max(current["end"], record["end"])
+            continue
+        if current is not None:
+            yield current
+        current = dict(record)
+    if current is not None:
+        yield current
+
+def compact_records(records, merge_gap: float = DEFAULT_MERGE_GAP, repeat_window: float = DEFAULT_REPEAT_WINDOW,
+                    min_repeats: int = DEFAULT_MIN_REPEATS):
+    return merge_turns(drop_repeats(records, repeat_window, min_repeats), merge_gap)
+
+# === Token Accounting ===
+def load_encoding(model_name: str = "gpt-4o-mini"):
+    import tiktoken
+    return tiktoken.encoding_for_model(model_name)
+
+class TokenTally:
+    """Counts tokens of records as they stream past, without holding the transcript."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.tokens = 0
+        self.lines = 0
+
+    def count(self, records):
+        for record in records:
+            self.tokens += len(self.encoding.encode(format_processed_line(record))) + 1
+            self.lines += 1
+            yield record
+
+# === File Compaction ===
+def compact_file(input_path, output_path=None, merge_gap: float = DEFAULT_MERGE_GAP,
+                 repeat_window: float = DEFAULT_REPEAT_WINDOW, encoding=None,
+                 min_repeats: int = DEFAULT_MIN_REPEATS) -> dict:
+    """
+    Compact a processed transcript, in place unless `output_path` is given.
+
+    Reads the structured segment file next to the transcript when there is one and writes
+    a compacted one next to the output. Returns line and token counts before and after.
+    """
+    input_path = Path(input_path)
+    output_path = Path(output_path or input_path)
+    segments_file = segments_path_for(input_path)
+    structured = segments_file.exists()
+
+    if structured:
+        records = iter_segments(segments_file)
+    else:
+        f = input_path.open("r", encoding="utf-8")
+        records = parse_processed_lines(f)
+
+    before = TokenTally(encoding) if encoding else None
+    after = TokenTally(encoding) if encoding else None
+    if before:
+        records = before.count(records)
+    compacted = compact_records(records, merge_gap, repeat_window, min_repeats)
+    if after:
+        compacted = after.count(compacted)
+
+    # Written beside the output and swapped in at the end, so compacting in place is safe.
+    tmp_text = output_path.with_name(output_path.name + ".tmp")
+    tmp_segments = segments_path_for(output_path).with_name(segments_path_for(output_path).name + ".tmp")
+    count = 0
+    try:
+        with tmp_text.open("w", encoding="utf-8") as out:
+            records_out = tmp_segments.open("w", encoding="utf-8") if structured else None
+            try:
+                for record in compacted:
+                    out.write(("\n" if count else "") + format_processed_line(record))
+                    if records_out:
+                        records_out.write(segment_record_line(record))
+                    count += 1
+            finally:
+                if records_out:
+                    records_out.close()
+    finally:
+        if not structured:
+            f.close()
+
+    os.replace(tmp_text, output_path)
+    if structured:
+        os.replace(tmp_segments, segments_path_for(output_path))
+
+    stats = {"lines_after": count}
+    if before:
+        stats.update(lines_before=before.lines, tokens_before=before.tokens, tokens_after=after.tokens)
+    return stats
+
+def format_savings(stats: dict) -> str:
+    if "tokens_before" not in stats:
+        return f"🗜️ Compacted to {stats['lines_after']} lines."
+    saved = stats["tokens_before"] - stats["tokens_after"]
+    percent = 100 * saved / stats["tokens_before"] if stats["tokens_before"] else 0.0
+    return (f"🗜️ Compacted {stats['lines_before']} → {stats['lines_after']} lines, "
+            f"{stats['tokens_before']:,} → {stats['tokens_after']:,} tokens ({percent:.1f}% saved)")
+
+# === Main Execution ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compact a processed transcript to save summary tokens.")
+    parser.add_argument("--input", help="Processed transcript (default: the newest one in the transcript folder).")
+    parser.add_argument("--output", help="Where to write (default: compact in place).")
+    parser.add_argument("--merge-gap", type=float, default=None, help="Seconds between same-speaker lines to merge.")
+    parser.add_argument("--repeat-window", type=float, default=None, help="Seconds between repeats of a line that make a loop.")
+    parser.add_argument("--min-repeats", type=int, default=None, help="Repeats in a row before a loop is collapsed.")
+    args = parser.parse_args(argv)
+
+    with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    input_path = Path(args.input) if args.input else latest_processed_transcript(config["local_transcript_dir"])
+    if input_path is None:
+        raise FileNotFoundError(f"No processed transcript found in {config['local_transcript_dir']}")
+    merge_gap = args.merge_gap if args.merge_gap is not None else config.get("compact_merge_gap_seconds", DEFAULT_MERGE_GAP)
+    repeat_window = args.repeat_window if args.repeat_window is not None else config.get("compact_repeat_window_seconds", DEFAULT_REPEAT_WINDOW)
+
+    min_repeats = args.min_repeats if args.min_repeats is not None else config.get("compact_min_repeats", DEFAULT_MIN_REPEATS)
+
+    stats = compact_file(input_path, args.output, merge_gap, repeat_window, encoding=load_encoding(), min_repeats=min_repeats)
+    print(format_savings(stats))
+    print(f"✅ Compaction complete. Saved to {args.output or input_path}")
+
+if __name__ == "__main__":
+    main()
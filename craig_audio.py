@@ -0,0 +1,763 @@
+"""
+Craig Audio Layer - The Dungeon Scribe
+
+Helpers for reading speaker tracks out of a Craig bot .zip without unpacking it to disk.
+Each zip member is streamed straight into an ffmpeg pipe and decoded to 16 kHz mono float32,
+which is the format Whisper works on internally. The one exception is an .m4a/.mp4 member
+whose index comes after its audio: ffmpeg cannot read that from a pipe, so such a member
+alone is copied to a temporary file and decoded from there. A track can be decoded whole, or
+read from the pipe in blocks and cut into speech windows (see Windowed Tracks), which keeps
+memory flat however long the session ran.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import bisect
+import hashlib
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+# Whisper resamples everything to 16 kHz mono, so decoding straight to that format
+# means the buffer can be handed to model.transcribe() without another ffmpeg pass.
+SAMPLE_RATE = 16000
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".ogg", ".m4a", ".flac")
+ZIP_READ_CHUNK = 1024 * 1024
+
+# MP4-family containers keep their index in a "moov" box. When it is written after the audio
+# ("mdat"), as ffmpeg and most encoders do by default, the file can only be decoded by seeking.
+MP4_EXTENSIONS = (".m4a", ".mp4")
+
+# Seconds of audio read from ffmpeg per block when a track is streamed instead of decoded whole.
+DECODE_CHUNK_SECONDS = 30
+SAMPLES_PER_MS = SAMPLE_RATE // 1000
+
+# A window that has to split continuous audio ends at the quietest 20 ms frame of its last
+# few seconds instead of at the exact limit.
+CUT_SEARCH_SECONDS = 3.0
+CUT_FRAME_SAMPLES = SAMPLE_RATE // 50
+
+# === Zip Members ===
+def list_zip_audio_members(zip_path: str, extensions=AUDIO_EXTENSIONS) -> list[zipfile.ZipInfo]:
+    """Return the audio members of a Craig zip, sorted by name (reads only the central directory)."""
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        members = [
+            info for info in zip_ref.infolist()
+            if not info.is_dir() and info.filename.lower().endswith(extensions)
+        ]
+    return sorted(members, key=lambda info: info.filename)
+
+def track_name(member_name: str) -> str:
+    """Discord username for a track, matching Path(file).stem of an extracted file."""
+    return Path(member_name).stem
+
+def mp4_index_first(stream) -> bool:
+    """
+    True when an MP4 stream's moov box comes before its mdat box, so ffmpeg can decode it
+    from a pipe. Reads box headers only, skipping over the (small) boxes in between.
+    """
+    while True:
+        header = stream.read(8)
+        if len(header) < 8:
+            return False
+        size, kind = struct.unpack(">I4s", header)
+        if kind == b"moov":
+            return True
+        if kind == b"mdat" or size == 0:  # size 0: the box runs to the end of the file
+            return False
+        if size == 1:
+            extended = stream.read(8)
+            if len(extended) < 8:
+                return False
+            size = struct.unpack(">Q", extended)[0] - 8
+        if size < 8:
+            return False
+        stream.seek(size - 8, os.SEEK_CUR)
+
+def member_streamable(zip_ref: zipfile.ZipFile, member_name: str) -> bool:
+    """Whether a zip member can be piped into ffmpeg; only MP4 containers ever need seeking."""
+    if not member_name.lower().endswith(MP4_EXTENSIONS):
+        return True
+    with zip_ref.open(member_name) as member:
+        return mp4_index_first(member)
+
+@contextmanager
+def zip_member_input(zip_path: str, member_name: str):
+    """
+    The ffmpeg input for a zip member, as (input_arg, stream): the member itself on a pipe,
+    or, for a container that needs seeking, a temporary copy that is deleted afterwards.
+    """
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        if member_streamable(zip_ref, member_name):
+            with zip_ref.open(member_name) as member:
+                yield "pipe:0", member
+            return
+
+        with zip_ref.open(member_name) as member, tempfile.NamedTemporaryFile(
+                suffix=Path(member_name).suffix, delete=False) as tmp:
+            shutil.copyfileobj(member, tmp, ZIP_READ_CHUNK)
+    try:
+        yield tmp.name, None
+    finally:
+        os.unlink(tmp.name)
+
+# === Decoding ===
+def _start_ffmpeg(input_arg: str, stream=None, sample_rate: int = SAMPLE_RATE):
+    cmd = ["ffmpeg"] + (["-nostdin"] if stream is None else []) + [
+        "-loglevel", "error", "-threads", "0",
+        "-i", input_arg,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate),
+        "pipe:1",
+    ]
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE if stream is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    feeder = None
+    if stream is not None:
+        def feed():
+            try:
+                shutil.copyfileobj(stream, proc.stdin, ZIP_READ_CHUNK)
+            except (BrokenPipeError, ValueError):
+                pass  # ffmpeg exited early; the return code below reports why
+            finally:
+                try:
+                    proc.stdin.close()
+                except BrokenPipeError:
+                    pass
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+    return proc, feeder
+
+def _finish_ffmpeg(proc, feeder):
+    if feeder is not None:
+        feeder.join()
+    stderr = proc.stderr.read()
+    proc.wait()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to decode audio: {stderr.decode(errors='ignore').strip()}")
+
+def _ffmpeg_decode(input_arg: str, stream=None, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    proc, feeder = _start_ffmpeg(input_arg, stream, sample_rate)
+    pcm = proc.stdout.read()
+    _finish_ffmpeg(proc, feeder)
+    return pcm_to_float32(np.frombuffer(pcm, np.int16))
+
+def iter_decoded_chunks(input_arg: str, stream=None, chunk_seconds: float = DECODE_CHUNK_SECONDS,
+                        sample_rate: int = SAMPLE_RATE):
+    """
+    Decode through ffmpeg like _ffmpeg_decode(), yielding float32 blocks of `chunk_seconds`
+    as they come out of the pipe, so only one block of the track is in memory at a time.
+    Closing the generator early stops ffmpeg.
+    """
+    proc, feeder = _start_ffmpeg(input_arg, stream, sample_rate)
+    chunk_bytes = int(chunk_seconds * sample_rate) * 2
+    try:
+        while True:
+            pcm = proc.stdout.read(chunk_bytes)
+            if not pcm:
+                break
+            yield pcm_to_float32(np.frombuffer(pcm, np.int16))
+    except GeneratorExit:
+        proc.kill()
+        if feeder is not None:
+            feeder.join()
+        proc.wait()
+        raise
+    _finish_ffmpeg(proc, feeder)
+
+def decode_audio_stream(stream, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Decode a binary file-like object to 16 kHz mono float32 through an ffmpeg pipe.
+
+    The input is fed to ffmpeg from a background thread while the decoded samples are read
+    back, so neither the compressed member nor the raw audio ever touches the disk.
+    Containers that need seeking (e.g. .m4a with a trailing moov atom) cannot be piped;
+    zip_member_input() decides which members can.
+    """
+    return _ffmpeg_decode("pipe:0", stream=stream, sample_rate=sample_rate)
+
+def decode_audio_file(file_path: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode a file on disk to 16 kHz mono float32, exactly like whisper.load_audio()."""
+    return _ffmpeg_decode(str(file_path), sample_rate=sample_rate)
+
+def pcm_to_float32(pcm: np.ndarray) -> np.ndarray:
+    """Normalize int16 PCM the same way whisper.load_audio() does."""
+    return pcm.astype(np.float32) / 32768.0
+
+# === Streaming ===
+class PipelineCancelled(Exception):
+    """Raised by a pipeline stage once its cancel event is set."""
+
+def check_cancelled(cancel):
+    if cancel is not None and cancel.is_set():
+        raise PipelineCancelled("Cancelled.")
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+def pipelined(items, fn=None, workers: int = 1, ahead: int = 1, cancel=None):
+    """
+    Apply `fn` to items on `workers` background threads, yielding the results in input order.
+
+    Items are taken from `items` one at a time (a generator is only advanced by one thread at
+    once), so the work done inside `fn` overlaps with whatever the caller does with the
+    previous result. Backpressure: a thread takes the next item only while fewer than `ahead`
+    results are waiting or being prepared beyond the one the caller holds, so at most
+    `ahead + 1` results are alive at once. Setting the `cancel` event stops the threads at
+    the next item and raises PipelineCancelled in the caller.
+    """
+    slots = threading.Semaphore(max(1, ahead) + 1)
+    stop = threading.Event()
+    source = iter(items)
+    source_lock = threading.Lock()
+    results = {}
+    ready = threading.Condition()
+    taken = 0
+    total = None  # number of items, once the source is exhausted
+
+    def stopped() -> bool:
+        return stop.is_set() or (cancel is not None and cancel.is_set())
+
+    def finish(index: int, result):
+        with ready:
+            results[index] = result
+            ready.notify_all()
+
+    def worker():
+        nonlocal taken, total
+        while True:
+            while not slots.acquire(timeout=0.1):
+                if stopped():
+                    return
+            with source_lock:
+                if stopped() or total is not None:
+                    slots.release()
+                    return
+                index = taken
+                try:
+                    item = next(source)
+                except StopIteration:
+                    with ready:
+                        total = index
+                        ready.notify_all()
+                    slots.release()
+                    return
+                except Exception as e:
+                    with ready:
+                        total = index + 1
+                    finish(index, _Failure(e))
+                    return
+                taken += 1
+            try:
+                result = fn(item) if fn is not None else item
+            except Exception as e:
+                result = _Failure(e)
+            del item
+            finish(index, result)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, workers))]
+    for thread in threads:
+        thread.start()
+    try:
+        index = 0
+        while True:
+            with ready:
+                while index not in results and (total is None or index < total):
+                    check_cancelled(cancel)
+                    ready.wait(timeout=0.1)
+                if index not in results:
+                    return
+                result = results.pop(index)
+            if isinstance(result, _Failure):
+                raise result.error
+            yield result
+            del result
+            slots.release()  # the caller is done with this one; let a thread start another
+            index += 1
+    finally:
+        # Let the threads exit if the caller stopped early or cancelled.
+        stop.set()
+
+def decode_zip_member(zip_path: str, member_name: str) -> np.ndarray:
+    """Decode a single member of a Craig zip, e.g. inside a worker process."""
+    with zip_member_input(zip_path, member_name) as (input_arg, stream):
+        return _ffmpeg_decode(input_arg, stream)
+
+def zip_track_sources(zip_path: str, extensions=AUDIO_EXTENSIONS) -> list[tuple[str, str]]:
+    """(zip_path, member_name) sources for every audio track, for decoding in another process."""
+    return [(zip_path, info.filename) for info in list_zip_audio_members(zip_path, extensions)]
+
+def load_track_source(source) -> tuple[str, np.ndarray]:
+    """Decode a track source: a file path, or a (zip_path, member_name) pair."""
+    if isinstance(source, tuple):
+        zip_path, member_name = source
+        return track_name(member_name), decode_zip_member(zip_path, member_name)
+    return track_name(source), decode_audio_file(source)
+
+def iter_source_chunks(source, chunk_seconds: float = DECODE_CHUNK_SECONDS):
+    """Decoded blocks of a track source, for tracks too long to hold whole (see iter_decoded_chunks)."""
+    if isinstance(source, tuple):
+        with zip_member_input(*source) as (input_arg, stream):
+            yield from iter_decoded_chunks(input_arg, stream, chunk_seconds)
+    else:
+        yield from iter_decoded_chunks(str(source), chunk_seconds=chunk_seconds)
+
+def array_chunks(audio: np.ndarray, chunk_seconds: float = DECODE_CHUNK_SECONDS):
+    """An already decoded track as blocks, so it can go through the same streaming code."""
+    step = int(chunk_seconds * SAMPLE_RATE)
+    for start in range(0, len(audio), step):
+        yield audio[start:start + step]
+
+def source_track_name(source) -> str:
+    """Discord username for a track source."""
+    return track_name(source[1] if isinstance(source, tuple) else source)
+
+def track_source_size(source) -> int:
+    """Encoded size of a track in bytes, used as a cheap proxy for its duration."""
+    if isinstance(source, tuple):
+        zip_path, member_name = source
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            return zip_ref.getinfo(member_name).file_size
+    return os.path.getsize(source)
+
+def hash_track_source(source) -> str:
+    """SHA-256 of a track's encoded bytes, read in chunks without decoding."""
+    digest = hashlib.sha256()
+    if isinstance(source, tuple):
+        zip_path, member_name = source
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref, zip_ref.open(member_name) as member:
+            for chunk in iter(lambda: member.read(ZIP_READ_CHUNK), b""):
+                digest.update(chunk)
+    else:
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(ZIP_READ_CHUNK), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+# === Speech Detection ===
+# A vectorized port of pydub.silence.detect_nonsilent(seek_step=1). pydub slides a window of
+# `min_silence_len` ms forward one millisecond at a time and computes audioop.rms for every
+# position in a Python loop; here the per-millisecond energies are summed with NumPy, one block
+# at a time, and the same rms/threshold/merge rules are applied so the offsets match exactly.
+# The scan is fed block by block, so a track can be scanned while it is being decoded.
+DETECT_BLOCK_MS = 60_000
+
+class SilenceScanner:
+    """
+    detect_nonsilent() over a 16 kHz float32 track fed in blocks of any size.
+
+    feed() returns the [start_ms, end_ms] speech intervals settled by that block and
+    finish() the rest; together they give exactly what a scan of the whole track would.
+    An interval is returned as soon as the silence after it begins, and pending_speech()
+    tells what is known of the one still open. Only the last `min_silence_len` ms of
+    energies are carried between blocks.
+    """
+
+    def __init__(self, silence_thresh=-50, min_silence_len=100):
+        self.min_silence_len = min_silence_len
+        self.thresh = (10 ** (silence_thresh / 20)) * 32768  # db_to_float() * max_possible_amplitude
+        self.samples = 0
+        self._leftover = np.zeros(0, dtype=np.float32)  # samples short of a whole millisecond
+        self._scanned_ms = 0
+        self._tail = np.zeros(0, dtype=np.int64)        # energies the next window still needs
+        self._windows = 0                               # window starts (ms) scanned so far
+        self._run_open = False                          # the last window scanned was silent
+        self._silent = None                             # [first, last] window of the last silent range
+
+    def feed(self, audio: np.ndarray) -> list[list[int]]:
+        self.samples += len(audio)
+        if len(self._leftover):
+            audio = np.concatenate((self._leftover, audio))
+        whole = len(audio) // SAMPLES_PER_MS * SAMPLES_PER_MS
+        self._leftover = audio[whole:].copy()
+        return self._scan(audio[:whole])
+
+    def finish(self) -> list[list[int]]:
+        msl = self.min_silence_len
+        seg_len = round(1000 * (self.samples / SAMPLE_RATE))
+        if seg_len < msl:
+            return [[0, seg_len]]
+
+        speech = []
+        if seg_len > self._scanned_ms:
+            # pydub pads the final slice with silence; zero padding does the same.
+            last = np.zeros(SAMPLES_PER_MS, dtype=np.float32)
+            last[:len(self._leftover)] = self._leftover
+            speech += self._scan(last)
+        if self._run_open:
+            self._close_run(self._windows - 1)
+
+        if self._silent is None:
+            speech.append([0, seg_len])
+        elif self._silent[1] + msl != seg_len:
+            speech.append([self._silent[1] + msl, seg_len])
+        return speech
+
+    def pending_speech(self) -> tuple[int, int]:
+        """
+        What is known of the speech not returned yet, as (start, certain) in ms: none of it
+        starts before `start`, and when `certain` > `start` the audio from `start` to
+        `certain` is speech, the beginning of the next interval returned.
+        """
+        msl = self.min_silence_len
+        if self._silent is None:
+            return 0, self._windows
+        if self._run_open:
+            at = self._windows - 1 + msl  # the silence lasts at least this long
+            return at, at
+        end = self._silent[1] + msl
+        # A silent window from here on no longer joins the last silent range.
+        return end, self._windows if self._windows > end else end
+
+    def _scan(self, audio: np.ndarray) -> list[list[int]]:
+        msl = self.min_silence_len
+        pcm = (audio * 32768).astype(np.int64)
+        energy = (pcm * pcm).reshape(-1, SAMPLES_PER_MS).sum(axis=1)
+        self._scanned_ms += len(energy)
+        energy = np.concatenate((self._tail, energy))
+        n_windows = len(energy) - msl + 1
+        if n_windows <= 0:
+            self._tail = energy
+            return []
+
+        cumulative = np.concatenate(([0], np.cumsum(energy)))
+        window_sums = cumulative[msl:] - cumulative[:-msl]
+        rms = np.floor(np.sqrt(window_sums / (msl * SAMPLES_PER_MS)))
+        silent = rms <= self.thresh
+        self._tail = energy[n_windows:]
+        base = self._windows
+        self._windows += n_windows
+        return self._runs(silent, base)
+
+    def _runs(self, silent: np.ndarray, base: int) -> list[list[int]]:
+        """Follow the runs of silent window starts, holding open a run that may continue."""
+        speech = []
+        if self._run_open and not silent[0]:
+            self._close_run(base - 1)
+        edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1).tolist()
+        ends = (np.flatnonzero(edges == -1) - 1).tolist()
+        for start, end in zip(starts, ends):
+            if not self._run_open:
+                speech += self._open_run(base + start)
+            if end < len(silent) - 1:
+                self._close_run(base + end)  # otherwise the run may continue into the next block
+        return speech
+
+    def _open_run(self, first: int) -> list[list[int]]:
+        """
+        A run of silent windows starts. Runs less than `min_silence_len` apart merge into one
+        silent range, like detect_silence(); a run that starts a new range settles the speech
+        before it.
+        """
+        self._run_open = True
+        msl = self.min_silence_len
+        if self._silent is not None and first <= self._silent[1] + msl:
+            return []
+        if self._silent is None:
+            speech = [[0, first]] if first > 0 else []  # a track that starts silent has none
+        else:
+            speech = [[self._silent[1] + msl, first]]
+        self._silent = [first, None]
+        return speech
+
+    def _close_run(self, last: int):
+        self._run_open = False
+        self._silent[1] = last
+
+def iter_nonsilent_ranges(audio: np.ndarray, silence_thresh=-50, min_silence_len=100):
+    """
+    Lazily yield [start_ms, end_ms] speech intervals of a 16 kHz float32 track.
+
+    Matches pydub.silence.detect_nonsilent(min_silence_len=..., silence_thresh=...) on the
+    same audio. Because the scan is a generator, taking only the first interval stops as
+    soon as it is known instead of scanning the whole multi-hour track.
+    """
+    scanner = SilenceScanner(silence_thresh, min_silence_len)
+    for block in array_chunks(audio, DETECT_BLOCK_MS / 1000):
+        yield from scanner.feed(block)
+    yield from scanner.finish()
+
+def detect_nonsilent_ranges(audio: np.ndarray, silence_thresh=-50, min_silence_len=100) -> list[list[int]]:
+    """All speech intervals of a track in milliseconds."""
+    return list(iter_nonsilent_ranges(audio, silence_thresh, min_silence_len))
+
+def detect_first_onset(audio: np.ndarray, silence_thresh=-50, min_silence_len=100) -> float:
+    """Seconds until the first non-silent audio, stopping at the first interval found."""
+    first = next(iter_nonsilent_ranges(audio, silence_thresh, min_silence_len), None)
+    return first[0] / 1000 if first else 0.0
+
+# === Speech Gating ===
+# Each Craig track holds a single speaker and is mostly silence. Cutting a track down to its
+# padded speech regions before Whisper skips that silence; the timeline records where each kept
+# region came from so segment timestamps can be mapped back onto the full track.
+def pad_regions(ranges, duration: float, pad=0.4) -> list[tuple[float, float]]:
+    """Pad [start_ms, end_ms] speech intervals into (start, end) regions in seconds, merging overlaps."""
+    regions = []
+    for start_ms, end_ms in ranges:
+        start = max(0.0, start_ms / 1000 - pad)
+        end = min(duration, end_ms / 1000 + pad)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+def speech_regions(audio: np.ndarray, silence_thresh=-50, min_silence_len=500, pad=0.4) -> list[tuple[float, float]]:
+    """Padded (start, end) speech regions in seconds, with overlapping regions merged."""
+    return pad_regions(iter_nonsilent_ranges(audio, silence_thresh, min_silence_len), len(audio) / SAMPLE_RATE, pad)
+
+class SpeechTimeline:
+    """Where each kept region of a gated track came from: (gated_start, original_start, duration) in seconds."""
+
+    def __init__(self, entries: list[tuple[float, float, float]]):
+        self.entries = entries
+        self.starts = [entry[0] for entry in entries]
+
+    def to_original(self, t: float, end: bool = False) -> float:
+        """Map a time in the gated audio back to the original track timeline."""
+        if not self.entries:
+            return t
+        # An end time that lands exactly on a join belongs to the region before it.
+        i = (bisect.bisect_left(self.starts, t) if end else bisect.bisect_right(self.starts, t)) - 1
+        gated_start, original_start, duration = self.entries[max(i, 0)]
+        return original_start + min(max(t - gated_start, 0.0), duration)
+
+# === Windowed Tracks ===
+# A multi-hour track is never held whole, and it is decoded only once. Its blocks are read as the
+# windows need them; on the way in, every block goes through the onset and speech scanners, and
+# it is kept only while part of it may still fall in a speech region. The regions are cut out of
+# the kept blocks and packed into windows, each with the SpeechTimeline that maps its times back
+# onto the track.
+class TrackScan:
+    """
+    One read of a track's decoded blocks for detect_first_onset(), speech_regions() (with
+    their usual defaults) and pack_speech().
+
+    `regions` holds the padded, merged speech regions found so far as [start, end] seconds
+    (the whole track when not gating). A region is settled once nothing read later can
+    change it; until then its end is a lower bound and it may still grow. Blocks are held
+    from the packer's position on (see keep()) and, ahead of it, only from where the next
+    region may still start, so long silences are dropped as they are read.
+    """
+
+    def __init__(self, chunks, gate: bool = True, pad=0.4, silence_thresh=-50, onset_min_silence=100,
+                 region_min_silence=500):
+        self._chunks = iter(chunks)
+        self.gate = gate
+        self.pad = pad
+        self._onset_scan = SilenceScanner(silence_thresh, onset_min_silence)
+        self._region_scan = SilenceScanner(silence_thresh, region_min_silence) if gate else None
+        self.onset = None
+        self.regions = []
+        self._growing = False  # the last region ends in speech that is still being read
+        self.samples = 0
+        self.decode_seconds = 0.0
+        self.done = False
+        self._held, self._held_start = [], 0
+        self._position = (0, 0)  # the packer's region index and sample position
+
+    @property
+    def seconds(self) -> float:
+        return self.samples / SAMPLE_RATE
+
+    def read(self) -> bool:
+        """Decode and scan the next block; False once the track has ended."""
+        if self.done:
+            return False
+        started = time.perf_counter()
+        block = next(self._chunks, None)
+        self.decode_seconds += time.perf_counter() - started
+        if block is None:
+            self._finish()
+            return False
+
+        self.samples += len(block)
+        self._held.append(block)
+        if self.onset is None:
+            found = self._onset_scan.feed(block)
+            start, certain = self._onset_scan.pending_speech()
+            if found or certain > start:
+                self.onset = (found[0][0] if found else start) / 1000
+        if self.gate:
+            self._add_speech(self._region_scan.feed(block))
+        elif self.regions:
+            self.regions[0][1] = self.seconds
+        else:
+            self.regions.append([0.0, self.seconds])
+        self._drop()
+        return True
+
+    def _finish(self):
+        self.done = True
+        if self.onset is None:
+            found = self._onset_scan.finish()
+            self.onset = found[0][0] / 1000 if found else 0.0
+        if self.gate:
+            self._add_speech(self._region_scan.finish())
+        for region in self.regions:
+            region[1] = min(region[1], self.seconds)
+
+    def _add_speech(self, ranges):
+        """Pad and merge newly settled speech intervals, then the speech known so far of the next."""
+        for start_ms, end_ms in ranges:
+            self._add_region(max(0.0, start_ms / 1000 - self.pad), end_ms / 1000 + self.pad)
+        self._growing = False
+        if not self.done:
+            start_ms, certain_ms = self._region_scan.pending_speech()
+            if certain_ms > start_ms:
+                self._add_region(max(0.0, start_ms / 1000 - self.pad), certain_ms / 1000 + self.pad)
+                self._growing = True
+
+    def _add_region(self, start: float, end: float):
+        if self.regions and start <= self.regions[-1][1]:
+            self.regions[-1][1] = max(self.regions[-1][1], end)
+        else:
+            self.regions.append([start, end])
+
+    def settled(self, i: int) -> bool:
+        if self.done or i < len(self.regions) - 1:
+            return True
+        if not self.gate or self._growing:
+            return False
+        end = self.regions[i][1]
+        next_start, _ = self._region_scan.pending_speech()
+        return end <= self.seconds and next_start / 1000 - self.pad > end
+
+    def region(self, i: int):
+        """The i-th region as (start, end, settled), reading on until it is found; None past the last."""
+        while len(self.regions) <= i and self.read():
+            pass
+        if len(self.regions) <= i:
+            return None
+        start, end = self.regions[i]
+        return start, min(end, self.seconds), self.settled(i)
+
+    def find_onset(self) -> float:
+        """Seconds until the first non-silent audio, reading only as far as it."""
+        while self.onset is None:
+            self.read()
+        return self.onset
+
+    def speech_fraction(self) -> float:
+        return sum(end - start for start, end in self.regions) / max(self.seconds, 1 / SAMPLE_RATE)
+
+    def keep(self, i: int, position: int):
+        """The packer is at `position` (samples) in region `i`; nothing before it is needed again."""
+        self._position = (i, position)
+        self._drop()
+
+    def _drop(self):
+        i, need = self._position
+        if i < len(self.regions):
+            need = max(need, int(self.regions[i][0] * SAMPLE_RATE))
+        elif self.gate and not self.done:
+            next_start, _ = self._region_scan.pending_speech()
+            need = max(need, int(max(0.0, next_start / 1000 - self.pad) * SAMPLE_RATE))
+        while self._held and self._held_start + len(self._held[0]) <= need:
+            self._held_start += len(self._held.pop(0))
+
+    def cut(self, lo: int, hi: int) -> np.ndarray:
+        """Samples [lo, hi) of the track, reading on as far as `hi`; shorter if the track ends first."""
+        while self.samples < hi and self.read():
+            pass
+        parts, at = [], self._held_start
+        for block in self._held:
+            if at >= hi:
+                break
+            parts.append(block[max(lo - at, 0):hi - at])
+            at += len(block)
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+    def close(self):
+        """Stop the decoder, e.g. when the run is cancelled before the track was read to its end."""
+        self._held = []
+        close = getattr(self._chunks, "close", None)
+        if close is not None:
+            close()
+
+def quietest_cut(audio: np.ndarray, search_seconds: float = CUT_SEARCH_SECONDS) -> int:
+    """
+    Where to end a window that has to split continuous audio: the middle of the quietest
+    frame in its last `search_seconds` (at most half the window), so the cut falls in a pause
+    between words rather than through one. Returns a sample count into `audio`.
+    """
+    search = min(int(search_seconds * SAMPLE_RATE), len(audio) // 2) // CUT_FRAME_SAMPLES * CUT_FRAME_SAMPLES
+    if search <= 0:
+        return len(audio)
+    tail = audio[len(audio) - search:].astype(np.float64)
+    energy = (tail * tail).reshape(-1, CUT_FRAME_SAMPLES).sum(axis=1)
+    quietest = len(energy) - 1 - int(np.argmin(energy[::-1]))  # the latest of equally quiet frames
+    return len(audio) - search + quietest * CUT_FRAME_SAMPLES + CUT_FRAME_SAMPLES // 2
+
+def pack_speech(track: TrackScan, window_seconds: float):
+    """
+    Cut the speech regions out of a track as it is read and pack whole regions greedily into
+    windows of at most `window_seconds`. A longer region is split, each part ending at the
+    quietest frame near the window limit (see quietest_cut()).
+
+    Yields (audio, timeline) per window as soon as it is settled: its regions have ended, or
+    the region being split runs on past the window. The windows are exactly those of the
+    regions of the whole track, packed after the fact.
+    """
+    pieces, entries, filled = [], [], 0.0
+
+    def window():
+        nonlocal pieces, entries, filled
+        packed = np.concatenate(pieces), SpeechTimeline(entries)
+        pieces, entries, filled = [], [], 0.0
+        return packed
+
+    try:
+        i, lo = 0, 0
+        while True:
+            track.keep(i, lo)  # anything before the next region is silence and can go
+            region = track.region(i)
+            if region is None:
+                break
+            start = region[0]
+            lo = round(start * SAMPLE_RATE)  # where the rest of a split region starts, in samples
+            while True:
+                track.keep(i, lo)
+                # Read on until the region has ended or is known to fill the window.
+                _, end, settled = track.region(i)
+                while not settled and end - start <= window_seconds:
+                    track.read()
+                    _, end, settled = track.region(i)
+                if end - start <= 1 / SAMPLE_RATE:
+                    break
+                length = min(end - start, window_seconds)
+                if filled + length > window_seconds and pieces:
+                    yield window()
+                piece = track.cut(lo, round((start + length) * SAMPLE_RATE))
+                if end - start > window_seconds and len(piece):
+                    piece = piece[:quietest_cut(piece)]
+                    length = len(piece) / SAMPLE_RATE
+                entries.append((filled, start, len(piece) / SAMPLE_RATE))
+                pieces.append(piece)
+                filled += len(piece) / SAMPLE_RATE
+                if not len(piece):
+                    break  # the track ended early
+                lo += len(piece)
+                start += length
+            i += 1
+        if pieces:
+            yield window()
+    finally:
+        track.close()
@@ -0,0 +1,106 @@
+"""
+Cross-Track Bleed Dedup - The Dungeon Scribe
+
+A player without headphones has everyone else's voices leaking into their mic, so Whisper
+transcribes the same sentence on two tracks and it shows up twice in the merged transcript
+under two speakers. This stage finds those copies and keeps only the original.
+
+Segments arrive time-sorted from the k-way track merge. A sweep line keeps an index of the
+segments still active (whose end is not yet behind the current start, plus a small timing
+tolerance), so each segment is only compared with the handful of segments that overlap it
+on other tracks: O(n log n) overall for tens of thousands of segments instead of a pairwise
+pass. Of two overlapping segments with near-identical text, the one from the more confident
+track is kept; a bled copy is quieter and noisier, which shows up as a lower average log
+probability and a higher no-speech probability.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import heapq
+import re
+from collections import deque
+from difflib import SequenceMatcher
+
+DEFAULT_SIMILARITY = 0.8
+DEFAULT_TOLERANCE = 1.0  # seconds of timestamp drift allowed between the two copies
+# Short lines ("Yes.", "Okay.", "Nat 20!") are often really said by several players at once, so
+# a line needs at least this many words on both tracks before it can count as a bleed copy.
+MIN_BLEED_WORDS = 3
+
+NORMALIZE_PATTERN = re.compile(r"[^a-z0-9]+")
+
+def normalize(text: str) -> str:
+    return NORMALIZE_PATTERN.sub(" ", text.lower()).strip()
+
+def is_bleed_copy(a: str, b: str, similarity: float = DEFAULT_SIMILARITY) -> bool:
+    """
+    Near-identical normalized text, or one side a partial copy (substring) of the other.
+    Either way, both lines need MIN_BLEED_WORDS words.
+    """
+    shorter, longer = (a, b) if len(a) <= len(b) else (b, a)
+    if len(shorter.split()) < MIN_BLEED_WORDS:
+        return False
+    if a == b or f" {shorter} " in f" {longer} ":
+        return True
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    return matcher.real_quick_ratio() >= similarity and matcher.quick_ratio() >= similarity and matcher.ratio() >= similarity
+
+def confidence(seg: dict) -> tuple:
+    """Sort key for which copy to keep: higher avg_logprob, then lower no_speech_prob, then longer text."""
+    avg_logprob = seg.get("avg_logprob")
+    no_speech_prob = seg.get("no_speech_prob")
+    return (
+        avg_logprob if avg_logprob is not None else float("-inf"),
+        -no_speech_prob if no_speech_prob is not None else float("-inf"),
+        len(seg["text"]),
+    )
+
+def dedupe_bleed(segments, similarity: float = DEFAULT_SIMILARITY, tolerance: float = DEFAULT_TOLERANCE,
+                 speaker_key: str = "discord_user", stats: dict = None):
+    """
+    Drop bleed copies from a time-sorted stream of segments from all tracks.
+
+    A generator that yields the surviving segments in the same order. A segment is held back
+    only until the sweep has passed its end (plus `tolerance`), since no later segment can
+    overlap it after that; everything earlier has already been written downstream. If
+    `stats` is given, its "dropped" count is updated.
+    """
+    pending = deque()  # [seg, normalized text, dropped] in start order, awaiting output
+    active = []        # heap of (end, seq, entry) still able to overlap upcoming segments
+    seq = 0
+    dropped = 0
+
+    def release(before: float):
+        while pending and (pending[0][0]["end"] + tolerance < before):
+            entry = pending.popleft()
+            if not entry[2]:
+                yield entry[0]
+
+    for seg in segments:
+        start = seg["start"]
+        while active and active[0][0] + tolerance < start:
+            heapq.heappop(active)
+
+        entry = [seg, normalize(seg["text"]), False]
+        for _, _, other in active:
+            if other[2] or other[0].get(speaker_key) == seg.get(speaker_key):
+                continue
+            if not is_bleed_copy(entry[1], other[1], similarity):
+                continue
+            loser = entry if confidence(seg) < confidence(other[0]) else other
+            loser[2] = True
+            dropped += 1
+            if loser is entry:
+                break
+
+        # Segments holding the front of the queue back still need to come out in start order.
+        yield from release(start)
+        pending.append(entry)
+        if not entry[2]:
+            heapq.heappush(active, (seg["end"], seq, entry))
+            seq += 1
+
+    yield from release(float("inf"))
+    if stats is not None:
+        stats["dropped"] = stats.get("dropped", 0) + dropped
@@ -1,155 +1,352 @@
-# dnd_whole_transcript_summary.py
-
-import os
-import json
-from pathlib import Path
-from openai import OpenAI
-import tiktoken
-import logging
-
-# === Logging Setup ===
-logging.basicConfig(
-    filename="whole_summary.log",
-    level=logging.DEBUG,
-    format='%(asctime)s [%(levelname)s] %(message)s'
-)
-logger = logging.getLogger("WholeTranscriptSummary")
-
-# === Load Config ===
-CONFIG_FILE = "config.json"
-with open(CONFIG_FILE, "r") as f:
-    config = json.load(f)
-
-transcript_dir = Path(config["local_transcript_dir"])
-summary_dir = Path(config["local_summary_dir"])
-transcript_file = sorted(transcript_dir.glob("*transcript.txt"))[-1]  # Use latest transcript
-summary_file = summary_dir / transcript_file.name.replace("transcript", "summary")
-
-openai_key = config["openai_api_key"]
-openai_model = "gpt-4o-mini"
-speaker_map = config.get("speaker_map", {})
-
-# === OpenAI Setup ===
-os.environ["OPENAI_API_KEY"] = openai_key
-client = OpenAI()
-encoding = tiktoken.encoding_for_model(openai_model)
-
-def count_tokens(text: str) -> int:
-    return len(encoding.encode(text))
-
-def format_speaker_map(mapping: dict) -> str:
-    if not mapping:
-        return ""
-    lines = ["Here is the speaker mapping (Discord → Player → Character):"]
-    for discord, info in mapping.items():
-        player = info.get("player", "Unknown")
-        character = info.get("character", "Unknown")
-        lines.append(f"- {discord} = {player} ({character})")
-    return "\n".join(lines)
-
-def summarize_full_transcript(transcript: str) -> str:
-    speaker_note = format_speaker_map(speaker_map)
-    prompt = f"""
-You are a professional campaign assistant trained to analyze transcripts from high-powered, narrative-rich Pathfinder 2e campaigns. 
-
-You are generating exhaustive notes for the Dungeon Master. Prioritize clarity, evocative prose, and organization. Extract story beats, foreshadowing, unresolved threads, and social dynamics. Include anything the DM could use later for callbacks, emotional payoff, or plot advancement. If anything is ambiguous, highlight it for future clarification or elaboration.
-
-Use the following structure exactly:
-
----
-
-**🔮 Session Summary (3–5 Paragraphs)**  
-Write a vivid, story-driven recap of the session as if telling the tale to another Dungeon Master. Capture tone, pacing, key decisions, emotional beats, and world events. Mention all main player characters by name, summarizing their personal arcs and contributions. Ensure there is a clear beginning, middle, and end to the session (if applicable).
-
----
-
-**🎭 Key Character Actions and Roleplaying Moments**  
-List 5–15 notable PC actions, grouped by character name. Highlight dramatic, clever, emotional, or funny moments. Use bold formatting for character names. Describe what they did and how it shaped the narrative or other PCs/NPCs.
-
----
-
-**👥 Important NPCs and Encounters**  
-List each significant NPC or monster encountered. Include:
-- Name and role
-- Personality traits or memorable dialogue
-- Description of their relationship to the PCs (if any)
-- Encounter outcome and lingering consequences
-
----
-
-**📜 Major Plot Events and Developments**  
-List 5–10 bullet points describing the session's most important story beats. Include:
-- Quests started, advanced, or completed
-- Mysteries uncovered
-- Social, political, or academic conflicts
-- Discoveries or revelations
-- Consequences of player actions
-
----
-
-**💔 Emotional or Dramatic Beats**  
-In prose, recount emotionally charged or intense moments: bonding, conflict, sacrifice, vulnerability, or betrayal. Make it immersive, like you're writing a novel. Mention which characters were involved and what made the scene powerful.
-
----
-
-**🧩 Unresolved Threads or Potential Hooks**  
-List 5–8 questions or narrative threads the DM could explore later. Include:
-- Ominous foreshadowing
-- Strange or suspicious NPC behavior
-- Items, visions, or events that remain unexplained
-- Relationship drama or inner conflict
-- Long-term consequences set in motion
-
----
-
-**🎙️ Post Script: Funny Lines and Off-Topic Moments**  
-In a casual tone, jot down any hilarious quotes, memes, off-topic discussions, or technical shenanigans that happened during the session. Capture the table’s personality and energy for future nostalgia.
-
----
-
-{speaker_note}
-
-Transcript:
-{transcript}
-"""
-
-    messages = [
-        {"role": "system", "content": "You are a professional D&D campaign assistant creating detailed session summaries from full transcripts."},
-        {"role": "user", "content": prompt}
-    ]
-
-    logger.debug(f"=== Prompt Sent ===\n{prompt}\n")
-
-    response = client.chat.completions.create(
-        model=openai_model,
-        messages=messages,
-        temperature=0.3  # Lowered for better structure
-    )
-
-    result = response.choices[0].message.content.strip()
-    logger.debug(f"=== Summary Returned ===\n{result}\n")
-    return result
-
-def main():
-    print(f"📖 Reading transcript from: {transcript_file}")
-    with open(transcript_file, "r", encoding="utf-8") as f:
-        transcript = f.read()
-
-    token_count = count_tokens(transcript)
-    print(f"🔢 Token count: {token_count}")
-
-    if token_count > 128000:
-        raise RuntimeError("🚫 Transcript too large for gpt-4-0125-preview (128k token limit).")
-
-    print(f"🧠 Summarizing session with {openai_model}...")
-    summary = summarize_full_transcript(transcript)
-
-    summary_dir.mkdir(parents=True, exist_ok=True)
-    with open(summary_file, "w", encoding="utf-8") as f:
-        f.write(summary)
-
-    print(f"✅ Summary saved to: {summary_file}")
-    logger.info(f"✅ Summary saved to: {summary_file}")
-
-if __name__ == "__main__":
-    main()
+# dnd_whole_transcript_summary.py
+
+import os
+import json
+import asyncio
+import argparse
+from pathlib import Path
+import logging
+from logging.handlers import RotatingFileHandler
+
+import telemetry
+from llm_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_MB, DEFAULT_TTL_DAYS, LLMCache
+from segment_io import format_processed_line, iter_segments, segments_path_for
+from session_files import SUMMARY_SUFFIX, latest_processed_transcript, latest_transcript, session_of
+
+# openai and tiktoken are imported on first use (get_llm, count_tokens), so importing this
+# module or running --help does not pay for them.
+
+# === Logging Setup ===
+logger = logging.getLogger("WholeTranscriptSummary")
+
+LOG_FILE = "whole_summary.log"
+
+def setup_logging(verbose: bool = False):
+    # Full prompts and replies are logged at DEBUG, only with verbose_logging; the file rotates
+    # instead of growing with every session.
+    handler = RotatingFileHandler(LOG_FILE, maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8")
+    logging.basicConfig(
+        handlers=[handler],
+        level=logging.DEBUG if verbose else logging.INFO,
+        format='%(asctime)s [%(levelname)s] %(message)s'
+    )
+
+# === Load Config ===
+CONFIG_FILE = "config.json"
+
+def load_settings(settings: dict = None):
+    """Read config.json, or apply an already loaded config dict. main() calls this first."""
+    global config, openai_model, speaker_map, llm
+    global context_limit, chunk_tokens, chunk_overlap_tokens, summary_concurrency
+
+    if settings is None:
+        with open(CONFIG_FILE, "r") as f:
+            settings = json.load(f)
+    config = settings
+
+    openai_model = "gpt-4o-mini"
+    speaker_map = config.get("speaker_map", {})
+
+    # Sessions over the context limit are summarized in parts (map) and then combined (reduce).
+    context_limit = config.get("summary_context_tokens", 128000)
+    chunk_tokens = config.get("summary_chunk_tokens", 24000)
+    chunk_overlap_tokens = config.get("summary_chunk_overlap_tokens", 500)
+    summary_concurrency = config.get("summary_concurrency", 8)
+
+    llm = None  # built on first use with these settings
+
+load_settings({})
+
+# === OpenAI Setup ===
+_encoding = None
+
+def count_tokens(text: str) -> int:
+    global _encoding
+    if _encoding is None:
+        import tiktoken
+        _encoding = tiktoken.encoding_for_model(openai_model)
+    return len(_encoding.encode(text))
+
+def open_llm_cache() -> LLMCache | None:
+    # LLM_CACHE_BYPASS=1 forces fresh replies for one run without touching the config.
+    if not config.get("llm_cache", True) or os.environ.get("LLM_CACHE_BYPASS") == "1":
+        return None
+    return LLMCache(
+        config.get("llm_cache_path", DEFAULT_CACHE_PATH),
+        config.get("llm_cache_ttl_days", DEFAULT_TTL_DAYS),
+        config.get("llm_cache_max_mb", DEFAULT_MAX_MB),
+    )
+
+def get_llm():
+    """
+    The shared client every request goes through: bounded concurrency, TPM/RPM limits and retries.
+    openai_base_url points it at any OpenAI-compatible endpoint, e.g. a local stand-in for testing.
+    """
+    global llm
+    if llm is None:
+        from llm_client import LLMClient
+
+        llm = LLMClient(
+            openai_model,
+            api_key=config.get("openai_api_key") or None,
+            base_url=config.get("openai_base_url"),
+            max_concurrency=summary_concurrency,
+            tokens_per_minute=config.get("openai_tokens_per_minute", 200000),
+            requests_per_minute=config.get("openai_requests_per_minute", 500),
+            max_retries=config.get("openai_max_retries", 6),
+            count_tokens=count_tokens,
+            cache=open_llm_cache(),
+        )
+    return llm
+
+def format_speaker_map(mapping: dict) -> str:
+    if not mapping:
+        return ""
+    lines = ["Here is the speaker mapping (Discord → Player → Character):"]
+    for discord, info in mapping.items():
+        player = info.get("player", "Unknown")
+        character = info.get("character", "Unknown")
+        lines.append(f"- {discord} = {player} ({character})")
+    return "\n".join(lines)
+
+# === Prompts ===
+SUMMARY_INSTRUCTIONS = """You are a professional campaign assistant trained to analyze transcripts from high-powered, narrative-rich Pathfinder 2e campaigns. 
+
+You are generating exhaustive notes for the Dungeon Master. Prioritize clarity, evocative prose, and organization. Extract story beats, foreshadowing, unresolved threads, and social dynamics. Include anything the DM could use later for callbacks, emotional payoff, or plot advancement. If anything is ambiguous, highlight it for future clarification or elaboration."""
+
+SUMMARY_STRUCTURE = """Use the following structure exactly:
+
+---
+
+**🔮 Session Summary (3–5 Paragraphs)**  
+Write a vivid, story-driven recap of the session as if telling the tale to another Dungeon Master. Capture tone, pacing, key decisions, emotional beats, and world events. Mention all main player characters by name, summarizing their personal arcs and contributions. Ensure there is a clear beginning, middle, and end to the session (if applicable).
+
+---
+
+**🎭 Key Character Actions and Roleplaying Moments**  
+List 5–15 notable PC actions, grouped by character name. Highlight dramatic, clever, emotional, or funny moments. Use bold formatting for character names. Describe what they did and how it shaped the narrative or other PCs/NPCs.
+
+---
+
+**👥 Important NPCs and Encounters**  
+List each significant NPC or monster encountered. Include:
+- Name and role
+- Personality traits or memorable dialogue
+- Description of their relationship to the PCs (if any)
+- Encounter outcome and lingering consequences
+
+---
+
+**📜 Major Plot Events and Developments**  
+List 5–10 bullet points describing the session's most important story beats. Include:
+- Quests started, advanced, or completed
+- Mysteries uncovered
+- Social, political, or academic conflicts
+- Discoveries or revelations
+- Consequences of player actions
+
+---
+
+**💔 Emotional or Dramatic Beats**  
+In prose, recount emotionally charged or intense moments: bonding, conflict, sacrifice, vulnerability, or betrayal. Make it immersive, like you're writing a novel. Mention which characters were involved and what made the scene powerful.
+
+---
+
+**🧩 Unresolved Threads or Potential Hooks**  
+List 5–8 questions or narrative threads the DM could explore later. Include:
+- Ominous foreshadowing
+- Strange or suspicious NPC behavior
+- Items, visions, or events that remain unexplained
+- Relationship drama or inner conflict
+- Long-term consequences set in motion
+
+---
+
+**🎙️ Post Script: Funny Lines and Off-Topic Moments**  
+In a casual tone, jot down any hilarious quotes, memes, off-topic discussions, or technical shenanigans that happened during the session. Capture the table’s personality and energy for future nostalgia.
+
+---"""
+
+SYSTEM_PROMPT = "You are a professional D&D campaign assistant creating detailed session summaries from full transcripts."
+
+def build_summary_prompt(transcript: str) -> str:
+    speaker_note = format_speaker_map(speaker_map)
+    return f"""
+{SUMMARY_INSTRUCTIONS}
+
+{SUMMARY_STRUCTURE}
+
+{speaker_note}
+
+Transcript:
+{transcript}
+"""
+
+def build_part_prompt(transcript: str, part: int, total: int) -> str:
+    speaker_note = format_speaker_map(speaker_map)
+    return f"""
+This is part {part} of {total} of a long tabletop RPG session transcript. The parts overlap slightly at their edges.
+
+Write detailed notes on this part only; they will be merged with the notes on the other parts into one session summary later. Keep events in order and keep the specifics: character names, NPCs and monsters, quotes, decisions, discoveries, emotional beats, unresolved questions, foreshadowing, and funny or off-topic moments.
+
+{speaker_note}
+
+Transcript (part {part} of {total}):
+{transcript}
+"""
+
+def build_reduce_prompt(notes: list[str]) -> str:
+    speaker_note = format_speaker_map(speaker_map)
+    parts = "\n\n".join(f"--- Notes on part {i} of {len(notes)} ---\n{text}" for i, text in enumerate(notes, 1))
+    return f"""
+{SUMMARY_INSTRUCTIONS}
+
+The session was too long to read in one pass, so it was split into {len(notes)} consecutive, slightly overlapping parts and each part has already been turned into notes. Combine the notes below into a single summary of the whole session. Merge anything repeated where the parts overlap, and keep the story in order.
+
+{SUMMARY_STRUCTURE}
+
+{speaker_note}
+
+Notes on the session, in order:
+{parts}
+"""
+
+# === Summarization ===
+async def chat(prompt: str) -> str:
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+    logger.debug(f"=== Prompt Sent ===\n{prompt}\n")
+
+    result = await get_llm().chat(messages, temperature=0.3)  # Lowered for better structure
+
+    logger.debug(f"=== Summary Returned ===\n{result}\n")
+    return result
+
+async def summarize_full_transcript(transcript: str) -> str:
+    return await chat(build_summary_prompt(transcript))
+
+def split_transcript(transcript: str, budget: int, overlap: int) -> list[str]:
+    """
+    Split a transcript into chunks of at most `budget` tokens at speaker-turn (line) boundaries.
+
+    Each chunk after the first repeats the last `overlap` tokens' worth of whole turns from
+    the chunk before (fewer when the turn that starts the new chunk would not fit beside
+    them), so no exchange loses its context at a seam. A single turn longer than the budget
+    becomes a chunk of its own.
+    """
+    overlap = min(overlap, budget // 2)
+    chunks = []
+    current, current_tokens = [], 0
+    for line in transcript.splitlines():
+        tokens = count_tokens(line) + 1  # + newline
+        if current and current_tokens + tokens > budget:
+            chunks.append("\n".join(current))
+            carried, carried_tokens = [], 0
+            for previous in reversed(current):
+                previous_tokens = count_tokens(previous) + 1
+                if carried_tokens + previous_tokens > min(overlap, budget - tokens):
+                    break
+                carried.insert(0, previous)
+                carried_tokens += previous_tokens
+            current, current_tokens = carried, carried_tokens
+        current.append(line)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+async def summarize_parts(chunks: list[str]) -> list[str]:
+    """Summarize every chunk concurrently; wall-clock time is roughly that of the slowest chunk."""
+    async def summarize(i, chunk):
+        notes = await chat(build_part_prompt(chunk, i, len(chunks)))
+        print(f"📝 Summarized part {i}/{len(chunks)}")
+        return notes
+
+    return await asyncio.gather(*(summarize(i, chunk) for i, chunk in enumerate(chunks, 1)))
+
+async def summarize_map_reduce(transcript: str) -> str:
+    """Summarize a transcript over the context limit: notes per chunk, then one combined summary."""
+    chunks = split_transcript(transcript, chunk_tokens, chunk_overlap_tokens)
+    print(f"🧩 Split transcript into {len(chunks)} parts of up to {chunk_tokens} tokens.")
+    notes = await summarize_parts(chunks)
+
+    # Very long sessions can produce more notes than fit in one request; fold them again.
+    while len(notes) > 1 and count_tokens(build_reduce_prompt(notes)) > context_limit:
+        print(f"🧩 Notes on {len(notes)} parts exceed the context limit, condensing them further...")
+        notes = await summarize_parts(split_transcript("\n".join(notes), chunk_tokens, 0))
+
+    print(f"🧠 Combining notes on {len(notes)} parts into the session summary...")
+    return await chat(build_reduce_prompt(notes))
+
+def read_transcript(path: Path) -> str:
+    # Prefer the structured segments written alongside the transcript; they carry the exact
+    # speaker names instead of whatever survives a regex over the formatted text.
+    segments_file = segments_path_for(path)
+    if segments_file.exists():
+        print(f"📖 Reading structured segments from: {segments_file}")
+        return "\n".join(format_processed_line(record) for record in iter_segments(segments_file))
+
+    print(f"📖 Reading transcript from: {path}")
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize a D&D session transcript with GPT.")
+    parser.add_argument("--transcript", help="Transcript to summarize (default: the newest processed one, else the newest raw one).")
+    parser.add_argument("--output", help="Summary path (default: the summary folder, named after the transcript).")
+    args = parser.parse_args(argv)
+
+    load_settings()
+    setup_logging(config.get("verbose_logging", False))
+
+    transcript_dir = config["local_transcript_dir"]
+    if args.transcript:
+        transcript_file = Path(args.transcript)
+    else:
+        transcript_file = latest_processed_transcript(transcript_dir) or latest_transcript(transcript_dir)
+    if args.output:
+        summary_file = Path(args.output)
+    else:
+        summary_file = Path(config["local_summary_dir"]) / f"{session_of(transcript_file)}{SUMMARY_SUFFIX}"
+
+    summary = summarize_text(read_transcript(transcript_file))
+
+    summary_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(summary_file, "w", encoding="utf-8") as f:
+        f.write(summary)
+
+    print(f"✅ Summary saved to: {summary_file}")
+    logger.info(f"✅ Summary saved to: {summary_file}")
+
+def summarize_text(transcript: str) -> str:
+    """Summarize a whole transcript, in one request or map-reduce if it is over the context limit."""
+    token_count = count_tokens(transcript)
+    print(f"🔢 Token count: {token_count}")
+
+    if token_count > context_limit:
+        print(f"🧠 Transcript exceeds the {context_limit}-token limit; summarizing in parts with {openai_model}...")
+        summary = asyncio.run(summarize_map_reduce(transcript))
+    else:
+        print(f"🧠 Summarizing session with {openai_model}...")
+        summary = asyncio.run(summarize_full_transcript(transcript))
+
+    llm = get_llm()
+    print(llm.metrics.report())
+    logger.info(llm.metrics.report())
+    figures = llm.metrics.summary()
+    latency = sum(llm.metrics.latencies)
+    telemetry.current().stage(
+        "summarize",
+        transcript_tokens=token_count,
+        **figures,
+        completion_tokens_per_second=figures["completion_tokens"] / latency if latency else None,
+    )
+    if llm.cache is not None:
+        print(llm.cache.report())
+    return summary
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+The Dungeon Scribe - Command Line
+
+One entry point for every stage of the pipeline:
+
+    python -m dungeonscribe run <craig.zip> [--session 2025-04-01] [--steps ...]
+    python -m dungeonscribe transcribe <craig.zip> <transcript.txt> [--model medium]
+    python -m dungeonscribe preprocess [--batch DIR] [--benchmark]
+    python -m dungeonscribe compact [--input FILE]
+    python -m dungeonscribe summarize [--transcript FILE] [--output FILE]
+    python -m dungeonscribe service serve|submit|status|stop
+    python -m dungeonscribe batch <zips or folders> [--watch DIR] [--jobs 2] [--status]
+    python -m dungeonscribe gui
+    python -m dungeonscribe benchmark [--baseline benchmarks/baseline.json]
+    python -m dungeonscribe benchmark-backends --audio-dir DIR [--configs whisper:float32,whisper:int8,...]
+    python -m dungeonscribe check-config
+    python -m dungeonscribe check-imports [--budget 1.0]
+
+Each subcommand imports only its own module, and those modules defer torch, whisper, openai
+and tiktoken until they are actually used, so --help, config checks and preprocessing start
+in well under a second. check-imports measures exactly that.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+CONFIG_FILE = "config.json"
+
+# Subcommand -> (module, description). Modules are imported only when their command runs.
+COMMANDS = {
+    "run": ("pipeline", "Run the whole session pipeline in one process."),
+    "transcribe": ("transcribe_audacity_zip", "Transcribe a Craig zip with Whisper."),
+    "preprocess": ("preprocess_transcript", "Clean a transcript (or a whole archive) for summarization."),
+    "compact": ("compact_transcript", "Compact a processed transcript to save summary tokens."),
+    "summarize": ("dnd_transcript_summarizer", "Summarize a session transcript with GPT."),
+    "service": ("transcription_service", "Run or talk to the warm-model transcription service."),
+    "batch": ("batch_runner", "Process a backlog of sessions, or watch a folder for new ones."),
+    "gui": ("0dnd_transcription_gui", "Launch the GUI."),
+    "benchmark": ("benchmarks.run", "Time every stage on a synthetic session."),
+    "benchmark-backends": ("benchmarks.backends", "Compare Whisper backends for speed and word error rate."),
+}
+
+# Modules that must import without pulling in any heavy dependency.
+LIGHT_MODULES = [
+    "dungeonscribe",
+    "segment_io",
+    "preprocess_transcript",
+    "compact_transcript",
+    "dedupe_segments",
+    "llm_cache",
+    "transcription_cache",
+    "transcription_service",
+    "transcribe_audacity_zip",
+    "dnd_transcript_summarizer",
+    "session_files",
+    "pipeline",
+    "telemetry",
+    "batch_runner",
+    "whisper_backends",
+    "weights_cache",
+]
+HEAVY_MODULES = ["torch", "whisper", "faster_whisper", "ctranslate2", "openai", "tiktoken"]
+DEFAULT_IMPORT_BUDGET = 1.0  # seconds, including interpreter startup
+
+# === Config Validation ===
+REQUIRED_KEYS = {
+    "local_transcript_dir": str,
+    "local_summary_dir": str,
+    "openai_api_key": str,
+}
+OPTIONAL_KEYS = {
+    "whisper_model": str,
+    "whisper_backend": str,
+    "whisper_device": str,
+    "whisper_compute_type": str,
+    "whisper_threads": int,
+    "whisper_weights_cache": bool,
+    "whisper_weights_dir": str,
+    "openai_model": str,
+    "openai_base_url": str,
+    "speaker_map": dict,
+    "inference_batch_size": int,
+    "decode_workers": int,
+    "decode_prefetch_tracks": int,
+    "decode_window_seconds": (int, float),
+    "speech_pad_seconds": (int, float),
+    "transcription_cache_max_mb": (int, float),
+    "summary_context_tokens": int,
+    "summary_chunk_tokens": int,
+    "summary_chunk_overlap_tokens": int,
+    "summary_concurrency": int,
+    "openai_tokens_per_minute": int,
+    "openai_requests_per_minute": int,
+    "openai_max_retries": int,
+    "llm_cache_ttl_days": (int, float),
+    "llm_cache_max_mb": (int, float),
+    "compact_merge_gap_seconds": (int, float),
+    "compact_repeat_window_seconds": (int, float),
+    "compact_min_repeats": int,
+    "bleed_similarity": (int, float),
+    "bleed_tolerance_seconds": (int, float),
+    "metrics_dir": str,
+    "metrics_prometheus_textfile": str,
+    "batch_jobs": int,
+    "batch_db": str,
+}
+
+def validate_config(config: dict) -> list[str]:
+    """Return a list of problems with a loaded config; empty when it is usable."""
+    problems = []
+    for key, expected in REQUIRED_KEYS.items():
+        if key not in config:
+            problems.append(f"Missing required key '{key}'.")
+        elif not isinstance(config[key], expected) or not config[key]:
+            problems.append(f"'{key}' must be a non-empty {expected.__name__}.")
+    for key, expected in OPTIONAL_KEYS.items():
+        if key in config and not isinstance(config[key], expected):
+            names = " or ".join(t.__name__ for t in (expected if isinstance(expected, tuple) else (expected,)))
+            problems.append(f"'{key}' must be {names}, got {type(config[key]).__name__}.")
+    workers = config.get("transcription_workers", "auto")
+    if workers != "auto" and not (isinstance(workers, int) and workers > 0):
+        problems.append("'transcription_workers' must be \"auto\" or a positive integer.")
+    for key, info in config.get("speaker_map", {}).items():
+        if not isinstance(info, dict) or "character" not in info:
+            problems.append(f"speaker_map entry '{key}' needs a 'character' name.")
+    if config.get("summary_chunk_tokens", 0) > config.get("summary_context_tokens", 128000):
+        problems.append("'summary_chunk_tokens' must not exceed 'summary_context_tokens'.")
+    return problems
+
+def check_config(path: str = CONFIG_FILE) -> int:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        print(f"❌ {path} not found.")
+        return 1
+    except json.JSONDecodeError as e:
+        print(f"❌ {path} is not valid JSON: {e}")
+        return 1
+
+    problems = validate_config(config)
+    for problem in problems:
+        print(f"❌ {problem}")
+    if problems:
+        return 1
+    print(f"✅ {path} looks good.")
+    return 0
+
+# === Import Budget ===
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def measure_import(module: str) -> dict:
+    """Import `module` in a fresh interpreter; returns its import time and any heavy modules it loaded."""
+    probe = _IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        return {"seconds": None, "heavy": [], "error": result.stderr.strip().splitlines()[-1]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def check_imports(budget: float = DEFAULT_IMPORT_BUDGET) -> int:
+    """Fail when any light module pulls in a heavy dependency, or when startup exceeds `budget`."""
+    failures = 0
+    for module in LIGHT_MODULES:
+        result = measure_import(module)
+        if result.get("error"):
+            print(f"❌ {module}: import failed ({result['error']})")
+            failures += 1
+        elif result["heavy"]:
+            print(f"❌ {module}: imports {', '.join(result['heavy'])} at import time")
+            failures += 1
+        elif result["seconds"] > budget:
+            print(f"❌ {module}: {result['seconds']:.3f}s (budget {budget:.1f}s)")
+            failures += 1
+        else:
+            print(f"✅ {module}: {result['seconds']:.3f}s")
+
+    for command in (["--help"], ["preprocess", "--help"], ["check-config", "--help"]):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "dungeonscribe", *command], capture_output=True,
+                       cwd=os.path.dirname(os.path.abspath(__file__)))
+        elapsed = time.perf_counter() - start
+        label = "python -m dungeonscribe " + " ".join(command)
+        if elapsed > budget:
+            print(f"❌ {label}: {elapsed:.3f}s (budget {budget:.1f}s)")
+            failures += 1
+        else:
+            print(f"✅ {label}: {elapsed:.3f}s")
+    return 1 if failures else 0
+
+# === Main Execution ===
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m dungeonscribe",
+        description="The Dungeon Scribe: transcribe, clean and summarize D&D sessions.",
+    )
+    sub = parser.add_subparsers(dest="command", required=True, metavar="command")
+    for name, (_, description) in COMMANDS.items():
+        sub.add_parser(name, help=description, add_help=False)
+    config_parser = sub.add_parser("check-config", help="Validate config.json.")
+    config_parser.add_argument("--config", default=CONFIG_FILE)
+    imports_parser = sub.add_parser("check-imports", help="Check that startup stays within the import-time budget.")
+    imports_parser.add_argument("--budget", type=float, default=DEFAULT_IMPORT_BUDGET, help="Seconds allowed per check.")
+
+    # Stage commands hand everything after their name to the stage's own parser.
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in COMMANDS:
+        module = importlib.import_module(COMMANDS[argv[0]][0])
+        return module.main(argv[1:]) or 0
+
+    args = parser.parse_args(argv)
+    if args.command == "check-config":
+        return check_config(args.config)
+    if args.command == "check-imports":
+        return check_imports(args.budget)
+
+if __name__ == "__main__":
+    sys.exit(main())
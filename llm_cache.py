@@ -0,0 +1,109 @@
+"""
+LLM Response Cache - The Dungeon Scribe
+
+A persistent SQLite cache of chat completion replies. Each entry is keyed on a hash of the
+exact messages, the model and the sampling parameters, so re-running a summary of an
+unchanged transcript returns the stored reply in milliseconds instead of paying for the
+request again. Any change to the transcript, prompt, speaker map or model is a new key.
+
+Entries expire after a TTL, and the least recently used entries are evicted once the cache
+grows past its size cap.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+DEFAULT_CACHE_PATH = str(Path.home() / ".dungeonscribe" / "llm_cache.sqlite3")
+DEFAULT_TTL_DAYS = 30
+DEFAULT_MAX_MB = 100
+
+class LLMCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl_days: float = DEFAULT_TTL_DAYS, max_mb: float = DEFAULT_MAX_MB):
+        self.path = Path(path)
+        self.ttl = ttl_days * 24 * 60 * 60
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT,
+                size INTEGER,
+                created REAL,
+                accessed REAL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.db.commit()
+
+    @staticmethod
+    def make_key(messages: list[dict], model: str, params: dict) -> str:
+        """Cache key for one request: every message, the model and every sampling parameter."""
+        payload = json.dumps({"messages": messages, "model": model, "params": params}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        row = self.db.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or (self.ttl and now - row[1] > self.ttl):
+            if row is not None:
+                self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.db.commit()
+            self.misses += 1
+            return None
+        self.db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        self.db.commit()
+        self.hits += 1
+        return row[0]
+
+    def put(self, key: str, model: str, response: str):
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO responses (key, model, response, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, model, response, len(response.encode("utf-8")), now, now),
+        )
+        self.db.commit()
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until the cache fits its size cap."""
+        if self.ttl:
+            self.db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total > self.max_bytes:
+            for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+                if total <= self.max_bytes:
+                    break
+                self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+        self.db.commit()
+
+    def clear(self):
+        self.db.execute("DELETE FROM responses")
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def stats(self) -> dict:
+        entries, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "size_mb": size / 1024 / 1024,
+        }
+
+    def report(self) -> str:
+        s = self.stats()
+        return (f"🗃️ LLM cache: {s['hits']} hit(s), {s['misses']} miss(es), "
+                f"{s['entries']} entr{'y' if s['entries'] == 1 else 'ies'} ({s['size_mb']:.1f} MB)")
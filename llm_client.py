@@ -0,0 +1,230 @@
+"""
+LLM Client - The Dungeon Scribe
+
+A shared async layer for OpenAI chat requests. Every request goes through:
+
+- a semaphore that bounds how many requests are in flight at once,
+- token buckets for tokens per minute and requests per minute, so a burst of concurrent
+  requests spreads itself out under the account's quota instead of tripping it,
+- retries with jittered exponential backoff on 429s, timeouts, connection errors and 5xx
+  responses, waiting for the server's Retry-After when it sends one; a 429 for an exhausted
+  quota fails at once, since waiting does not fix it,
+- per-request latency metrics,
+- an optional persistent response cache (see llm_cache.py), checked before any of the above.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import asyncio
+import logging
+import random
+import time
+
+import openai
+from openai import AsyncOpenAI
+
+logger = logging.getLogger("LLMClient")
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_TOKENS_PER_MINUTE = 200_000
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_TIMEOUT = 300  # seconds; long summaries take a while to generate
+
+# Reserved against the token bucket for the reply when the request sets no max_tokens.
+COMPLETION_TOKEN_ESTIMATE = 4096
+
+BASE_BACKOFF = 1.0   # seconds
+MAX_BACKOFF = 60.0
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+# === Rate Limiting ===
+class TokenBucket:
+    """A bucket that refills `per_minute` units evenly over a minute; acquire() waits for room."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        amount = min(amount, self.capacity)  # an oversized request waits for a full bucket
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return
+                await asyncio.sleep((amount - self.level) / self.rate)
+
+    def refund(self, amount: float):
+        """Return over-reserved units, e.g. when a reply used fewer tokens than estimated."""
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+def retry_after_seconds(error: Exception) -> float | None:
+    """The server's requested wait from Retry-After / retry-after-ms headers, if any."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        return None  # an HTTP date; fall back to our own backoff
+    return None
+
+def quota_exhausted(error: Exception) -> bool:
+    """A 429 for an exhausted plan or billing quota rather than a rate limit."""
+    return getattr(error, "code", None) == "insufficient_quota"
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(max, base * 2^attempt)]."""
+    return random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt))
+
+# === Metrics ===
+class RequestMetrics:
+    def __init__(self):
+        self.latencies = []
+        self.retries = 0
+        self.failures = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def record(self, latency: float, usage=None):
+        self.latencies.append(latency)
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_tokens
+            self.completion_tokens += usage.completion_tokens
+
+    def percentile(self, p: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def summary(self) -> dict:
+        return {
+            "requests": len(self.latencies),
+            "retries": self.retries,
+            "failures": self.failures,
+            "latency_p50": self.percentile(50),
+            "latency_p95": self.percentile(95),
+            "latency_max": max(self.latencies, default=0.0),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+
+    def report(self) -> str:
+        s = self.summary()
+        return (f"📈 LLM requests: {s['requests']} ok, {s['retries']} retried, {s['failures']} failed; "
+                f"latency p50 {s['latency_p50']:.1f}s, p95 {s['latency_p95']:.1f}s, max {s['latency_max']:.1f}s; "
+                f"{s['prompt_tokens']} prompt + {s['completion_tokens']} completion tokens")
+
+# === Client ===
+class LLMClient:
+    def __init__(self, model: str, api_key: str = None, base_url: str = None,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE,
+                 requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 count_tokens=None,
+                 cache=None):
+        self.model = model
+        # Retries are handled here, where they also respect the rate limiter.
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url or None, max_retries=0, timeout=timeout)
+        self.max_concurrency = max(1, max_concurrency)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.max_retries = max_retries
+        self.count_tokens = count_tokens or (lambda text: len(text) // 4)
+        self.metrics = RequestMetrics()
+        self.cache = cache
+        self._semaphore = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it belongs to the event loop that runs the requests.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def estimate_tokens(self, messages: list[dict], max_tokens: int = None) -> int:
+        prompt = sum(self.count_tokens(m["content"]) + 4 for m in messages)
+        return prompt + (max_tokens or COMPLETION_TOKEN_ESTIMATE)
+
+    async def chat(self, messages: list[dict], temperature: float = 0.3, max_tokens: int = None) -> str:
+        """Send one chat completion and return the reply text, retrying transient failures."""
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(messages, self.model, {"temperature": temperature, "max_tokens": max_tokens})
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.debug("Chat completion served from cache")
+                return cached
+
+        reply = await self._request(messages, temperature, max_tokens)
+        if key is not None:
+            self.cache.put(key, self.model, reply)
+        return reply
+
+    async def _request(self, messages: list[dict], temperature: float, max_tokens: int = None) -> str:
+        reserved = self.estimate_tokens(messages, max_tokens)
+        kwargs = {"model": self.model, "messages": messages, "temperature": temperature}
+        if max_tokens:
+            kwargs["max_tokens"] = max_tokens
+
+        async with self.semaphore:
+            # Tokens are reserved once per logical request, since a retry re-sends the same
+            # prompt, and reconciled against the reply's usage; a request that fails for good
+            # used none of them.
+            await self.token_bucket.acquire(reserved)
+            try:
+                for attempt in range(self.max_retries + 1):
+                    await self.request_bucket.acquire()
+                    start = time.perf_counter()
+                    try:
+                        response = await self.client.chat.completions.create(**kwargs)
+                    except RETRYABLE_ERRORS as e:
+                        if attempt == self.max_retries or quota_exhausted(e):
+                            self.metrics.failures += 1
+                            raise
+                        delay = retry_after_seconds(e)
+                        if delay is None:
+                            delay = backoff_delay(attempt)
+                        self.metrics.retries += 1
+                        logger.warning(f"{type(e).__name__} on attempt {attempt + 1}; retrying in {delay:.1f}s")
+                        await asyncio.sleep(delay)
+                        continue
+                    except openai.APIError:
+                        self.metrics.failures += 1
+                        raise
+
+                    latency = time.perf_counter() - start
+                    usage = getattr(response, "usage", None)
+                    self.metrics.record(latency, usage)
+                    if usage is not None:
+                        self.token_bucket.refund(max(0, reserved - usage.total_tokens))
+                    logger.debug(f"Chat completion in {latency:.2f}s (attempt {attempt + 1})")
+                    return response.choices[0].message.content.strip()
+            except BaseException:
+                self.token_bucket.refund(reserved)
+                raise
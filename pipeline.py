@@ -0,0 +1,314 @@
+"""
+Session Pipeline - The Dungeon Scribe
+
+Runs transcription, preprocessing, compaction and summarization in one process as a small
+DAG of stages. Stages hand artifacts to each other directly instead of through environment
+variables and "newest file in the folder" guesses, and every file a run writes is named by
+session_files.py.
+
+Streaming stages pass generators of segment records, so preprocessing and compaction work
+on each segment as soon as the track merge releases it, and the transcript files are written
+as they go. Summarization starts the moment the last track finishes. Each stage's wall time
+is recorded, along with the figures in telemetry.py, and written to a metrics file per run.
+Setting the run's cancel event stops it at the next chunk of transcription or
+before summarizing, with PipelineCancelled.
+
+Usage:
+    python pipeline.py <craig.zip> [--session 2025-04-01] [--steps transcribe,preprocess,summarize] [--config config.json]
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import argparse
+import json
+import time
+
+import telemetry
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+from craig_audio import PipelineCancelled, check_cancelled
+from segment_io import format_processed_line, iter_segments, segment_record_line, segments_path_for
+from session_files import latest_session, session_from_zip, session_paths, today_session, unique_session
+
+CONFIG_FILE = "config.json"
+STEPS = ("transcribe", "preprocess", "summarize")
+
+# === Stage Timing ===
+class StageClock:
+    """
+    Per-stage time accounting for stages that run interleaved.
+
+    Time is charged to whichever stage is running on top of the stack, so when the summary
+    stage pulls a record through compaction, preprocessing and transcription, each stage is
+    charged only for its own work ("self" time). The span is first start to last finish.
+    """
+
+    def __init__(self):
+        self.self_time = defaultdict(float)
+        self.first = {}
+        self.last = {}
+        self._stack = []
+        self._mark = 0.0
+
+    @contextmanager
+    def running(self, name: str):
+        now = time.perf_counter()
+        if self._stack:
+            self.self_time[self._stack[-1]] += now - self._mark
+        self._stack.append(name)
+        self._mark = now
+        self.first.setdefault(name, now)
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self.self_time[self._stack.pop()] += now - self._mark
+            self._mark = now
+            self.last[name] = now
+
+    def timings(self) -> dict:
+        return {
+            name: {"seconds": self.self_time[name], "span": self.last.get(name, start) - start}
+            for name, start in self.first.items()
+        }
+
+    def report(self) -> str:
+        return "⏱️ Stage times: " + ", ".join(
+            f"{name} {t['seconds']:.1f}s" for name, t in self.timings().items()
+        )
+
+def timed_stream(clock: StageClock, name: str, stream):
+    """Pass a stream through, charging the time spent producing each item to `name`."""
+    iterator = iter(stream)
+    while True:
+        with clock.running(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+# === DAG ===
+class Pipeline:
+    """
+    Stages connected by named artifacts.
+
+    A stage is a function of its input artifacts returning its output artifacts. Stages run
+    in dependency order; an output that is an iterator is a stream, wrapped so the stage is
+    timed while it produces items, and must have a single consumer.
+    """
+
+    def __init__(self):
+        self.stages = []
+        self.clock = StageClock()
+
+    def add(self, name: str, fn, inputs=(), outputs=()):
+        self.stages.append({"name": name, "fn": fn, "inputs": tuple(inputs), "outputs": tuple(outputs)})
+
+    def _ordered(self, available) -> list[dict]:
+        available, pending, ordered = set(available), list(self.stages), []
+        while pending:
+            ready = [stage for stage in pending if set(stage["inputs"]) <= available]
+            if not ready:
+                missing = {i for stage in pending for i in stage["inputs"]} - available
+                raise ValueError(f"Pipeline cannot run; missing artifacts: {', '.join(sorted(missing))}")
+            for stage in ready:
+                pending.remove(stage)
+                ordered.append(stage)
+                available.update(stage["outputs"])
+        return ordered
+
+    def run(self, artifacts: dict = None) -> dict:
+        artifacts = dict(artifacts or {})
+        for stage in self._ordered(artifacts):
+            with self.clock.running(stage["name"]):
+                result = stage["fn"](*(artifacts[name] for name in stage["inputs"]))
+            if len(stage["outputs"]) == 1:
+                result = (result,)
+            for name, value in zip(stage["outputs"], result or ()):
+                if hasattr(value, "__next__"):
+                    value = timed_stream(self.clock, stage["name"], value)
+                artifacts[name] = value
+        return artifacts
+
+# === Session Stages ===
+def tee_processed(records, output_path: Path):
+    """Write processed records to the transcript and its segment file as they pass."""
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+    with open(output_path, "w", encoding="utf-8") as out, open(segments_path_for(output_path), "w", encoding="utf-8") as records_out:
+        for record in records:
+            out.write(("\n" if count else "") + format_processed_line(record))
+            records_out.write(segment_record_line(record))
+            count += 1
+            yield record
+    print(f"✅ Processed transcript ({count} lines) saved to: {output_path}")
+
+def load_records(path: Path, processed: bool = False):
+    """Segment records of an existing transcript: its segment file, else parsed from the text."""
+    if segments_path_for(path).exists():
+        yield from iter_segments(segments_path_for(path))
+        return
+    if not path.exists():
+        raise FileNotFoundError(f"No transcript at {path}")
+    if processed:
+        from compact_transcript import parse_processed_lines as parse
+    else:
+        from preprocess_transcript import parse_transcript_lines as parse
+    with open(path, "r", encoding="utf-8") as f:
+        yield from parse(f)
+
+def build_session_pipeline(config: dict, paths: dict, steps=STEPS, model_name: str = None,
+                           use_service: bool = False, on_progress=None, cancel=None) -> Pipeline:
+    """
+    The stages for one session. `steps` is a contiguous run of transcribe, preprocess and
+    summarize; a run that skips earlier steps reads their files from the session paths.
+    """
+    steps = [step for step in STEPS if step in steps]
+    if not steps or steps != list(STEPS[STEPS.index(steps[0]):STEPS.index(steps[-1]) + 1]):
+        raise ValueError(f"Steps must be a contiguous run of {', '.join(STEPS)}.")
+    notify = on_progress or (lambda message: None)
+    model_name = model_name or config.get("whisper_model", "base")
+    pipeline = Pipeline()
+
+    if "transcribe" in steps:
+        def transcribe(zip_path):
+            notify("🔁 Running transcription...")
+            if use_service:
+                # Keeps the Whisper model warm between runs; the service writes the transcript files.
+                from transcription_service import submit_job
+                submit_job(zip_path, str(paths["transcript"]), model_name,
+                           on_progress=lambda m: notify(f"🔁 {m}"), cancel=cancel, config=config)
+                return telemetry.current().counted(iter_segments(segments_path_for(paths["transcript"])), "transcribe", "segments")
+
+            import transcribe_audacity_zip as transcriber
+            transcriber.load_settings(config)
+            print(f"Transcribing {zip_path} to {paths['transcript']} using Whisper model: {model_name}")
+            segments = transcriber.iter_zip_segments(zip_path, model_name=model_name, cancel=cancel)
+            segments = telemetry.current().counted(segments, "transcribe", "segments")
+            return map(transcriber.segment_record, transcriber.tee_transcript_stream(segments, str(paths["transcript"])))
+        pipeline.add("transcribe", transcribe, inputs=("zip",), outputs=("transcript",))
+    elif "preprocess" in steps:
+        pipeline.add("load_transcript", lambda: load_records(paths["transcript"]), outputs=("transcript",))
+
+    if "preprocess" in steps:
+        from preprocess_transcript import process_records
+
+        def preprocess(records):
+            notify("🧼 Cleaning transcript...")
+            records = telemetry.current().counted(records, "preprocess", "lines")
+            return process_records(records, config.get("active_speaker_map", {}))
+        pipeline.add("preprocess", preprocess, inputs=("transcript",), outputs=("cleaned",))
+
+        if config.get("compact_transcript", True):
+            import compact_transcript as compactor
+
+            def compact(records):
+                encoding = compactor.load_encoding()
+                before, after = compactor.TokenTally(encoding), compactor.TokenTally(encoding)
+                compacted = compactor.compact_records(
+                    before.count(records),
+                    config.get("compact_merge_gap_seconds", compactor.DEFAULT_MERGE_GAP),
+                    config.get("compact_repeat_window_seconds", compactor.DEFAULT_REPEAT_WINDOW),
+                    config.get("compact_min_repeats", compactor.DEFAULT_MIN_REPEATS),
+                )
+                yield from after.count(compacted)
+                # The tallies are complete once the stream is.
+                stats = {"lines_before": before.lines, "lines_after": after.lines,
+                         "tokens_before": before.tokens, "tokens_after": after.tokens}
+                telemetry.current().stage("compact", **stats)
+                print(compactor.format_savings(stats))
+            pipeline.add("compact", compact, inputs=("cleaned",), outputs=("compacted",))
+            processed_input = "compacted"
+        else:
+            processed_input = "cleaned"
+
+        pipeline.add("write_processed", lambda records: tee_processed(records, paths["processed"]),
+                     inputs=(processed_input,), outputs=("processed",))
+    elif "summarize" in steps:
+        pipeline.add("load_processed", lambda: load_records(paths["processed"], processed=True), outputs=("processed",))
+
+    if "summarize" in steps:
+        def summarize(records):
+            # Pulling the stream drives every upstream stage; it ends when the last track does.
+            transcript = "\n".join(format_processed_line(record) for record in records)
+            check_cancelled(cancel)
+            notify("🧠 Summarizing session...")
+            import dnd_transcript_summarizer as summarizer
+            summarizer.load_settings(config)
+            summary = summarizer.summarize_text(transcript)
+            paths["summary"].parent.mkdir(parents=True, exist_ok=True)
+            with open(paths["summary"], "w", encoding="utf-8") as f:
+                f.write(summary)
+            print(f"✅ Summary saved to: {paths['summary']}")
+            return paths["summary"]
+        pipeline.add("summarize", summarize, inputs=("processed",), outputs=("summary",))
+    else:
+        final = "processed" if "preprocess" in steps else "transcript"
+        pipeline.add("finish", lambda records: sum(1 for _ in records), inputs=(final,), outputs=("count",))
+
+    return pipeline
+
+def run_session(config: dict, zip_path: str = None, session: str = None, steps=STEPS, model_name: str = None,
+                use_service: bool = False, on_progress=None, cancel=None) -> dict:
+    """
+    Run the session pipeline; returns the session paths, the per-stage timings and the run's
+    metrics (see telemetry.py), which are also written to the metrics folder unless the
+    "metrics" setting is off.
+
+    `cancel` is a threading.Event; setting it from another thread (the GUI) stops the run
+    cleanly with PipelineCancelled. Without a `session`, files are named after the zip's
+    recording date (or today, when no zip is given): a transcription starts a new session
+    next to any earlier one from that day, later steps pick up the newest of them.
+    """
+    if session is None:
+        session = session_from_zip(zip_path) if zip_path else today_session()
+        session = unique_session(config, session) if "transcribe" in steps else latest_session(config, session)
+    paths = session_paths(config, session)
+    if "transcribe" in steps and not zip_path:
+        raise ValueError("Select a valid Craig .zip file")
+
+    metrics = telemetry.start_run(session)
+    pipeline = build_session_pipeline(config, paths, steps, model_name, use_service, on_progress, cancel)
+    start = time.perf_counter()
+    try:
+        pipeline.run({"zip": zip_path} if zip_path else {})
+    except PipelineCancelled:
+        metrics.stop_sampling()  # the GUI may sit idle for a long time before its next run
+        print(f"⏹️ Pipeline cancelled after {time.perf_counter() - start:.1f}s.")
+        raise
+    total = time.perf_counter() - start
+
+    for name, timing in pipeline.clock.timings().items():
+        metrics.stage(name, **timing)
+    metrics.stage("total", seconds=total)
+    metrics.finish()
+    print(pipeline.clock.report())
+    print(metrics.report())
+    if config.get("metrics", True):
+        metrics_files = telemetry.write_run_metrics(metrics, config)
+        print(f"📊 Metrics written to: {', '.join(str(path) for path in metrics_files.values())}")
+    print(f"✅ Pipeline finished in {total:.1f}s.")
+    return {"paths": paths, "timings": pipeline.clock.timings(), "total_seconds": total, "metrics": metrics}
+
+# === Main Execution ===
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the whole session pipeline in one process.")
+    parser.add_argument("zip", nargs="?", help="Craig .zip (needed when transcribing).")
+    parser.add_argument("--session", default=None, help="Session name for output files (default: the zip's recording date).")
+    parser.add_argument("--steps", default=",".join(STEPS), help="Comma-separated steps to run (default: all).")
+    parser.add_argument("--model", default=None, help="Whisper model (default: whisper_model from config.json).")
+    parser.add_argument("--service", action="store_true", help="Transcribe through the warm-model service.")
+    parser.add_argument("--config", default=CONFIG_FILE, help="Config file (default: config.json).")
+    args = parser.parse_args(argv)
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    steps = [step.strip() for step in args.steps.split(",") if step.strip()]
+    run_session(config, args.zip, args.session, steps, args.model, args.service)
+
+if __name__ == "__main__":
+    main()
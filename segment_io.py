@@ -0,0 +1,44 @@
+"""
+Structured Segment Files - The Dungeon Scribe
+
+Alongside each text transcript the transcriber writes a JSON Lines file with one record per
+Whisper segment: exact start/end times, the Discord speaker key, the mapped display name, the
+text and Whisper's per-segment confidence fields. Preprocessing and summarization stream these
+records instead of regex-parsing the formatted text, so no timing precision is lost and
+speaker names containing spaces survive.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import json
+from pathlib import Path
+
+SEGMENTS_SUFFIX = ".segments.jsonl"
+
+# Order of the fields in each record.
+SEGMENT_FIELDS = ("start", "end", "speaker", "name", "text", "avg_logprob", "no_speech_prob", "compression_ratio")
+
+def segments_path_for(transcript_path) -> Path:
+    """'2025-04-01 - transcript.txt' -> '2025-04-01 - transcript.segments.jsonl'."""
+    path = Path(transcript_path)
+    return path.with_name(path.stem + SEGMENTS_SUFFIX)
+
+def segment_record_line(record: dict) -> str:
+    """One JSON Lines record, with the fields in their usual order."""
+    return json.dumps({key: record.get(key) for key in SEGMENT_FIELDS}, ensure_ascii=False) + "\n"
+
+def iter_segments(path):
+    """Yield segment records one line at a time, without loading the whole file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def short_timestamp(seconds: float) -> str:
+    """Minutes-and-seconds timestamp used by the processed transcript, e.g. [83:07]."""
+    total = int(seconds)
+    return f"[{total // 60}:{total % 60:02d}]"
+
+def format_processed_line(record: dict) -> str:
+    return f"{short_timestamp(record['start'])} {record['name']}: {record['text']}"
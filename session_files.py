@@ -0,0 +1,124 @@
+"""
+Session File Names - The Dungeon Scribe
+
+One naming scheme for every artifact of a session, shared by the GUI, the pipeline and the
+individual scripts:
+
+    <transcript dir>/<session> - transcript.txt            raw Whisper transcript
+    <transcript dir>/<session> - processed_transcript.txt  cleaned (and compacted) transcript
+    <summary dir>/<session> - summary.txt                  session summary
+
+Each transcript also has its structured segment file next to it (see segment_io.py). The
+session name is the recording date, e.g. 2025-04-01, read from the Craig zip itself
+(session_from_zip), so re-processing an old recording never lands on today's files. A second
+recording from the same day gets " (2)" appended (unique_session) instead of overwriting the
+first one's files.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import re
+import zipfile
+from datetime import date, datetime
+from pathlib import Path
+
+TRANSCRIPT_SUFFIX = " - transcript.txt"
+PROCESSED_SUFFIX = " - processed_transcript.txt"
+SUMMARY_SUFFIX = " - summary.txt"
+
+# Craig's info.txt has a line like "Start time:	2025-04-01T19:02:11.123Z"; its zip names and
+# most renamed copies carry the date as 2025-4-1 or 2025-04-01.
+START_TIME_PATTERN = re.compile(r"Start time:\s*(\d{4})-(\d{1,2})-(\d{1,2})")
+DATE_PATTERN = re.compile(r"(?<!\d)(\d{4})-(\d{1,2})-(\d{1,2})(?!\d)")
+
+def today_session() -> str:
+    return date.today().isoformat()
+
+def _date_session(match) -> str | None:
+    try:
+        return date(*(int(part) for part in match.groups())).isoformat()
+    except ValueError:
+        return None
+
+def session_from_zip(zip_path) -> str:
+    """
+    The recording date of a Craig zip: the start time in its info.txt, else a date in the
+    file name, else the newest member timestamp, else the file's modification date.
+    """
+    zip_path = Path(zip_path)
+    try:
+        with zipfile.ZipFile(zip_path, "r") as zf:
+            names = zf.namelist()
+            if "info.txt" in names:
+                match = START_TIME_PATTERN.search(zf.read("info.txt").decode("utf-8", errors="ignore"))
+                if match and _date_session(match):
+                    return _date_session(match)
+            match = DATE_PATTERN.search(zip_path.stem)
+            if match and _date_session(match):
+                return _date_session(match)
+            stamps = [info.date_time for info in zf.infolist() if not info.is_dir()]
+            if stamps:
+                return date(*max(stamps)[:3]).isoformat()
+    except (OSError, zipfile.BadZipFile):
+        pass
+    return datetime.fromtimestamp(zip_path.stat().st_mtime).date().isoformat()
+
+def session_paths(config: dict, session: str) -> dict[str, Path]:
+    transcript_dir = Path(config["local_transcript_dir"])
+    summary_dir = Path(config["local_summary_dir"])
+    return {
+        "transcript": transcript_dir / f"{session}{TRANSCRIPT_SUFFIX}",
+        "processed": transcript_dir / f"{session}{PROCESSED_SUFFIX}",
+        "summary": summary_dir / f"{session}{SUMMARY_SUFFIX}",
+    }
+
+def session_taken(config: dict, session: str) -> bool:
+    """True when any of the session's transcript, processed transcript or summary files exists."""
+    return any(path.exists() for path in session_paths(config, session).values())
+
+def _numbered(session: str, n: int) -> str:
+    return session if n == 1 else f"{session} ({n})"
+
+def unique_session(config: dict, session: str, taken=None) -> str:
+    """
+    `session`, or the first of "<session> (2)", "<session> (3)", ... that has no files in the
+    transcript or summary folder yet and that `taken` (e.g. a job queue's lookup) does not
+    claim either.
+    """
+    n = 1
+    while session_taken(config, _numbered(session, n)) or (taken is not None and taken(_numbered(session, n))):
+        n += 1
+    return _numbered(session, n)
+
+def latest_session(config: dict, session: str) -> str:
+    """The last of `session`, "<session> (2)", ... that has files, for steps run after transcription."""
+    n = 1
+    while session_taken(config, _numbered(session, n + 1)):
+        n += 1
+    return _numbered(session, n)
+
+def session_of(path) -> str:
+    """'2025-04-01 - processed_transcript.txt' -> '2025-04-01'."""
+    name = Path(path).name
+    for suffix in (PROCESSED_SUFFIX, TRANSCRIPT_SUFFIX, SUMMARY_SUFFIX):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return Path(path).stem
+
+def is_processed(path) -> bool:
+    return "processed_transcript" in Path(path).name
+
+def _newest(paths) -> Path | None:
+    paths = list(paths)
+    return max(paths, key=lambda f: f.stat().st_mtime) if paths else None
+
+def latest_transcript(transcript_dir) -> Path:
+    """Newest raw transcript in the folder."""
+    latest = _newest(p for p in Path(transcript_dir).glob("*.txt") if not is_processed(p))
+    if latest is None:
+        raise FileNotFoundError(f"No transcript files found in {transcript_dir}")
+    return latest
+
+def latest_processed_transcript(transcript_dir) -> Path | None:
+    return _newest(p for p in Path(transcript_dir).glob("*.txt") if is_processed(p))
@@ -0,0 +1,320 @@
+"""
+Run Telemetry - The Dungeon Scribe
+
+A fixed set of performance figures for every run, so there is data on where the time goes:
+
+- per track: decode time, audio length, transcription time, real-time factor (processing
+  seconds per second of audio; below 1 is faster than real time) and segments per second
+- per pipeline stage: the stage's own wall time, plus lines/sec for preprocessing, the
+  real-time factor for transcription and prompt/completion tokens, latency and tokens/sec
+  for summarization
+- peak resident memory during the run of this process, its children together (ffmpeg,
+  worker processes) and the transcription service when one did the work
+
+Figures are recorded into the current RunMetrics from wherever the work happens, including
+decoder threads. Worker processes and the service keep their own and hand them back with
+their results. A finished run is written as JSON, and optionally as a Prometheus textfile
+for node_exporter's textfile collector.
+
+Memory is sampled on a background thread while the run lasts (with psutil when it is
+installed, else from /proc on Linux), since the GUI and the service run many sessions in one
+process and the OS's own peak covers the whole process lifetime. Where sampling is not
+possible the OS peak is reported under a "_lifetime" name, so it is not mistaken for the run's.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+PROMETHEUS_PREFIX = "dungeonscribe"
+RSS_SAMPLE_SECONDS = 0.5
+
+def peak_rss_bytes(children: bool = False) -> int | None:
+    """
+    Peak resident set size over this process's whole lifetime (or the largest of its
+    waited-for children), if the OS reports it.
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+def _proc_rss(pid: int) -> int | None:
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _proc_children(pid: int) -> list[int]:
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children", "r") as f:
+                children.extend(int(child) for child in f.read().split())
+    except (OSError, ValueError):
+        pass  # the process has exited
+    return children
+
+def current_rss_bytes() -> dict:
+    """Resident memory right now of this process ("self") and of all its descendants together ("children")."""
+    if psutil is not None:
+        process = psutil.Process()
+        children = 0
+        for child in process.children(recursive=True):
+            try:
+                children += child.memory_info().rss
+            except psutil.Error:
+                pass  # exited since it was listed
+        return {"self": process.memory_info().rss, "children": children}
+
+    pid = os.getpid()
+    rss = {}
+    if os.path.exists(f"/proc/{pid}/statm"):
+        rss["self"] = _proc_rss(pid)
+    if os.path.exists(f"/proc/{pid}/task/{pid}/children"):
+        children, stack = 0, _proc_children(pid)
+        while stack:
+            child = stack.pop()
+            children += _proc_rss(child) or 0
+            stack.extend(_proc_children(child))
+        rss["children"] = children
+    return rss
+
+class RssSampler:
+    """Keeps the highest current_rss_bytes() seen, sampling on a daemon thread until stop()."""
+
+    def __init__(self, interval: float = RSS_SAMPLE_SECONDS):
+        self.peak = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.sample()
+        self._thread = threading.Thread(target=self._run, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def sample(self):
+        rss = current_rss_bytes()
+        with self._lock:
+            for process, value in rss.items():
+                if value is not None and (process not in self.peak or value > self.peak[process]):
+                    self.peak[process] = value
+
+    def _run(self, interval: float):
+        while not self._stop.wait(interval):
+            self.sample()
+
+    def peaks(self) -> dict:
+        with self._lock:
+            return dict(self.peak)
+
+    def stop(self) -> dict:
+        if not self._stop.is_set():
+            self._stop.set()
+            self.sample()
+        return self.peaks()
+
+def _rate(count, seconds):
+    return count / seconds if count is not None and seconds else None
+
+class RunMetrics:
+    """The figures of one run: per-track, per-stage and peak memory."""
+
+    def __init__(self, session: str = None):
+        self.session = session
+        self.started = datetime.now()
+        self.tracks = {}
+        self.stages = {}
+        self.peak_rss = {}
+        self._sampler = None
+        self._lock = threading.Lock()
+
+    def start_sampling(self):
+        """Sample resident memory from now until finish() (start_run() does this)."""
+        self._sampler = RssSampler(RSS_SAMPLE_SECONDS)
+
+    def stop_sampling(self):
+        if self._sampler is not None:
+            sampled = self._sampler.stop()
+            with self._lock:
+                self.peak_rss.update(sampled)
+
+    def track(self, name: str, **figures):
+        with self._lock:
+            self.tracks.setdefault(name, {}).update(figures)
+
+    def stage(self, name: str, **figures):
+        with self._lock:
+            self.stages.setdefault(name, {}).update(figures)
+
+    def add(self, stage: str, figure: str, amount=1):
+        with self._lock:
+            figures = self.stages.setdefault(stage, {})
+            figures[figure] = figures.get(figure, 0) + amount
+
+    def counted(self, stream, stage: str, figure: str):
+        """Pass a stream through, counting its items into a stage figure."""
+        self.stage(stage, **{figure: 0})
+        for item in stream:
+            self.add(stage, figure)
+            yield item
+
+    def merge(self, other: dict, process: str = None):
+        """Fold in the to_dict() of metrics recorded elsewhere (a worker process, the service)."""
+        for name, figures in other.get("tracks", {}).items():
+            self.track(name, **figures)
+        if process:
+            peaks = other.get("peak_rss_bytes", {})
+            with self._lock:
+                if "self" in peaks:
+                    self.peak_rss[process] = peaks["self"]
+                else:
+                    self.peak_rss[f"{process}_lifetime"] = peaks.get("self_lifetime")
+
+    def finish(self):
+        """Record peak memory and work out the derived rates."""
+        for figures in self.tracks.values():
+            audio = figures.get("audio_seconds")
+            seconds = figures.get("transcribe_seconds")
+            if audio and seconds is not None:
+                figures["real_time_factor"] = seconds / audio
+            figures["segments_per_second"] = _rate(figures.get("segments"), seconds)
+
+        transcribe = self.stages.get("transcribe")
+        if transcribe is not None and self.tracks:
+            audio = sum(figures.get("audio_seconds", 0.0) for figures in self.tracks.values())
+            transcribe["audio_seconds"] = audio
+            if audio:
+                transcribe["real_time_factor"] = transcribe.get("seconds", 0.0) / audio
+            transcribe["segments_per_second"] = _rate(transcribe.get("segments"), transcribe.get("seconds"))
+        if "preprocess" in self.stages:
+            preprocess = self.stages["preprocess"]
+            preprocess["lines_per_second"] = _rate(preprocess.get("lines"), preprocess.get("seconds"))
+
+        self.stop_sampling()
+        # Without a sample of the run, fall back to the OS's process-lifetime peak, named as such.
+        for process, children in (("self", False), ("children", True)):
+            if process not in self.peak_rss:
+                self.peak_rss[f"{process}_lifetime"] = peak_rss_bytes(children)
+        return self
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "session": self.session,
+                "started": self.started.isoformat(timespec="seconds"),
+                "stages": {name: dict(figures) for name, figures in self.stages.items()},
+                "tracks": {name: dict(self.tracks[name]) for name in sorted(self.tracks)},
+                # A run still being sampled (a worker's task) reports its peak so far.
+                "peak_rss_bytes": {**(self._sampler.peaks() if self._sampler is not None else {}), **self.peak_rss},
+            }
+
+    # === Export ===
+    def write_json(self, path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+    def prometheus_lines(self) -> list[str]:
+        data = self.to_dict()
+        session = {"session": self.session or ""}
+        samples = {}  # metric -> [(labels, value)]
+        for stage, figures in data["stages"].items():
+            for figure, value in figures.items():
+                samples.setdefault(f"stage_{figure}", []).append(({**session, "stage": stage}, value))
+        for track, figures in data["tracks"].items():
+            for figure, value in figures.items():
+                samples.setdefault(f"track_{figure}", []).append(({**session, "track": track}, value))
+        for process, value in data["peak_rss_bytes"].items():
+            samples.setdefault("peak_rss_bytes", []).append(({**session, "process": process}, value))
+
+        lines = []
+        for metric, values in samples.items():
+            name = f"{PROMETHEUS_PREFIX}_{metric}"
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in values:
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                label_text = ",".join(f'{key}="{_escape_label(val)}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}")
+        return lines
+
+    def write_prometheus(self, path) -> Path:
+        """Write a node_exporter textfile, swapped in whole so the collector never reads half a file."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(self.prometheus_lines()) + "\n")
+        os.replace(tmp, path)
+        return path
+
+    # === Report ===
+    def report(self) -> str:
+        data = self.to_dict()
+        lines = [f"📊 Run metrics{f' for {self.session}' if self.session else ''} ({data['started']})"]
+        for stage, figures in data["stages"].items():
+            lines.append(f"  {stage}: " + ", ".join(_format_figure(k, v) for k, v in figures.items() if v is not None))
+        if data["tracks"]:
+            lines.append("  tracks:")
+            for track, figures in data["tracks"].items():
+                lines.append(f"    {track}: " + ", ".join(_format_figure(k, v) for k, v in figures.items() if v is not None))
+        memory = [f"{process} {value / 1024 ** 2:.0f} MB" for process, value in data["peak_rss_bytes"].items() if value]
+        if memory:
+            lines.append("  peak RSS: " + ", ".join(memory))
+        return "\n".join(lines)
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_figure(name: str, value) -> str:
+    if isinstance(value, float):
+        return f"{name} {value:.3f}" if abs(value) < 10 else f"{name} {value:.1f}"
+    return f"{name} {value}"
+
+# === Current Run ===
+_current = RunMetrics()
+
+def current() -> RunMetrics:
+    """The metrics every part of the program records into; start_run() replaces it."""
+    return _current
+
+def start_run(session: str = None) -> RunMetrics:
+    global _current
+    _current.stop_sampling()
+    _current = RunMetrics(session)
+    _current.start_sampling()
+    return _current
+
+def metrics_paths(config: dict, session: str, started: datetime) -> dict:
+    """Where a run's metrics go: a JSON file per run, and the Prometheus textfile if one is configured."""
+    metrics_dir = Path(config.get("metrics_dir") or Path(config["local_transcript_dir"]) / "metrics")
+    paths = {"json": metrics_dir / f"{session} {started:%Y%m%d-%H%M%S}.json"}
+    if config.get("metrics_prometheus_textfile"):
+        paths["prometheus"] = Path(config["metrics_prometheus_textfile"])
+    return paths
+
+def write_run_metrics(metrics: RunMetrics, config: dict) -> dict:
+    paths = metrics_paths(config, metrics.session, metrics.started)
+    metrics.write_json(paths["json"])
+    if "prometheus" in paths:
+        metrics.write_prometheus(paths["prometheus"])
+    return paths
@@ -0,0 +1,77 @@
+"""
+Batched Whisper Decoding - The Dungeon Scribe
+
+transcribe_batched's cross-track batches, with a stand-in for the decoder: batches are filled
+round-robin in track order, every segment goes back to its own track and timestamp, and a
+track's transcript does not depend on which tracks shared its batches.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import types
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("whisper")
+import batched_whisper
+from craig_audio import SAMPLE_RATE, SpeechTimeline
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Replace the model with one that 'says' each window's id; returns the batches it saw."""
+    seen = []
+
+    def decode_windows(model, audios, compression_ratio_threshold, fp16):
+        seen.append([int(audio[0]) for audio in audios])
+        return [None if audio[0] < 0 else types.SimpleNamespace(
+            tokens=[int(audio[0])], avg_logprob=-0.2, no_speech_prob=0.1, compression_ratio=1.1)
+            for audio in audios]
+
+    monkeypatch.setattr(batched_whisper, "decode_windows", decode_windows)
+    monkeypatch.setattr(batched_whisper, "get_tokenizer", lambda *args, **kwargs: None)
+    monkeypatch.setattr(batched_whisper, "_parse_segments",
+                        lambda tokens, tokenizer, duration: [(0.0, duration, f"w{tokens[0]}")])
+    return seen
+
+def windows(track: int, count: int, seconds: float = 2.0):
+    """`count` windows whose samples carry their id; window k sits at 100 * k s on the track."""
+    for k in range(count):
+        audio = np.full(int(seconds * SAMPLE_RATE), 100 * track + k, dtype=np.float32)
+        yield audio, SpeechTimeline([(0.0, 100.0 * k, seconds)])
+
+MODEL = types.SimpleNamespace(is_multilingual=False)
+
+def collect(chunks):
+    results, done = {}, []
+    for key, segments, finished in chunks:
+        assert key not in done
+        results.setdefault(key, []).extend(segments)
+        if finished:
+            done.append(key)
+    return results, done
+
+def test_batches_fill_round_robin(batches):
+    tracks = [(0, windows(0, 3)), (1, windows(1, 1)), (2, windows(2, 2))]
+    results, done = collect(batched_whisper.transcribe_batched(MODEL, tracks, batch_size=4))
+
+    assert batches == [[0, 100, 200, 1], [201, 2]]
+    assert sorted(done) == [0, 1, 2]
+    assert [s["text"] for s in results[0]] == ["w0", "w1", "w2"]
+    assert [s["start"] for s in results[0]] == [0.0, 100.0, 200.0]
+    assert [s["text"] for s in results[2]] == ["w200", "w201"]
+
+def test_tracks_without_windows_finish(batches):
+    results, done = collect(batched_whisper.transcribe_batched(MODEL, [(0, []), (1, windows(1, 1))], batch_size=8))
+    assert sorted(done) == [0, 1] and results[0] == []
+
+@pytest.mark.parametrize("batch_size", [1, 3, 8])
+def test_transcript_does_not_depend_on_batch_mates(batches, batch_size):
+    counts = [5, 0, 2, 9, 1]
+    together, _ = collect(batched_whisper.transcribe_batched(
+        MODEL, [(t, windows(t, n)) for t, n in enumerate(counts)], batch_size))
+    for t, n in enumerate(counts):
+        alone, _ = collect(batched_whisper.transcribe_batched(MODEL, [(t, windows(t, n))], batch_size))
+        assert together[t] == alone[t]
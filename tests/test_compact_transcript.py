@@ -0,0 +1,85 @@
+"""
+Transcript Compaction - The Dungeon Scribe
+
+compact_transcript collapses Whisper repetition loops and nothing else: dice results, damage
+numbers and short answers said again later are dialogue and must survive.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import random
+
+import pytest
+
+from compact_transcript import collapse_repeated_sentences, drop_repeats, is_near_duplicate, normalize
+
+def record(start, text, speaker="ana"):
+    return {"start": start, "end": start + 2, "speaker": speaker, "name": speaker, "text": text}
+
+def texts(records):
+    return [(r["start"], r["speaker"], r["text"]) for r in records]
+
+@pytest.mark.parametrize("a,b", [
+    ("I rolled a 12.", "I rolled a 17."),
+    ("I deal 8 damage.", "I deal 9 damage."),
+    ("That's a twelve.", "That's a seventeen."),
+    ("Roll 2d6.", "Roll 3d6."),
+])
+def test_numbers_that_differ_are_never_duplicates(a, b):
+    assert not is_near_duplicate(normalize(a), normalize(b))
+
+def test_wobbles_are_duplicates():
+    assert is_near_duplicate(normalize("Thank you for watching!"), normalize("Thank you for watching."))
+    assert is_near_duplicate(normalize("Thanks for watching the video"), normalize("Thanks for watching the videos"))
+
+def test_dice_rolls_survive():
+    records = [record(0, "I rolled a 17."), record(3, "I rolled a 12."), record(6, "I rolled a 12."),
+               record(8, "I deal 8 damage."), record(10, "I deal 9 damage.")]
+    assert texts(drop_repeats(records)) == texts(records)
+
+def test_short_answers_later_survive():
+    records = [record(0, "Yes."), record(30, "Yes."), record(60, "Yes."), record(90, "Yes.")]
+    assert texts(drop_repeats(records)) == texts(records)
+
+def test_fewer_than_min_repeats_survive():
+    records = [record(0, "No."), record(1, "No.")]
+    assert texts(drop_repeats(records, min_repeats=3)) == texts(records)
+
+def test_loop_collapses_to_first_segment():
+    loop = [record(10 + 2 * i, "Thank you.") for i in range(40)]
+    records = [record(0, "Let's begin.")] + loop + [record(200, "Thank you.")]
+    assert texts(drop_repeats(records)) == texts([records[0], loop[0], records[-1]])
+
+def test_loop_between_other_speakers_keeps_order():
+    records = []
+    for i in range(6):
+        records.append(record(2 * i, "Thanks for watching!", speaker="quiet"))
+        records.append(record(2 * i + 1, f"I move {i + 1} squares.", speaker="bo"))
+    kept = texts(drop_repeats(records))
+    assert kept == texts([records[0]] + [r for r in records if r["speaker"] == "bo"])
+
+def test_sentence_loops_inside_a_segment():
+    assert collapse_repeated_sentences("Thank you. Thank you. Thank you. Bye.") == "Thank you. Bye."
+    assert collapse_repeated_sentences("No. No. Stop.") == "No. No. Stop."
+    assert collapse_repeated_sentences("I rolled 12. I rolled 12. I rolled 12.") == "I rolled 12."
+
+@pytest.mark.parametrize("seed", range(20))
+def test_only_loop_repeats_are_dropped(seed):
+    rng = random.Random(seed)
+    lines = ["Yes.", "Thank you.", "I rolled a 12.", "I rolled a 17.", "Okay."]
+    records, t = [], 0.0
+    for _ in range(200):
+        t += rng.choice([0.5, 1.0, 3.0, 20.0])
+        records.append(record(t, rng.choice(lines), speaker=rng.choice(["ana", "bo", "cy"])))
+
+    kept = list(drop_repeats(records))
+    assert [r["start"] for r in kept] == sorted(r["start"] for r in kept)
+    kept_at = {(r["start"], r["speaker"]) for r in kept}
+    previous = {}
+    for r in records:
+        if (r["start"], r["speaker"]) not in kept_at:
+            # A dropped segment repeats the same speaker's previous line, numbers and all.
+            last_text, last_start = previous[r["speaker"]]
+            assert last_text == r["text"] and r["start"] - last_start <= 5.0
+        previous[r["speaker"]] = (r["text"], r["start"])
@@ -0,0 +1,222 @@
+"""
+Craig Audio Layer - The Dungeon Scribe
+
+Reading tracks out of a Craig zip: which members can be piped into ffmpeg, and the temporary
+copy used for the ones that cannot. The single read of a track (TrackScan) must find exactly
+the onset and speech regions a scan of the whole decoded track finds, and pack_speech must
+cut the same windows a packer working on the whole track would, with timelines that map
+every window back onto the track.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import io
+import os
+import shutil
+import struct
+import subprocess
+import zipfile
+
+import numpy as np
+import pytest
+
+from craig_audio import (
+    CUT_FRAME_SAMPLES,
+    SAMPLE_RATE,
+    SpeechTimeline,
+    TrackScan,
+    decode_audio_file,
+    decode_zip_member,
+    detect_first_onset,
+    iter_source_chunks,
+    mp4_index_first,
+    pack_speech,
+    pcm_to_float32,
+    quietest_cut,
+    speech_regions,
+    zip_member_input,
+)
+
+def box(kind: bytes, payload: bytes = b"", large: bool = False) -> bytes:
+    if large:
+        return struct.pack(">I4sQ", 1, kind, 16 + len(payload)) + payload
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+# === Container Detection ===
+@pytest.mark.parametrize("layout,expected", [
+    ([box(b"ftyp", b"M4A "), box(b"moov", b"x" * 40), box(b"mdat", b"a" * 100)], True),
+    ([box(b"ftyp", b"M4A "), box(b"free", b"0" * 8), box(b"mdat", b"a" * 100), box(b"moov")], False),
+    ([box(b"ftyp", b"M4A "), box(b"free", b"0" * 8, large=True), box(b"moov"), box(b"mdat")], True),
+    ([box(b"ftyp", b"M4A "), struct.pack(">I4s", 0, b"mdat")], False),
+    ([box(b"ftyp")[:6]], False),
+])
+def test_mp4_index_first(layout, expected):
+    assert mp4_index_first(io.BytesIO(b"".join(layout))) is expected
+
+def test_members_that_need_seeking_are_copied(tmp_path):
+    zip_path = tmp_path / "session.zip"
+    trailing = b"".join([box(b"ftyp"), box(b"mdat", b"a" * 10), box(b"moov")])
+    with zipfile.ZipFile(zip_path, "w") as zip_ref:
+        zip_ref.writestr("1-ana.m4a", trailing)
+        zip_ref.writestr("2-bo.flac", b"fLaC")
+
+    with zip_member_input(str(zip_path), "2-bo.flac") as (input_arg, stream):
+        assert input_arg == "pipe:0" and stream.read() == b"fLaC"
+    with zip_member_input(str(zip_path), "1-ana.m4a") as (input_arg, stream):
+        assert stream is None and input_arg.endswith(".m4a")
+        with open(input_arg, "rb") as f:
+            assert f.read() == trailing
+    assert not os.path.exists(input_arg)
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+@pytest.mark.parametrize("faststart", [False, True])
+def test_m4a_members_decode_like_extracted_files(tmp_path, faststart):
+    rng = np.random.default_rng(0)
+    pcm = (rng.normal(0, 3000, SAMPLE_RATE * 3)).astype(np.int16)
+    track = tmp_path / "1-ana.m4a"
+    cmd = ["ffmpeg", "-y", "-loglevel", "error", "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-i", "pipe:0"]
+    subprocess.run(cmd + (["-movflags", "+faststart"] if faststart else []) + [str(track)], input=pcm.tobytes(), check=True)
+    zip_path = tmp_path / "session.zip"
+    with zipfile.ZipFile(zip_path, "w") as zip_ref:
+        zip_ref.write(track, track.name)
+
+    expected = decode_audio_file(str(track))
+    assert np.array_equal(decode_zip_member(str(zip_path), track.name), expected)
+    assert np.array_equal(np.concatenate(list(iter_source_chunks((str(zip_path), track.name), 1))), expected)
+
+# === Single-Pass Scan ===
+def synthetic_track(seed: int) -> np.ndarray:
+    """Seeded audio of near-silence and speech-loud noise bursts, up to a few minutes long."""
+    rng = np.random.default_rng(seed)
+    pieces = []
+    for _ in range(rng.integers(1, 20)):
+        length = int(rng.integers(1, SAMPLE_RATE * rng.choice([1, 5, 30])))
+        amplitude = rng.choice([1, 5, 60, 3000, 20000])
+        pieces.append(rng.normal(0, amplitude, length).clip(-32767, 32767).astype(np.int16))
+    return pcm_to_float32(np.concatenate(pieces))
+
+def random_blocks(audio: np.ndarray, seed: int):
+    rng = np.random.default_rng(seed)
+    at = 0
+    while at < len(audio):
+        size = int(rng.choice([1, 10, 60]) * rng.integers(1, SAMPLE_RATE))
+        yield audio[at:at + size]
+        at += size
+
+@pytest.mark.parametrize("gate", [True, False])
+@pytest.mark.parametrize("seed", range(12))
+def test_scan_matches_whole_track_detection(seed, gate):
+    audio = synthetic_track(seed)
+    pad = [0.0, 0.4, 1.3][seed % 3]
+    scan = TrackScan(random_blocks(audio, seed), gate, pad)
+    onset = scan.find_onset()
+    windows = list(pack_speech(scan, 30.0))
+
+    assert onset == detect_first_onset(audio)
+    expected = speech_regions(audio, pad=pad) if gate else [(0.0, len(audio) / SAMPLE_RATE)]
+    assert [tuple(region) for region in scan.regions] == expected
+    assert scan.samples == len(audio)
+    assert sum(len(window) for window, _ in windows) == pytest.approx(
+        sum(end - start for start, end in expected) * SAMPLE_RATE, abs=2 * len(expected) + 2)
+
+def test_silence_is_not_held_while_reading():
+    quiet = np.zeros(SAMPLE_RATE * 600, dtype=np.float32)
+    loud = np.random.default_rng(0).normal(0, 0.3, SAMPLE_RATE * 2).astype(np.float32)
+    audio = np.concatenate((loud, quiet, loud, quiet))
+    scan = TrackScan(random_blocks(audio, 0))
+    held = []
+    for _ in pack_speech(scan, 30.0):
+        held.append(sum(len(block) for block in scan._held))
+    largest = max(held + [sum(len(block) for block in scan._held)])
+    assert largest < SAMPLE_RATE * 70  # one block of up to 60 s, never the ten-minute silences
+
+# === Packing ===
+def reference_pack(audio: np.ndarray, regions, window_seconds: float) -> list:
+    """The windows of a whole decoded track: regions packed greedily, long ones split at quiet frames."""
+    windows, pieces, entries, filled = [], [], [], 0.0
+    for start, end in regions:
+        lo = round(start * SAMPLE_RATE)
+        while end - start > 1 / SAMPLE_RATE:
+            length = min(end - start, window_seconds)
+            if filled + length > window_seconds and pieces:
+                windows.append((np.concatenate(pieces), entries))
+                pieces, entries, filled = [], [], 0.0
+            piece = audio[lo:round((start + length) * SAMPLE_RATE)]
+            if end - start > window_seconds:
+                piece = piece[:quietest_cut(piece)]
+                length = len(piece) / SAMPLE_RATE
+            entries.append((filled, start, len(piece) / SAMPLE_RATE))
+            pieces.append(piece)
+            filled += len(piece) / SAMPLE_RATE
+            lo += len(piece)
+            start += length
+    if pieces:
+        windows.append((np.concatenate(pieces), entries))
+    return windows
+
+@pytest.mark.parametrize("window_seconds", [5.0, 30.0, 600.0])
+@pytest.mark.parametrize("seed", range(8))
+def test_pack_speech_matches_reference_packer(seed, window_seconds):
+    audio = synthetic_track(seed)
+    windows = list(pack_speech(TrackScan(random_blocks(audio, seed)), window_seconds))
+    expected = reference_pack(audio, speech_regions(audio), window_seconds)
+
+    assert len(windows) == len(expected)
+    for (packed, timeline), (reference, entries) in zip(windows, expected):
+        assert np.array_equal(packed, reference) and timeline.entries == entries
+        assert len(packed) <= window_seconds * SAMPLE_RATE + 1
+        for gated, original, duration in timeline.entries:
+            at, n = round(gated * SAMPLE_RATE), round(duration * SAMPLE_RATE)
+            source = round(timeline.to_original(gated) * SAMPLE_RATE)
+            assert source == round(original * SAMPLE_RATE)
+            assert np.array_equal(packed[at:at + n], audio[source:source + n])
+
+def reference_quietest_cut(audio: np.ndarray, search_seconds: float) -> int:
+    search = min(int(search_seconds * SAMPLE_RATE), len(audio) // 2) // CUT_FRAME_SAMPLES * CUT_FRAME_SAMPLES
+    if search <= 0:
+        return len(audio)
+    best = None
+    for frame_start in range(len(audio) - search, len(audio), CUT_FRAME_SAMPLES):
+        frame = audio[frame_start:frame_start + CUT_FRAME_SAMPLES].astype(np.float64)
+        energy = float((frame * frame).sum())
+        if best is None or energy <= best[0]:  # the latest of equally quiet frames
+            best = (energy, frame_start + CUT_FRAME_SAMPLES // 2)
+    return best[1]
+
+@pytest.mark.parametrize("seed", range(30))
+def test_quietest_cut_picks_the_latest_quietest_frame(seed):
+    rng = np.random.default_rng(seed)
+    audio = rng.normal(0, 0.2, int(rng.integers(0, SAMPLE_RATE * 8))).astype(np.float32)
+    for _ in range(int(rng.integers(0, 3))):  # pauses, sometimes several equally silent ones
+        at = int(rng.integers(0, max(1, len(audio) - CUT_FRAME_SAMPLES * 3)))
+        audio[at:at + CUT_FRAME_SAMPLES * 3] = 0.0
+    search = float(rng.choice([0.01, 1.0, 3.0]))
+
+    cut = quietest_cut(audio, search)
+    assert cut == reference_quietest_cut(audio, search)
+    assert len(audio) // 2 <= cut <= len(audio)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_timeline_maps_gated_times_back(seed):
+    rng = np.random.default_rng(seed)
+    entries, gated, original = [], 0.0, 0.0
+    for _ in range(int(rng.integers(1, 8))):
+        original += float(rng.choice([0.0, 0.5, 12.0]))  # the silence dropped before this region
+        duration = float(rng.choice([0.25, 1.0, 7.5]))
+        entries.append((gated, original, duration))
+        gated += duration
+        original += duration
+    timeline = SpeechTimeline(entries)
+
+    times = np.sort(rng.uniform(-1.0, gated + 1.0, 200))
+    mapped = [timeline.to_original(t) for t in times]
+    assert mapped == sorted(mapped)  # monotone
+    for t, m in zip(times, mapped):
+        i = max(0, np.searchsorted([e[0] for e in entries], t, side="right") - 1)
+        start, origin, duration = entries[i]
+        assert m == origin + min(max(t - start, 0.0), duration)
+    for (_, origin, duration), (next_gated, next_origin, _) in zip(entries, entries[1:]):
+        # A segment ending exactly on a join ends its region; one starting there starts the next.
+        assert timeline.to_original(next_gated, end=True) == origin + duration
+        assert timeline.to_original(next_gated) == next_origin
@@ -0,0 +1,103 @@
+"""
+Cross-Track Bleed Dedup - The Dungeon Scribe
+
+A sentence that leaked into another player's mic is dropped from the quieter track, while
+short lines two players really both said ("Yes.", "Nat 20!") are kept for both speakers.
+On random sessions the sweep line keeps no overlapping pair of copies, drops nothing
+without a more confident copy, and releases each survivor as soon as nothing later can
+overlap it.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import random
+
+import pytest
+
+from dedupe_segments import confidence, dedupe_bleed, is_bleed_copy, normalize
+
+def seg(user: str, start: float, text: str, avg_logprob: float = -0.3) -> dict:
+    return {"discord_user": user, "start": start, "end": start + 1.5, "text": text,
+            "avg_logprob": avg_logprob, "no_speech_prob": 0.1}
+
+def test_short_identical_lines_from_two_speakers_are_kept():
+    segments = [seg("ana", 10.0, "Yes."), seg("bo", 10.2, "Yes."),
+                seg("ana", 20.0, "Nat 20!"), seg("bo", 20.1, "nat 20"),
+                seg("ana", 30.0, "Okay."), seg("bo", 30.3, "Okay.", -1.2)]
+    stats = {}
+    assert list(dedupe_bleed(segments, stats=stats)) == segments
+    assert stats["dropped"] == 0
+
+def test_bled_sentence_is_dropped_from_the_quieter_track():
+    original = seg("ana", 10.0, "I swing my axe at the goblin.")
+    bleed = seg("bo", 10.3, "I swing my axe at the goblin", -1.1)
+    assert list(dedupe_bleed([original, bleed])) == [original]
+
+def test_short_lines_are_never_bleed_copies():
+    assert not is_bleed_copy(normalize("Yes."), normalize("Yes."))
+    assert not is_bleed_copy(normalize("Nat 20!"), normalize("Nat 20!"))
+    assert not is_bleed_copy(normalize("the goblin"), normalize("I swing my axe at the goblin"))
+    assert is_bleed_copy(normalize("Roll for initiative."), normalize("Roll for initiative."))
+
+# === Sweep-Line Properties ===
+SENTENCES = ["I swing my axe at the goblin", "Roll for initiative everyone", "The door is locked from inside",
+             "We should rest before the boss", "Yes", "Nat 20", "Okay okay okay"]
+
+def random_session(seed: int, count: int = 150) -> list[dict]:
+    rng = random.Random(seed)
+    start, segments = 0.0, []
+    for _ in range(count):
+        start += rng.choice([0.0, 0.1, 0.5, 1.0, 3.0])
+        words = rng.choice(SENTENCES).split()
+        if rng.random() < 0.3:
+            words = words[:max(1, len(words) - 1)]  # a partial copy
+        text = " ".join(words)
+        segments.append({"discord_user": rng.choice("abc"), "start": start, "end": start + rng.choice([0.5, 1.0, 2.5]),
+                         "text": rng.choice([text, text.upper() + "!"]), "avg_logprob": -rng.random(),
+                         "no_speech_prob": rng.random()})
+    return segments
+
+def overlapping(earlier: dict, later: dict, tolerance: float) -> bool:
+    return earlier["end"] + tolerance >= later["start"]
+
+@pytest.mark.parametrize("tolerance", [0.0, 1.0])
+@pytest.mark.parametrize("seed", range(25))
+def test_sweep_line_properties(seed, tolerance):
+    segments = random_session(seed)
+    consumed, released = [0], []
+
+    def stream():
+        for seg in segments:
+            consumed[0] += 1
+            yield seg
+
+    stats = {}
+    for seg in dedupe_bleed(stream(), tolerance=tolerance, stats=stats):
+        released.append((seg, consumed[0]))
+    kept = [seg for seg, _ in released]
+    dropped = [seg for seg in segments if not any(seg is k for k in kept)]
+
+    # Survivors come out in input order, and the counts add up.
+    order = [next(i for i, s in enumerate(segments) if s is seg) for seg in kept]
+    assert order == sorted(order) and stats.get("dropped", 0) == len(dropped)
+
+    # No two survivors from different speakers that overlap are bleed copies of each other.
+    for i, a in enumerate(kept):
+        for b in kept[i + 1:]:
+            if a["discord_user"] != b["discord_user"] and overlapping(a, b, tolerance):
+                assert not is_bleed_copy(normalize(a["text"]), normalize(b["text"]))
+
+    # Every dropped segment lost to an overlapping, at least as confident copy on another track.
+    for seg in dropped:
+        assert any(other is not seg and other["discord_user"] != seg["discord_user"]
+                   and (overlapping(other, seg, tolerance) or overlapping(seg, other, tolerance))
+                   and is_bleed_copy(normalize(seg["text"]), normalize(other["text"]))
+                   and confidence(other) >= confidence(seg) for other in segments)
+
+    # A survivor is released as soon as a segment starts past the tolerance after everything up to it.
+    for seg, at in released:
+        index = next(i for i, s in enumerate(segments) if s is seg)
+        horizon = max(s["end"] for s in segments[:index + 1]) + tolerance
+        later = [j for j in range(index + 1, len(segments)) if segments[j]["start"] > horizon]
+        assert at <= (later[0] + 1 if later else len(segments))
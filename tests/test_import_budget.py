@@ -0,0 +1,20 @@
+"""
+Import Budget - The Dungeon Scribe
+
+Every light module imports in a fresh interpreter without pulling in torch, whisper,
+openai or the other heavy dependencies (what `python -m dungeonscribe check-imports` checks,
+minus the timing, which depends on the machine).
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import pytest
+
+from dungeonscribe import LIGHT_MODULES, measure_import
+
+@pytest.mark.parametrize("module", LIGHT_MODULES)
+def test_light_module_imports_nothing_heavy(module):
+    result = measure_import(module)
+    assert not result.get("error"), result.get("error")
+    assert result["heavy"] == []
@@ -0,0 +1,81 @@
+"""
+LLM Response Cache - The Dungeon Scribe
+
+Random runs of puts and gets under a fake clock, checked against a plain-dict model of the
+cache: a hit returns the stored reply, entries expire after the TTL, and the least recently
+used entries go first once the cache is over its size cap. Any change to the messages,
+model or sampling parameters is a different key.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import random
+
+import pytest
+
+import llm_cache
+from llm_cache import LLMCache
+
+TTL_SECONDS = 100.25  # clock steps are multiples of 0.5 s, so no entry is ever exactly at the TTL
+
+class Reference:
+    """What the cache should hold: key -> [reply, created, accessed]."""
+
+    def __init__(self, ttl: float, max_bytes: int):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.entries = {}
+
+    def expired(self, key, now) -> bool:
+        return now - self.entries[key][1] > self.ttl
+
+    def get(self, key, now):
+        if key not in self.entries or self.expired(key, now):
+            self.entries.pop(key, None)
+            return None
+        self.entries[key][2] = now
+        return self.entries[key][0]
+
+    def put(self, key, reply, now):
+        self.entries[key] = [reply, now, now]
+        for expired in [k for k in self.entries if self.expired(k, now)]:
+            del self.entries[expired]
+        total = sum(len(entry[0].encode("utf-8")) for entry in self.entries.values())
+        for lru in sorted(self.entries, key=lambda k: self.entries[k][2]):
+            if total <= self.max_bytes:
+                break
+            total -= len(self.entries.pop(lru)[0].encode("utf-8"))
+
+@pytest.mark.parametrize("seed", range(20))
+def test_cache_matches_reference(tmp_path, monkeypatch, seed):
+    rng = random.Random(seed)
+    clock = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: clock[0])
+    cache = LLMCache(str(tmp_path / "cache.sqlite3"), ttl_days=TTL_SECONDS / 86400, max_mb=300 / 1024 / 1024)
+    reference = Reference(cache.ttl, cache.max_bytes)
+    keys = [LLMCache.make_key([{"role": "user", "content": f"part {i}"}], "gpt-test", {"temperature": 0.3})
+            for i in range(8)]
+    try:
+        for _ in range(200):
+            clock[0] += rng.choice([0.5, 1, 5, 30, 60])  # strictly increasing, so LRU order is unambiguous
+            key = rng.choice(keys)
+            if rng.random() < 0.4:
+                reply = "é" * rng.randint(1, 40) + key[:4]
+                cache.put(key, "gpt-test", reply)
+                reference.put(key, reply, clock[0])
+            else:
+                assert cache.get(key) == reference.get(key, clock[0])
+            assert cache.stats()["entries"] == len(reference.entries)
+    finally:
+        cache.close()
+
+def test_key_covers_messages_model_and_params():
+    messages = [{"role": "system", "content": "You are a scribe."}, {"role": "user", "content": "Summarize."}]
+    key = LLMCache.make_key(messages, "gpt-4o-mini", {"temperature": 0.3, "max_tokens": None})
+    assert key == LLMCache.make_key([dict(reversed(list(m.items()))) for m in messages], "gpt-4o-mini",
+                                    {"max_tokens": None, "temperature": 0.3})
+    assert key != LLMCache.make_key(messages[:1] + [{"role": "user", "content": "Summarize!"}], "gpt-4o-mini",
+                                    {"temperature": 0.3, "max_tokens": None})
+    assert key != LLMCache.make_key(messages, "gpt-4o", {"temperature": 0.3, "max_tokens": None})
+    assert key != LLMCache.make_key(messages, "gpt-4o-mini", {"temperature": 0.7, "max_tokens": None})
@@ -0,0 +1,99 @@
+"""
+LLM Client - The Dungeon Scribe
+
+Retries against a stand-in for the OpenAI endpoint: the server's Retry-After is honoured,
+tokens are reserved once per logical request and given back when it fails, and an
+exhausted quota fails at once instead of being retried like a rate limit.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import asyncio
+import types
+
+import pytest
+
+openai = pytest.importorskip("openai")
+httpx = pytest.importorskip("httpx")
+import llm_client
+from llm_client import LLMClient
+
+REQUEST = httpx.Request("POST", "https://api.example/v1/chat/completions")
+
+def rate_limited(headers=None, code="rate_limit_exceeded"):
+    response = httpx.Response(429, headers=headers or {}, request=REQUEST)
+    return openai.RateLimitError("slow down", response=response, body={"code": code, "message": "slow down"})
+
+def reply(text: str, total_tokens: int):
+    usage = types.SimpleNamespace(prompt_tokens=total_tokens - 1, completion_tokens=1, total_tokens=total_tokens)
+    return types.SimpleNamespace(usage=usage, choices=[types.SimpleNamespace(message=types.SimpleNamespace(content=text))])
+
+class Bucket:
+    """Records what a request reserves and gives back instead of rate limiting it."""
+
+    def __init__(self):
+        self.acquired, self.refunded = [], []
+
+    async def acquire(self, amount: float = 1.0):
+        self.acquired.append(amount)
+
+    def refund(self, amount: float):
+        self.refunded.append(amount)
+
+@pytest.fixture
+def server(monkeypatch):
+    """The client's endpoint answers from `server.outcomes` in turn; sleeps are recorded, not slept."""
+    state = types.SimpleNamespace(outcomes=[], calls=0, sleeps=[])
+
+    async def create(**kwargs):
+        outcome = state.outcomes[state.calls]
+        state.calls += 1
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def sleep(seconds):
+        state.sleeps.append(seconds)
+
+    client = LLMClient("gpt-test", api_key="test", max_retries=3, count_tokens=lambda text: 10)
+    client.client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create)))
+    client.token_bucket = Bucket()
+    client.request_bucket = Bucket()
+    monkeypatch.setattr(llm_client.asyncio, "sleep", sleep)
+    state.client = client
+    return state
+
+def chat(server):
+    return asyncio.run(server.client.chat([{"role": "user", "content": "hi"}], max_tokens=100))
+
+def test_retry_after_is_honoured_and_tokens_reserved_once(server):
+    server.outcomes = [rate_limited({"retry-after": "7"}), rate_limited({"retry-after-ms": "1500"}), reply(" ok ", 30)]
+    assert chat(server) == "ok"
+    assert server.sleeps == [7.0, 1.5]
+    assert server.client.token_bucket.acquired == [114]  # one reservation for three attempts
+    assert server.client.token_bucket.refunded == [114 - 30]
+    assert len(server.client.request_bucket.acquired) == 3
+    assert server.client.metrics.retries == 2
+
+def test_backoff_without_retry_after_is_bounded(server, monkeypatch):
+    monkeypatch.setattr(llm_client.random, "uniform", lambda low, high: high)
+    server.outcomes = [openai.APITimeoutError(REQUEST)] * 3 + [reply("ok", 20)]
+    assert chat(server) == "ok"
+    assert server.sleeps == [llm_client.BASE_BACKOFF * 2 ** attempt for attempt in range(3)]
+
+def test_failed_request_refunds_its_reservation(server):
+    server.outcomes = [rate_limited()] * 4
+    with pytest.raises(openai.RateLimitError):
+        chat(server)
+    assert server.calls == 4
+    assert server.client.token_bucket.acquired == [114]
+    assert server.client.token_bucket.refunded == [114]
+    assert server.client.metrics.failures == 1
+
+def test_insufficient_quota_fails_fast(server):
+    server.outcomes = [rate_limited({"retry-after": "1"}, code="insufficient_quota"), reply("ok", 20)]
+    with pytest.raises(openai.RateLimitError):
+        chat(server)
+    assert server.calls == 1 and server.sleeps == []
+    assert server.client.token_bucket.refunded == [114]
@@ -0,0 +1,47 @@
+"""
+Session File Names - The Dungeon Scribe
+
+A second recording from the same day never overwrites the first one's files, whether the
+first was run from the GUI, the pipeline or the batch queue, and later steps find the newest.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import zipfile
+
+from batch_runner import JobQueue
+from session_files import latest_session, session_paths, unique_session
+
+def make_config(tmp_path) -> dict:
+    return {"local_transcript_dir": str(tmp_path / "transcripts"), "local_summary_dir": str(tmp_path / "summaries")}
+
+def write(path, text="x"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+def test_existing_files_make_the_name_unique(tmp_path):
+    config = make_config(tmp_path)
+    assert unique_session(config, "2025-04-01") == "2025-04-01"
+    write(session_paths(config, "2025-04-01")["transcript"])
+    assert unique_session(config, "2025-04-01") == "2025-04-01 (2)"
+    write(session_paths(config, "2025-04-01 (2)")["summary"])  # only a summary left behind
+    assert unique_session(config, "2025-04-01") == "2025-04-01 (3)"
+    assert unique_session(config, "2025-04-01", taken=lambda name: name == "2025-04-01 (3)") == "2025-04-01 (4)"
+    assert latest_session(config, "2025-04-01") == "2025-04-01 (2)"
+    assert latest_session(config, "2025-04-02") == "2025-04-02"
+
+def test_batch_queue_checks_the_output_folders(tmp_path):
+    config = make_config(tmp_path)
+    write(session_paths(config, "2025-04-01")["transcript"])  # transcribed earlier from the GUI
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"))
+    try:
+        sessions = []
+        for n in range(2):
+            zip_path = tmp_path / f"craig-2025-04-01-{n}.zip"
+            with zipfile.ZipFile(zip_path, "w") as zip_ref:
+                zip_ref.writestr("info.txt", f"Start time:\t2025-04-01T19:0{n}:00Z\n")
+            sessions.append(queue.add(zip_path, config)["session"])
+    finally:
+        queue.close()
+    assert sessions == ["2025-04-01 (2)", "2025-04-01 (3)"]
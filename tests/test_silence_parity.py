@@ -0,0 +1,61 @@
+"""
+Silence Detection Parity - The Dungeon Scribe
+
+craig_audio's vectorized silence detection against pydub.silence.detect_nonsilent, which it
+replaces: the whole-track scan, the first-onset shortcut and a SilenceScanner fed in blocks
+of random size must all give pydub's exact millisecond offsets.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import numpy as np
+import pytest
+
+pydub = pytest.importorskip("pydub")
+from pydub.silence import detect_nonsilent
+
+from craig_audio import SAMPLE_RATE, SilenceScanner, detect_first_onset, detect_nonsilent_ranges, pcm_to_float32
+
+SEEDS = range(6)
+SETTINGS = [(-50, 100), (-50, 500), (-40, 50), (-30, 250), (-60, 1000)]
+
+def synthetic_track(seed: int) -> np.ndarray:
+    """Seeded int16 audio: near-silent noise and loud bursts of random, uneven lengths."""
+    rng = np.random.default_rng(seed)
+    pieces = []
+    for _ in range(rng.integers(2, 12)):
+        length = int(rng.integers(1, SAMPLE_RATE * 2))  # not always a whole millisecond
+        amplitude = rng.choice([2, 20, 60, 300, 3000, 20000])
+        pieces.append(rng.normal(0, amplitude, length).clip(-32768, 32767).astype(np.int16))
+    return np.concatenate(pieces)
+
+def pydub_ranges(pcm: np.ndarray, silence_thresh: int, min_silence_len: int) -> list[list[int]]:
+    segment = pydub.AudioSegment(data=pcm.tobytes(), sample_width=2, frame_rate=SAMPLE_RATE, channels=1)
+    return detect_nonsilent(segment, min_silence_len=min_silence_len, silence_thresh=silence_thresh)
+
+def scan_in_blocks(audio: np.ndarray, rng, silence_thresh: int, min_silence_len: int) -> list[list[int]]:
+    scanner = SilenceScanner(silence_thresh, min_silence_len)
+    ranges, at = [], 0
+    while at < len(audio):
+        size = int(rng.integers(1, SAMPLE_RATE))
+        ranges += scanner.feed(audio[at:at + size])
+        at += size
+    return ranges + scanner.finish()
+
+@pytest.mark.parametrize("silence_thresh,min_silence_len", SETTINGS)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_matches_pydub(seed, silence_thresh, min_silence_len):
+    pcm = synthetic_track(seed)
+    audio = pcm_to_float32(pcm)
+    expected = pydub_ranges(pcm, silence_thresh, min_silence_len)
+
+    assert detect_nonsilent_ranges(audio, silence_thresh, min_silence_len) == expected
+    assert detect_first_onset(audio, silence_thresh, min_silence_len) == (expected[0][0] / 1000 if expected else 0.0)
+    rng = np.random.default_rng(seed + 100)
+    assert scan_in_blocks(audio, rng, silence_thresh, min_silence_len) == expected
+
+@pytest.mark.parametrize("samples", [0, 1, 15, 16 * 99, 16 * 100 + 7])
+def test_short_tracks_match_pydub(samples):
+    pcm = np.full(samples, 5000, dtype=np.int16)
+    assert detect_nonsilent_ranges(pcm_to_float32(pcm), -50, 100) == pydub_ranges(pcm, -50, 100)
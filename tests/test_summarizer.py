@@ -0,0 +1,93 @@
+"""
+Session Summarizer - The Dungeon Scribe
+
+Map-reduce summarization with a stand-in for the LLM client: how a long transcript is split
+into overlapping chunks, that the reduce step sees the parts' notes in transcript order
+however the requests finish, and that a transcript within the context limit is summarized
+in a single request.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import asyncio
+import random
+import re
+import types
+
+import pytest
+
+import dnd_transcript_summarizer as summarizer
+
+PART_PATTERN = re.compile(r"Transcript \(part (\d+) of (\d+)\):")
+
+class FakeLLM:
+    """Answers part prompts with "NOTES-<part>", later parts first, and anything else with "SUMMARY"."""
+
+    def __init__(self):
+        self.prompts = []
+        self.cache = None
+        self.metrics = types.SimpleNamespace(
+            latencies=[], report=lambda: "", summary=lambda: {"prompt_tokens": 0, "completion_tokens": 0})
+
+    async def chat(self, messages, temperature=0.3, max_tokens=None):
+        prompt = messages[-1]["content"]
+        self.prompts.append(prompt)
+        match = PART_PATTERN.search(prompt)
+        if match is None:
+            return "SUMMARY"
+        part, total = int(match.group(1)), int(match.group(2))
+        await asyncio.sleep(0.001 * (total - part))
+        return f"NOTES-{part}"
+
+@pytest.fixture
+def llm(monkeypatch):
+    summarizer.load_settings({"summary_context_tokens": 1500, "summary_chunk_tokens": 300,
+                              "summary_chunk_overlap_tokens": 40})
+    monkeypatch.setattr(summarizer, "count_tokens", lambda text: len(text.split()))
+    summarizer.llm = FakeLLM()
+    yield summarizer.llm
+    summarizer.load_settings({})
+
+def transcript(seed: int, lines: int = 80) -> str:
+    rng = random.Random(seed)
+    return "\n".join(f"L{i} " + "word " * rng.choice([0, 1, 3, 8, 20, 40, 70]) for i in range(lines))
+
+def tokens(lines: list[str]) -> int:
+    return sum(len(line.split()) + 1 for line in lines)
+
+@pytest.mark.parametrize("budget,overlap", [(30, 0), (60, 12), (60, 30), (100, 80), (8, 4)])
+@pytest.mark.parametrize("seed", range(10))
+def test_chunks_overlap_at_whole_turns_within_budget(monkeypatch, seed, budget, overlap):
+    monkeypatch.setattr(summarizer, "count_tokens", lambda text: len(text.split()))
+    text = transcript(seed)
+    chunks = [chunk.split("\n") for chunk in summarizer.split_transcript(text, budget, overlap)]
+    limit = min(overlap, budget // 2)
+
+    rebuilt = list(chunks[0])
+    for previous, chunk in zip(chunks, chunks[1:]):
+        carried = [line for line in chunk if line in previous]
+        new = chunk[len(carried):]
+        room = min(limit, budget - tokens(new[:1]))  # the overlap, if the next turn fits beside it
+        assert carried == previous[len(previous) - len(carried):] and new
+        assert tokens(carried) <= max(room, 0)
+        if len(carried) < len(previous):  # carried as many whole turns as fit
+            assert tokens(previous[len(previous) - len(carried) - 1:]) > room
+        rebuilt.extend(new)
+    assert rebuilt == text.split("\n")
+    assert all(tokens(chunk) <= budget or len(chunk) == 1 for chunk in chunks)
+
+def test_reduce_keeps_the_parts_in_order(llm):
+    summary = asyncio.run(summarizer.summarize_map_reduce(transcript(0)))
+    parts = [prompt for prompt in llm.prompts if PART_PATTERN.search(prompt)]
+    total = len(parts)
+    assert summary == "SUMMARY" and total > 2
+    reduce_prompt = llm.prompts[-1]
+    positions = [reduce_prompt.index(f"--- Notes on part {i} of {total} ---\nNOTES-{i}\n") for i in range(1, total + 1)]
+    assert positions == sorted(positions)
+
+def test_transcript_within_the_context_limit_skips_the_map_step(llm):
+    text = "\n".join(f"L{i} we open the door" for i in range(20))
+    assert summarizer.summarize_text(text) == "SUMMARY"
+    assert len(llm.prompts) == 1
+    assert not PART_PATTERN.search(llm.prompts[0]) and text in llm.prompts[0]
@@ -0,0 +1,39 @@
+"""
+Run Telemetry - The Dungeon Scribe
+
+Peak memory is the peak during the run, not over the life of a long-running GUI or service
+process; without a way to sample it, the OS's lifetime peak is reported under its own name.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import telemetry
+
+def test_peak_is_sampled_during_the_run(monkeypatch):
+    readings = iter([{"self": 100, "children": 0}, {"self": 300, "children": 50}])
+    monkeypatch.setattr(telemetry, "current_rss_bytes", lambda: next(readings, {"self": 200, "children": 10}))
+    monkeypatch.setattr(telemetry, "RSS_SAMPLE_SECONDS", 3600)  # only the start and finish samples
+
+    first = telemetry.start_run("one")
+    first.track("ana", audio_seconds=1.0)
+    assert first.to_dict()["peak_rss_bytes"] == {"self": 100, "children": 0}  # so far, e.g. a worker's task
+    assert first.finish().peak_rss == {"self": 300, "children": 50}
+
+    second = telemetry.start_run("two")  # a later run in the same process starts from scratch
+    assert second.finish().peak_rss == {"self": 200, "children": 10}
+
+def test_lifetime_peak_is_named_as_such(monkeypatch):
+    monkeypatch.setattr(telemetry, "current_rss_bytes", lambda: {})
+    monkeypatch.setattr(telemetry, "peak_rss_bytes", lambda children=False: 7 if children else 9)
+    metrics = telemetry.start_run("one").finish()
+    assert metrics.peak_rss == {"self_lifetime": 9, "children_lifetime": 7}
+
+    parent = telemetry.RunMetrics()
+    parent.merge(metrics.to_dict(), process="service")
+    assert parent.peak_rss == {"service_lifetime": 9}
+
+def test_current_rss_reads_this_process():
+    rss = telemetry.current_rss_bytes()
+    if "self" in rss:
+        assert rss["self"] > 0
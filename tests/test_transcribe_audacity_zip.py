@@ -0,0 +1,82 @@
+"""
+Transcribe Audacity Zip - The Dungeon Scribe
+
+With model.transcribe() the tracks are interleaved window by window, always continuing the
+track furthest behind, so the k-way merge can write the start of the session before the
+last track has been reached. The merge itself gives exactly a stable sort of all the tracks'
+segments, and reads each track only as far as the output has got.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import random
+import types
+
+import numpy as np
+import pytest
+
+import transcribe_audacity_zip as transcriber
+from craig_audio import SAMPLE_RATE, SpeechTimeline
+
+@pytest.fixture
+def serial():
+    transcriber.load_settings({"inference_batch_size": 1, "speech_gating": False})
+    yield
+    transcriber.load_settings({})
+
+class Model:
+    def transcribe(self, audio, **options):
+        return {"segments": [{"start": 0.0, "end": len(audio) / SAMPLE_RATE, "text": f" {int(audio[0])}"}]}
+
+def track(name: str, offset: float, starts: list[float], seconds: float = 10.0) -> dict:
+    """A prepared track whose windows begin at `starts` on its timeline; each says its start."""
+    windows = [(np.full(int(seconds * SAMPLE_RATE), start, dtype=np.float32), SpeechTimeline([(0.0, start, seconds)]))
+               for start in starts]
+    return {"discord_user": name, "offset": offset, "scan": types.SimpleNamespace(), "windows": iter(windows)}
+
+def test_windows_follow_the_track_furthest_behind(serial):
+    tracks = [track("ana", 0.0, [0, 100, 200]), track("bo", 0.0, [50, 150]), track("cy", 300.0, [0])]
+    order, texts = [], {}
+    for index, offset, raw_segments, done in transcriber.iter_track_results(Model(), tracks):
+        order.append((index, done))
+        texts.setdefault(index, []).extend(offset + seg["start"] for seg in raw_segments)
+
+    assert order == [(0, False), (1, False), (0, False), (1, False), (0, False), (1, True), (0, True),
+                     (2, False), (2, True)]
+    assert texts == {0: [0, 100, 200], 1: [50, 150], 2: [300]}
+
+# === Merge ===
+def random_streams(seed: int) -> list[list[dict]]:
+    rng = random.Random(seed)
+    streams = []
+    for track_index in range(rng.randint(1, 6)):
+        start, stream = 0.0, []
+        for i in range(rng.randint(0, 40)):
+            start += rng.choice([0.0, 0.5, 1.0, 4.0])  # equal starts within and across tracks
+            stream.append({"start": start, "track": track_index, "i": i})
+        streams.append(stream)
+    return streams
+
+@pytest.mark.parametrize("seed", range(30))
+def test_merge_is_a_stable_sort(seed):
+    streams = random_streams(seed)
+    everything = [seg for stream in streams for seg in stream]
+    assert list(transcriber.merge_track_streams(streams)) == sorted(everything, key=lambda s: s["start"])
+
+@pytest.mark.parametrize("seed", range(10))
+def test_merge_reads_each_track_only_as_far_as_needed(seed):
+    streams = random_streams(seed)
+    read = [0] * len(streams)
+
+    def lazily(index):
+        for seg in streams[index]:
+            read[index] += 1
+            yield seg
+
+    taken = [0] * len(streams)
+    for seg in transcriber.merge_track_streams(lazily(i) for i in range(len(streams))):
+        taken[seg["track"]] += 1
+        # Each track is read up to what has been output, plus the one segment it is waiting with.
+        assert all(r <= t + 1 for r, t in zip(read, taken))
+    assert read == taken == [len(stream) for stream in streams]
@@ -0,0 +1,119 @@
+"""
+Transcription Cache - The Dungeon Scribe
+
+A cached track is reused only when nothing that changes its segments has changed: the
+track's bytes, the model, and every setting cache_params() covers. Settings that only
+change how fast the run goes, or what happens after transcription (speaker names, bleed
+dedup), keep the key, so editing them never forces a re-transcription.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import os
+import random
+import zipfile
+
+import pytest
+
+import transcribe_audacity_zip as transcriber
+from craig_audio import hash_track_source
+from transcription_cache import TranscriptionCache
+
+@pytest.fixture(autouse=True)
+def default_settings():
+    yield
+    transcriber.load_settings({})
+
+def key(settings: dict, audio_hash: str = "a" * 64, model_name: str = "base") -> str:
+    transcriber.load_settings(settings)
+    return TranscriptionCache.make_key(audio_hash, model_name, transcriber.cache_params())
+
+# === Cache Keys ===
+SPEED_ONLY = [
+    {"transcription_workers": 4}, {"torch_threads_per_worker": 2}, {"decode_workers": 8},
+    {"decode_prefetch_tracks": 6}, {"bleed_dedup": False}, {"bleed_similarity": 0.5},
+    {"speaker_map": {"ana#1": {"player": "Ana", "character": "Vex"}}},
+    {"inference_batch_size": 16},                          # still the batched engine
+    {"decode_window_seconds": 120},                        # the batched engine's windows are fixed
+    {"whisper_compute_type": "float16"},                   # same text as float32
+]
+CHANGES_OUTPUT = [
+    {"speech_gating": False}, {"speech_pad_seconds": 0.6}, {"inference_batch_size": 1},
+    {"inference_batch_size": 1, "decode_window_seconds": 120}, {"whisper_compute_type": "int8"},
+    {"whisper_backend": "faster-whisper"}, {"whisper_backend": "faster-whisper", "whisper_compute_type": "int8"},
+]
+
+@pytest.mark.parametrize("settings", SPEED_ONLY)
+def test_speed_settings_keep_the_key(settings):
+    assert key(settings) == key({})
+
+def test_pad_is_ignored_without_gating():
+    assert key({"speech_gating": False, "speech_pad_seconds": 1.0}) == key({"speech_gating": False})
+
+@pytest.mark.parametrize("settings", CHANGES_OUTPUT)
+def test_output_settings_change_the_key(settings):
+    assert key(settings) != key({})
+
+def test_audio_and_model_change_the_key():
+    assert key({}, audio_hash="b" * 64) != key({})
+    assert key({}, model_name="medium.en") != key({})
+
+def output_settings(settings: dict) -> tuple:
+    """What the segments depend on, worked out independently of cache_params()."""
+    backend = settings.get("whisper_backend", "whisper")
+    compute = settings.get("whisper_compute_type", "auto")
+    batched = backend == "whisper" and settings.get("inference_batch_size", 8) > 1
+    gating = settings.get("speech_gating", True)
+    return (batched, gating,
+            settings.get("speech_pad_seconds", 0.4) if gating else None,
+            None if batched else settings.get("decode_window_seconds", 600),
+            (backend, compute) if backend != "whisper" or compute == "int8" else None)
+
+def random_settings(rng: random.Random) -> dict:
+    choices = {
+        "whisper_backend": ["whisper", "faster-whisper"],
+        "whisper_compute_type": ["auto", "float16", "int8"],
+        "inference_batch_size": [1, 8, 16],
+        "speech_gating": [True, False],
+        "speech_pad_seconds": [0.4, 0.6],
+        "decode_window_seconds": [600, 120],
+        "transcription_workers": ["auto", 1, 4],
+        "bleed_dedup": [True, False],
+    }
+    return {name: rng.choice(values) for name, values in choices.items() if rng.random() < 0.5}
+
+@pytest.mark.parametrize("seed", range(20))
+def test_key_changes_exactly_when_the_output_can(seed):
+    rng = random.Random(seed)
+    for _ in range(20):
+        a, b = random_settings(rng), random_settings(rng)
+        assert (key(a) == key(b)) == (output_settings(a) == output_settings(b)), (a, b)
+
+# === Track Hashes ===
+def test_track_hash_follows_the_bytes(tmp_path):
+    data = os.urandom(300_000)  # several read chunks
+    path = tmp_path / "1-ana.flac"
+    path.write_bytes(data)
+    zip_path = tmp_path / "session.zip"
+    with zipfile.ZipFile(zip_path, "w") as zip_ref:
+        zip_ref.writestr("1-ana.flac", data)
+        zip_ref.writestr("2-bo.flac", data[:-1] + bytes([data[-1] ^ 1]))
+
+    assert hash_track_source(str(path)) == hash_track_source((str(zip_path), "1-ana.flac"))
+    assert hash_track_source((str(zip_path), "2-bo.flac")) != hash_track_source(str(path))
+
+# === Entries ===
+def test_entries_round_trip_and_evict_least_recently_used(tmp_path):
+    cache = TranscriptionCache(str(tmp_path), max_mb=1500 / 1024 / 1024)
+    entry = {"offset": 1.5, "segments": [{"start": 0.0, "end": 1.0, "text": " x" * 300}]}
+    keys = [key({}, audio_hash=str(i) * 64) for i in range(3)]
+    for i, k in enumerate(keys):  # the third entry puts the cache over its cap
+        cache.put(k, entry)
+        os.utime(cache._path(k), (i, i))  # distinct, ordered use times
+
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[1]) == cache.get(keys[2]) == entry
+    cache._path(keys[1]).write_text("{not json")
+    assert cache.get(keys[1]) is None
+    assert (cache.hits, cache.misses) == (2, 2)
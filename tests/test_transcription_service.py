@@ -0,0 +1,33 @@
+"""
+Transcription Service - The Dungeon Scribe
+
+A job sent to the service carries the submitting run's config (never its API key), and the
+service keeps jobs on its warm model unless the config asks for worker processes.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import pytest
+
+import transcription_service
+
+def test_jobs_carry_the_runs_config(monkeypatch, tmp_path):
+    sent = []
+
+    def request(message, on_event=None, autostart=True):
+        sent.append(message)
+        return {"event": "done", "output": message["output"]}
+
+    monkeypatch.setattr(transcription_service, "request", request)
+    config = {"whisper_backend": "faster-whisper", "speech_pad_seconds": 0.2,
+              "speaker_map": {"ana": {"player": "Ana"}}, "openai_api_key": "sk-secret"}
+    transcription_service.submit_job("session.zip", str(tmp_path / "t.txt"), "small", config=config)
+
+    job = sent[0]
+    assert job["model"] == "small"
+    assert job["config"] == {key: value for key, value in config.items() if key != "openai_api_key"}
+
+@pytest.mark.parametrize("workers,expected", [("auto", False), (1, False), (4, True), (True, False)])
+def test_explicit_worker_counts_use_a_pool(workers, expected):
+    assert transcription_service.service_uses_pool(workers) is expected
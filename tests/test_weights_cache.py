@@ -0,0 +1,54 @@
+"""
+Weights Cache - The Dungeon Scribe
+
+The conversion lock: a lock left by a dead process is broken at once, and a slow conversion
+keeps its lock fresh so waiters never break it while it is still running.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import weights_cache
+
+@pytest.fixture
+def fast_lock(monkeypatch):
+    monkeypatch.setattr(weights_cache, "LOCK_POLL_SECONDS", 0.01)
+    monkeypatch.setattr(weights_cache, "LOCK_HEARTBEAT_SECONDS", 0.05)
+    monkeypatch.setattr(weights_cache, "LOCK_STALE_SECONDS", 0.5)
+
+@pytest.mark.skipif(os.name == "nt", reason="owner check is POSIX-only")
+def test_lock_of_a_dead_process_is_broken(tmp_path, fast_lock, monkeypatch):
+    monkeypatch.setattr(weights_cache, "LOCK_STALE_SECONDS", 3600)
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    path = tmp_path / "base-abc.pt"
+    path.with_suffix(".lock").write_text(f"{socket.gethostname()} {dead.pid}")
+
+    with weights_cache.conversion_lock(path):
+        assert path.with_suffix(".lock").read_text() == f"{socket.gethostname()} {os.getpid()}"
+    assert not path.with_suffix(".lock").exists()
+
+def test_slow_conversion_keeps_its_lock(tmp_path, fast_lock):
+    path = tmp_path / "base-abc.pt"
+    events = []
+
+    def waiter():
+        with weights_cache.conversion_lock(path):
+            events.append("waiter")
+
+    with weights_cache.conversion_lock(path):
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        time.sleep(1.5)  # three times LOCK_STALE_SECONDS
+        events.append("converted")
+    thread.join()
+    assert events == ["converted", "waiter"]
@@ -10,36 +10,116 @@ Project: The Dungeon Scribe
 """
 
 import os
+import argparse
 import zipfile
 import tempfile
 import json
+import heapq
+import queue
+import threading
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import timedelta
-from pathlib import Path
 
-import torch
-import whisper
-from pydub import AudioSegment
-from pydub.silence import detect_nonsilent
-
-# === Environment Configuration ===
-# Paths and model settings are pulled from environment variables (set by the GUI script).
-zip_path = os.environ.get('CRAIG_ZIP')
-output_path = os.environ.get('TRANSCRIPT_OUTPUT')
-whisper_model = os.environ.get('WHISPER_MODEL', 'base')
-
-if not zip_path or not output_path:
-    raise ValueError("Missing required environment variables CRAIG_ZIP or TRANSCRIPT_OUTPUT.")
+# torch, whisper and the batched engine are imported where they are first needed, so importing
+# this module (the CLI, the transcription service, spawn workers before the model) stays fast.
+from craig_audio import (
+    AUDIO_EXTENSIONS,
+    SAMPLE_RATE,
+    TrackScan,
+    check_cancelled,
+    detect_first_onset,
+    hash_track_source,
+    iter_source_chunks,
+    pack_speech,
+    pipelined,
+    source_track_name,
+    speech_regions,
+    track_source_size,
+    zip_track_sources,
+)
+import telemetry
+import whisper_backends
+from dedupe_segments import DEFAULT_SIMILARITY, DEFAULT_TOLERANCE, dedupe_bleed
+from segment_io import segment_record_line, segments_path_for
+from transcription_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_MB, TranscriptionCache
 
+# === Configuration ===
 # Load speaker mapping from config.json (used to map Discord names to players/characters).
 CONFIG_FILE = "config.json"
-speaker_map = {}
-if os.path.exists(CONFIG_FILE):
-    with open(CONFIG_FILE, 'r') as f:
-        try:
-            config = json.load(f)
-            speaker_map = config.get("speaker_map", {})
-        except json.JSONDecodeError:
-            print("⚠️ Warning: Could not parse speaker_map from config.json")
+
+def load_config() -> dict:
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, 'r') as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                print("⚠️ Warning: Could not parse speaker_map from config.json")
+    return {}
+
+def load_settings(settings: dict = None):
+    """
+    (Re)read config.json, or apply an already loaded config dict.
+
+    Call this before transcribing; main() and the transcription service do so before each
+    job. Importing the module only installs the defaults.
+    """
+    global config, speaker_map, stream_zip, speech_gating, speech_pad, inference_batch_size
+    global transcription_workers, torch_threads_per_worker, decode_workers, decode_prefetch, decode_window
+    global whisper_backend, whisper_compute_type
+    global bleed_dedup, bleed_similarity, bleed_tolerance
+
+    config = load_config() if settings is None else settings
+    speaker_map = config.get("speaker_map", {})
+
+    # Stream tracks out of the zip through ffmpeg instead of extracting them to a temp dir.
+    stream_zip = config.get("stream_zip", True)
+
+    # Transcribe only the padded speech regions of each track instead of the full recording.
+    speech_gating = config.get("speech_gating", True)
+    speech_pad = config.get("speech_pad_seconds", 0.4)
+
+    # The inference engine and its precision (see whisper_backends.py).
+    whisper_backend = config.get("whisper_backend", whisper_backends.DEFAULT_BACKEND)
+    whisper_compute_type = config.get("whisper_compute_type", "auto")
+
+    # Speech windows, from any track, decoded per forward pass by the batched engine; 1 uses
+    # model.transcribe() per track. Either way the transcript does not depend on the workers.
+    # The batched engine drives openai-whisper itself, so other backends always use transcribe().
+    inference_batch_size = config.get("inference_batch_size", 8) if whisper_backend == "whisper" else 1
+
+    # Decoder threads preparing upcoming tracks (decode, onset, speech gating) while the model
+    # runs, and how many prepared tracks may wait for it; bounds memory on long sessions.
+    decode_workers = config.get("decode_workers", 2)
+    decode_prefetch = config.get("decode_prefetch_tracks", 2)
+
+    # Tracks are read once, in blocks, and never held whole; model.transcribe() gets the
+    # speech in windows of this many seconds.
+    decode_window = config.get("decode_window_seconds", 600)
+
+    # Parallel transcription: "auto" picks a worker count from the CPU cores and free RAM.
+    transcription_workers = config.get("transcription_workers", "auto")
+    torch_threads_per_worker = config.get("torch_threads_per_worker", 4)
+
+    # Drop sentences that bled into another player's mic and were transcribed on both tracks.
+    bleed_dedup = config.get("bleed_dedup", True)
+    bleed_similarity = config.get("bleed_similarity", DEFAULT_SIMILARITY)
+    bleed_tolerance = config.get("bleed_tolerance_seconds", DEFAULT_TOLERANCE)
+
+load_settings({})
+
+# Rough resident size of one loaded model plus a multi-hour 16 kHz track, in GB.
+MODEL_RAM_GB = {"tiny": 1.5, "base": 1.5, "small": 2.5, "medium": 6, "large": 11, "large-v3": 11}
+
+# Whisper samples at temperature > 0 when a window fails its thresholds. Seeding each track
+# makes the output independent of which process (or in which order) the track was run.
+TRACK_SEED = 0
+
+# Transcript lines buffered before each write; bounds memory while keeping writes large.
+WRITE_CHUNK_LINES = 256
+
+TRANSCRIBE_OPTIONS = {"condition_on_previous_text": False, "compression_ratio_threshold": 1.8}
 
 # === Utility Functions ===
 # Helper functions to extract audio, find files, format timestamps, and map speakers.
@@ -47,7 +127,7 @@ def extract_audio_from_zip(zip_path: str, extract_to: str):
     with zipfile.ZipFile(zip_path, 'r') as zip_ref:
         zip_ref.extractall(extract_to)
 
-def find_audio_files(folder: str, extensions=(".wav", ".mp3", ".ogg", ".m4a")) -> list[str]:
+def find_audio_files(folder: str, extensions=AUDIO_EXTENSIONS) -> list[str]:
     audio_files = []
     for root, _, files in os.walk(folder):
         for file in files:
@@ -66,67 +146,462 @@ def get_mapped_speaker_name(discord_name: str) -> str:
         return f"{player} ({character})" if character else player
     return discord_name
 
-def detect_audio_start(file_path, silence_thresh=-50, chunk_size=100):
-    audio = AudioSegment.from_file(file_path)
-    nonsilent_ranges = detect_nonsilent(audio, min_silence_len=chunk_size, silence_thresh=silence_thresh)
-    if nonsilent_ranges:
-        return nonsilent_ranges[0][0] / 1000  # milliseconds to seconds
-    return 0.0
-
-def transcribe_audio_files(audio_files: list[str], model_name: str = "base") -> list[str]:
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"Using Whisper model '{model_name}' on {device.upper()}.")
-
-    model = whisper.load_model(model_name, device=device)
-    all_segments = []
-
-    start_offsets = {}
-    for file in audio_files:
-        offset = detect_audio_start(file)
-        start_offsets[file] = offset
-
-    for file in audio_files:
-        discord_user = Path(file).stem
-        speaker = get_mapped_speaker_name(discord_user)
-        offset = start_offsets[file]
-        print(f"🔊 Transcribing {discord_user} as {speaker} (offset: {offset:.2f}s)...")
-
-        result = model.transcribe(
-            file,
-            condition_on_previous_text=False,
-            compression_ratio_threshold=1.8
-        )
+def detect_audio_start(audio, silence_thresh=-50, chunk_size=100):
+    # Same offsets as pydub's detect_nonsilent, but vectorized and stopping at the first onset.
+    return detect_first_onset(audio, silence_thresh=silence_thresh, min_silence_len=chunk_size)
 
+def track_regions(audio) -> list[tuple[float, float]]:
+    if speech_gating:
+        return speech_regions(audio, pad=speech_pad)
+    return [(0.0, len(audio) / SAMPLE_RATE)]
+
+# Whisper's per-segment confidence fields, carried through to the structured segment file.
+CONFIDENCE_FIELDS = ("avg_logprob", "no_speech_prob", "compression_ratio")
+
+def build_segments(discord_user: str, raw_segments: list[dict], offset: float) -> list[dict]:
+    speaker = get_mapped_speaker_name(discord_user)
+    segments = []
+    for seg in raw_segments:
+        adjusted_start = seg["start"] + offset
+        adjusted_end = seg["end"] + offset
+        segments.append({
+            "start": adjusted_start,
+            "end": adjusted_end,
+            "speaker": speaker,
+            "discord_user": discord_user,
+            "text": seg["text"].strip(),
+            **{field: seg.get(field) for field in CONFIDENCE_FIELDS},
+        })
+    return segments
+
+def announce_track(discord_user: str, offset: float):
+    speaker = get_mapped_speaker_name(discord_user)
+    print(f"🔊 Transcribing {discord_user} as {speaker} (offset: {offset:.2f}s)...")
+
+def prepare_track(discord_user: str, chunks) -> dict:
+    """
+    Everything done to a track before it reaches the model, without ever holding the whole
+    track or decoding it twice. `chunks` are its decoded blocks, read once by a TrackScan:
+    on a decoder thread as far as the onset, then lazily as the model asks for the track's
+    "windows" (30 seconds for the batched engine, decode_window_seconds for
+    model.transcribe()), with the speech regions found in the same read.
+    """
+    started = time.perf_counter()
+    scan = TrackScan(chunks, speech_gating, speech_pad)
+    offset = scan.find_onset()
+    if inference_batch_size > 1:
+        from batched_whisper import WINDOW_SECONDS as window
+    else:
+        window = decode_window
+
+    def windows():
+        yield from pack_speech(scan, window)
+        # The track has been read to its end; decode_seconds ran alongside the model.
+        telemetry.current().track(discord_user, audio_seconds=scan.seconds, decode_seconds=scan.decode_seconds)
+
+    telemetry.current().track(discord_user, prepare_seconds=time.perf_counter() - started)
+    return {
+        "discord_user": discord_user,
+        "offset": offset,
+        "scan": scan,
+        # One window is cut ahead on its own thread while the model works on the current one.
+        "windows": pipelined(windows(), ahead=1),
+    }
+
+def prepare_source(source) -> dict:
+    """Prepare a track source (a file, or a (zip_path, member) pair), reading it in blocks."""
+    return prepare_track(source_track_name(source), iter_source_chunks(source))
+
+def prepare_sources(sources: list, cancel=None):
+    """Prepare track sources on decoder threads, yielding prepared tracks in order."""
+    return pipelined(sources, prepare_source, decode_workers, decode_prefetch, cancel)
+
+def transcribe_track(model, track: dict):
+    """
+    Transcribe one prepared track with model.transcribe(), one window at a time. Yields each
+    window's raw segments, time-sorted and on the full track's timeline; track["position"]
+    is where the windows transcribed so far end on that timeline.
+    """
+    announce_track(track["discord_user"], track["offset"])
+    try:
+        import torch
+    except ImportError:
+        torch = None  # faster-whisper and the stand-in model (benchmarks/stub_backend.py) run without it
+    for audio, timeline in track.pop("windows"):
+        if not len(audio):
+            continue
+        if torch is not None:
+            torch.manual_seed(TRACK_SEED)
+        result = model.transcribe(audio, **TRANSCRIBE_OPTIONS)
+        track["position"] = timeline.to_original(len(audio) / SAMPLE_RATE, end=True)
+
+        raw_segments = []
         for seg in result["segments"]:
-            adjusted_start = seg["start"] + offset
-            adjusted_end = seg["end"] + offset
-            all_segments.append({
-                "start": adjusted_start,
-                "end": adjusted_end,
-                "speaker": speaker,
-                "text": seg["text"].strip()
+            raw_segments.append({
+                # Back onto the full track's timeline, so the offset means what it always has.
+                "start": timeline.to_original(seg["start"]),
+                "end": timeline.to_original(seg["end"], end=True),
+                "text": seg["text"],
+                **{field: seg.get(field) for field in CONFIDENCE_FIELDS},
             })
+        yield sorted(raw_segments, key=lambda s: s["start"])
+    if speech_gating:
+        print(f"   Speech gating kept {track['scan'].speech_fraction():.0%} of {track['discord_user']}'s track.")
+
+def iter_track_results(model, tracks, cancel=None):
+    """
+    Yield (index, offset, raw_segments, done) for prepared tracks (see prepare_track).
+
+    Each track's segments arrive as one or more time-ordered chunks; `done` marks the last.
+    Tracks are interleaved, so chunks from different tracks advance through the session
+    together and the k-way merge downstream can write the earliest segments early. The
+    `cancel` event is checked after every chunk, so a cancelled run stops at the next batch
+    (or the next window with model.transcribe()).
+    """
+    if inference_batch_size > 1:
+        from batched_whisper import transcribe_batched
+
+        print(f"Batching up to {inference_batch_size} speech windows per forward pass.")
+        offsets, names, started, counts = [], [], [], []
+
+        def keyed_tracks():
+            for index, track in enumerate(tracks):
+                announce_track(track["discord_user"], track["offset"])
+                offsets.append(track["offset"])
+                names.append(track["discord_user"])
+                started.append(time.perf_counter())
+                counts.append(0)
+                yield index, track.pop("windows")
+
+        threshold = TRANSCRIBE_OPTIONS["compression_ratio_threshold"]
+        batches = transcribe_batched(model.whisper_model, keyed_tracks(), inference_batch_size, threshold, model.fp16)
+        for index, raw_segments, done in batches:
+            counts[index] += len(raw_segments)
+            if done:
+                telemetry.current().track(names[index], transcribe_seconds=time.perf_counter() - started[index],
+                                          segments=counts[index])
+            yield index, offsets[index], raw_segments, done
+            check_cancelled(cancel)
+        return
+
+    # model.transcribe() takes one window at a time, always from the track that is furthest
+    # behind on the session's timeline. Nothing is merged before every track has started, so
+    # going track by track would hold all earlier tracks' segments until the last one began.
+    # Every window is seeded, so the order does not change the transcript.
+    behind = [(track["offset"], index, track, transcribe_track(model, track)) for index, track in enumerate(tracks)]
+    heapq.heapify(behind)
+    seconds, counts = {}, {}
+    while behind:
+        _, index, track, windows = behind[0]
+        started = time.perf_counter()
+        raw_segments = next(windows, None)
+        seconds[index] = seconds.get(index, 0.0) + time.perf_counter() - started
+        if raw_segments is None:
+            heapq.heappop(behind)
+            telemetry.current().track(track["discord_user"], transcribe_seconds=seconds[index],
+                                      segments=counts.get(index, 0))
+            yield index, track["offset"], [], True
+        else:
+            counts[index] = counts.get(index, 0) + len(raw_segments)
+            heapq.heapreplace(behind, (track["offset"] + track["position"], index, track, windows))
+            yield index, track["offset"], raw_segments, False
+        check_cancelled(cancel)
+
+def format_segment(seg: dict) -> str:
+    ts = f"[{format_timestamp(seg['start'])} --> {format_timestamp(seg['end'])}]"
+    return f"{ts} {seg['speaker']}: {seg['text']}"
+
+def merge_track_streams(streams):
+    """
+    k-way merge of per-track segment streams that are each already time-ordered.
+
+    heapq.merge breaks ties in stream order, so merging the tracks in name order gives
+    exactly what a stable sort of all segments would, without holding them all at once.
+    """
+    return heapq.merge(*streams, key=lambda s: s["start"])
+
+def dedupe_merged(segments):
+    """Run the merged stream through the cross-track bleed dedup when it is enabled."""
+    if not bleed_dedup:
+        yield from segments
+        return
+    stats = {}
+    yield from dedupe_bleed(segments, bleed_similarity, bleed_tolerance, stats=stats)
+    if stats.get("dropped"):
+        print(f"🔇 Dropped {stats['dropped']} segment(s) that bled in from another speaker's mic.")
 
-    all_segments.sort(key=lambda s: s["start"])
+def load_whisper_model(model_name: str, threads: int = None):
+    """Load the model with the configured backend; `threads` overrides whisper_threads."""
+    spec = whisper_backends.backend_spec(config if threads is None else {**config, "whisper_threads": threads})
+    print(f"Using Whisper model '{model_name}' ({whisper_backends.describe(spec)}).")
+    return whisper_backends.load_backend(model_name, spec)
 
-    formatted = []
-    for seg in all_segments:
-        ts = f"[{format_timestamp(seg['start'])} --> {format_timestamp(seg['end'])}]"
-        formatted.append(f"{ts} {seg['speaker']}: {seg['text']}")
+def transcribe_audio_files(audio_files: list[str], model_name: str = "base", model=None, cancel=None) -> list[str]:
+    return _transcribe_prepared(prepare_sources(audio_files, cancel), model_name, model, cancel)
 
-    return formatted
-    
-def write_transcript(transcriptions, output_path):
+def _transcribe_prepared(tracks, model_name: str, model, cancel) -> list[str]:
+    if model is None:
+        model = load_whisper_model(model_name)
+    names, results = [], {}
+
+    def named_tracks():
+        for track in tracks:
+            names.append(track["discord_user"])
+            yield track
+
+    for index, offset, raw_segments, _ in iter_track_results(model, named_tracks(), cancel):
+        results.setdefault(index, []).extend(build_segments(names[index], raw_segments, offset))
+    merged = merge_track_streams(results[i] for i in range(len(names)))
+    return [format_segment(seg) for seg in dedupe_merged(merged)]
+
+# === Parallel Transcription ===
+# Each worker process loads the model once and transcribes whole tracks, sending segments back
+# in chunks as they are decoded. Results are merged in track-name order, so the transcript
+# matches the serial run.
+_worker_model = None
+
+def available_ram_gb() -> float | None:
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / 1024 ** 3
+    except (AttributeError, ValueError, OSError):
+        return None  # not available on this platform (e.g. Windows)
+
+def resolve_worker_count(setting, model_name: str, threads_per_worker: int, n_tracks: int) -> int:
+    if isinstance(setting, int) and setting > 0:
+        return min(setting, n_tracks)
+
+    if whisper_backends.backend_spec(config)["device"] == "cuda":
+        return 1  # one GPU; extra processes would only contend for it
+
+    workers = max(1, (os.cpu_count() or 1) // max(1, threads_per_worker))
+    ram_gb = available_ram_gb()
+    if ram_gb is not None:
+        workers = min(workers, max(1, int(ram_gb // MODEL_RAM_GB.get(model_name, 6))))
+    return max(1, min(workers, n_tracks))
+
+def _init_worker(model_name: str, torch_threads: int, settings: dict):
+    global _worker_model
+    load_settings(settings)  # the parent's config, so every worker transcribes the same way
+    _worker_model = load_whisper_model(model_name, threads=torch_threads)
+
+def _transcribe_source(index: int, source, chunks, cancel) -> dict:
+    metrics = telemetry.start_run()  # this task's figures, returned to the parent
+    track = prepare_source(source)
+    for _, offset, raw_segments, done in iter_track_results(_worker_model, [track], cancel):
+        chunks.put((index, offset, raw_segments, done))
+    return metrics.to_dict()
+
+def iter_parallel_results(sources: list, model_name: str = "base", workers: int = 2, torch_threads: int = 4,
+                          cancel=None):
+    """
+    Transcribe track sources across worker processes, longest first.
+
+    Yields (index, offset, raw_segments, done) chunks as the workers produce them. Setting
+    `cancel` drops the queued tracks and stops the running ones at their next chunk.
+    """
+    print(f"Transcribing {len(sources)} track(s) with {workers} worker(s), {torch_threads} thread(s) each.")
+    order = sorted(range(len(sources)), key=lambda i: track_source_size(sources[i]), reverse=True)
+
+    # spawn, not fork: forking a process that has already imported torch is not safe.
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager, ProcessPoolExecutor(
+            max_workers=workers, mp_context=context,
+            initializer=_init_worker, initargs=(model_name, torch_threads, config)) as pool:
+        chunks = manager.Queue()
+        stop = manager.Event()
+        futures = [pool.submit(_transcribe_source, i, sources[i], chunks, stop) for i in order]
+
+        pending = len(sources)
+        while pending:
+            if cancel is not None and cancel.is_set():
+                stop.set()
+                for future in futures:
+                    future.cancel()
+                check_cancelled(cancel)
+            try:
+                index, offset, raw_segments, done = chunks.get(timeout=0.5)
+            except queue.Empty:
+                for future in futures:
+                    if future.done() and future.exception():
+                        raise future.exception()
+                continue
+            pending -= done
+            yield index, offset, raw_segments, done
+
+        for future in futures:
+            telemetry.current().merge(future.result())
+
+# === Cached Transcription ===
+def open_cache() -> TranscriptionCache | None:
+    if not config.get("transcription_cache", True):
+        return None
+    return TranscriptionCache(
+        config.get("transcription_cache_dir", DEFAULT_CACHE_DIR),
+        config.get("transcription_cache_max_mb", DEFAULT_MAX_MB),
+    )
+
+def cache_params() -> dict:
+    """Every setting that changes a track's segments, for the cache key."""
+    return {
+        **TRANSCRIBE_OPTIONS,
+        "engine": "batched" if inference_batch_size > 1 else "transcribe",
+        "speech_gating": speech_gating,
+        "speech_pad": speech_pad if speech_gating else None,
+        "fields": list(CONFIDENCE_FIELDS),
+        # model.transcribe() sees one window at a time; the batched engine's windows are fixed.
+        **({"window_seconds": decode_window} if inference_batch_size <= 1 else {}),
+        "window_split": "quietest",  # long regions end at a pause (craig_audio.quietest_cut)
+        # Other engines and int8 weights give different text; float16/float32 are as before.
+        **({"backend": whisper_backend, "compute_type": whisper_compute_type}
+           if whisper_backend != whisper_backends.DEFAULT_BACKEND or whisper_compute_type == "int8" else {}),
+    }
+
+_TRACK_END = object()
+
+def _track_stream(chunks: queue.Queue):
+    while True:
+        item = chunks.get()
+        if item is _TRACK_END:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield from item
+
+def transcribe_sources(sources: list, model_name: str = "base", model=None, cancel=None):
+    """
+    Transcribe track sources (extracted files or (zip_path, member) pairs) into time-sorted segments.
+
+    A generator: each track feeds its own stream as chunks are decoded, and the streams are
+    k-way merged, so the earliest segments come out as soon as every track has moved past
+    them. Tracks already in the transcription cache are not decoded or transcribed again,
+    and each new track is cached the moment it finishes, so an interrupted run resumes
+    where it died.
+
+    In this process, decoder threads open the tracks, and each track cuts its next window
+    while the model transcribes the current one; the model moves between tracks so that
+    they all advance through the session together (see iter_track_results). Setting the
+    `cancel` event stops the run at the next chunk and raises PipelineCancelled; finished
+    tracks stay cached.
+    """
+    names = [source_track_name(source) for source in sources]
+    streams = [queue.Queue() for _ in sources]
+    keys = [None] * len(sources)
+    todo = []
+
+    cache = open_cache()
+    params = cache_params() if cache is not None else None
+    for i, source in enumerate(sources):
+        if cache is not None:
+            keys[i] = cache.make_key(hash_track_source(source), model_name, params)
+            entry = cache.get(keys[i])
+            if entry is not None:
+                print(f"🗃️ {names[i]}: using cached transcription.")
+                streams[i].put(build_segments(names[i], entry["segments"], entry["offset"]))
+                streams[i].put(_TRACK_END)
+                continue
+        todo.append(i)
+
+    def produce():
+        nonlocal model
+        finished = set()
+        partial = {}  # index -> raw segments so far, written to the cache once the track is done
+        try:
+            todo_sources = [sources[i] for i in todo]
+            if model is not None:
+                workers = 1  # a preloaded model (the transcription service) stays in this process
+            else:
+                workers = resolve_worker_count(transcription_workers, model_name, torch_threads_per_worker, len(todo))
+
+            if workers > 1:
+                track_results = iter_parallel_results(todo_sources, model_name, workers, torch_threads_per_worker, cancel)
+            else:
+                if model is None:
+                    model = load_whisper_model(model_name)
+                track_results = iter_track_results(model, prepare_sources(todo_sources, cancel), cancel)
+
+            for j, offset, raw_segments, done in track_results:
+                i = todo[j]
+                streams[i].put(build_segments(names[i], raw_segments, offset))
+                if cache is not None:
+                    partial.setdefault(i, []).extend(raw_segments)
+                if done:
+                    if cache is not None:
+                        cache.put(keys[i], {"offset": offset, "segments": partial.pop(i)})
+                    streams[i].put(_TRACK_END)
+                    finished.add(i)
+        except Exception as e:
+            for i in todo:
+                if i not in finished:
+                    streams[i].put(e)
+
+    producer = None
+    if todo:
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+
+    yield from dedupe_merged(merge_track_streams(_track_stream(chunks) for chunks in streams))
+
+    if producer is not None:
+        producer.join()
+    if cache is not None:
+        print(cache.report())
+
+def segment_record(seg: dict) -> dict:
+    """Structured record for a merged segment: the Discord key as speaker, the mapped name as name."""
+    return {**seg, "speaker": seg["discord_user"], "name": seg["speaker"]}
+
+def tee_transcript_stream(segments, output_path, chunk_lines: int = WRITE_CHUNK_LINES):
+    """
+    Write merged segments to the transcript and its structured segment file as they arrive,
+    yielding each one on to the next stage.
+
+    Lines are flushed in bounded chunks, so the finished prefix of a long session is on disk
+    while later tracks are still being transcribed.
+    """
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    with open(output_path, 'w', encoding='utf-8') as f:
-        for line in transcriptions:
-            f.write(line + "\n")
+    segments_path = segments_path_for(output_path)
+    count = 0
+    with open(output_path, 'w', encoding='utf-8') as text_file, open(segments_path, 'w', encoding='utf-8') as segments_file:
+        lines, records = [], []
+        for seg in segments:
+            lines.append(format_segment(seg) + "\n")
+            records.append(segment_record_line(segment_record(seg)))
+            yield seg
+            if len(lines) >= chunk_lines:
+                text_file.writelines(lines)
+                segments_file.writelines(records)
+                text_file.flush()
+                segments_file.flush()
+                count += len(lines)
+                lines, records = [], []
+        text_file.writelines(lines)
+        segments_file.writelines(records)
+        count += len(lines)
     print(f"✅ Transcript written to: {output_path}")
+    print(f"✅ {count} structured segment(s) written to: {segments_path}")
+
+def write_transcript_stream(segments, output_path, chunk_lines: int = WRITE_CHUNK_LINES):
+    for _ in tee_transcript_stream(segments, output_path, chunk_lines):
+        pass
 
 # === Main Execution ===
 # Transcribe all audio files found in the .zip archive and write to a transcript file.
-def main():
-    print(f"Transcribing {zip_path} to {output_path} using Whisper model: {whisper_model}")
+def iter_zip_segments(zip_path: str, model_name: str = "base", model=None, cancel=None):
+    """
+    Yield the merged, time-sorted segments of a Craig zip as they are transcribed.
+
+    Passing an already loaded `model` (as the transcription service does) keeps the run in
+    this process; otherwise tracks may be spread over worker processes. Setting the `cancel`
+    event stops the run with PipelineCancelled.
+    """
+    if stream_zip:
+        sources = zip_track_sources(zip_path)
+        if not sources:
+            raise FileNotFoundError("No audio files found in the zip archive.")
+
+        print(f"Found {len(sources)} audio file(s). Streaming from zip...")
+        yield from transcribe_sources(sources, model_name=model_name, model=model, cancel=cancel)
+        return
 
     with tempfile.TemporaryDirectory() as tmpdir:
         extract_audio_from_zip(zip_path, tmpdir)
@@ -136,8 +611,25 @@ def main():
             raise FileNotFoundError("No audio files found in the zip archive.")
 
         print(f"Found {len(audio_files)} audio file(s).")
-        transcriptions = transcribe_audio_files(audio_files, model_name=whisper_model)
-        write_transcript(transcriptions, output_path=output_path)
+        yield from transcribe_sources(audio_files, model_name=model_name, model=model, cancel=cancel)
+
+def transcribe_zip(zip_path: str, output_path: str, model_name: str = "base", model=None, cancel=None):
+    """Transcribe a Craig zip to `output_path`; see iter_zip_segments."""
+    print(f"Transcribing {zip_path} to {output_path} using Whisper model: {model_name}")
+    write_transcript_stream(iter_zip_segments(zip_path, model_name=model_name, model=model, cancel=cancel), output_path)
+
+def main(argv=None):
+    # Paths and model settings default to environment variables (set by the GUI script).
+    parser = argparse.ArgumentParser(description="Transcribe a Craig bot multitrack zip with Whisper.")
+    parser.add_argument("zip", nargs="?", default=os.environ.get('CRAIG_ZIP'), help="Craig .zip (default: $CRAIG_ZIP).")
+    parser.add_argument("output", nargs="?", default=os.environ.get('TRANSCRIPT_OUTPUT'), help="Transcript path (default: $TRANSCRIPT_OUTPUT).")
+    parser.add_argument("--model", default=os.environ.get('WHISPER_MODEL', 'base'), help="Whisper model (default: $WHISPER_MODEL or base).")
+    args = parser.parse_args(argv)
+
+    if not args.zip or not args.output:
+        raise ValueError("Missing required environment variables CRAIG_ZIP or TRANSCRIPT_OUTPUT.")
+    load_settings()
+    transcribe_zip(args.zip, args.output, model_name=args.model)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,87 @@
+"""
+Transcription Cache - The Dungeon Scribe
+
+A content-addressed disk cache of per-track transcription results. Each entry is keyed on a
+hash of the track's encoded audio plus the Whisper model name and the transcribe parameters,
+and holds the track's start offset and its segments on the track's own timeline. Speaker
+names are applied afterwards, so editing the speaker map never invalidates the cache.
+
+Tracks are stored as soon as they finish, so an interrupted session resumes from the first
+unfinished track and a re-run with unchanged audio skips transcription entirely. The cache
+is capped in size and evicts the least recently used entries first.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = str(Path.home() / ".dungeonscribe" / "transcription_cache")
+DEFAULT_MAX_MB = 500
+
+class TranscriptionCache:
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_mb: float = DEFAULT_MAX_MB):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def make_key(audio_hash: str, model_name: str, params: dict) -> str:
+        """Cache key for one track: audio content + model + every parameter that changes the output."""
+        payload = json.dumps({"audio": audio_hash, "model": model_name, "params": params}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> dict | None:
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            return None
+        os.utime(path)  # mark as recently used for eviction
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: dict):
+        path = self._path(key)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)  # atomic, so a killed run never leaves a half-written entry
+        self.evict()
+
+    def _entries(self) -> list[os.DirEntry]:
+        return [e for e in os.scandir(self.cache_dir) if e.name.endswith(".json")]
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits under its size cap."""
+        entries = sorted(self._entries(), key=lambda e: e.stat().st_mtime)
+        total = sum(e.stat().st_size for e in entries)
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            total -= entry.stat().st_size
+            os.remove(entry.path)
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "size_mb": sum(e.stat().st_size for e in entries) / 1024 / 1024,
+        }
+
+    def report(self) -> str:
+        s = self.stats()
+        return (f"🗃️ Transcription cache: {s['hits']} hit(s), {s['misses']} miss(es), "
+                f"{s['entries']} entr{'y' if s['entries'] == 1 else 'ies'} ({s['size_mb']:.1f} MB)")
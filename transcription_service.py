@@ -0,0 +1,427 @@
+"""
+Transcription Service - The Dungeon Scribe
+
+A long-lived local daemon that keeps Whisper models loaded between runs. Importing torch and
+whisper and calling whisper.load_model() costs 20-60 s for the medium/large models; the
+service pays that once and then serves jobs from the GUI or the command line over a local
+socket, streaming progress back as each line is printed.
+
+Models are kept in a small LRU keyed by (model name, backend, device, compute type). After
+an idle timeout the service exits, releasing the memory; clients start it again on demand.
+
+Each job carries the submitting run's config (speaker map, backend, speech gating, windows),
+so a service started from another directory or before a config edit still transcribes the
+way the run asked; a job whose backend or precision differs gets its own model from the LRU.
+The service runs one model in-process unless `transcription_workers` is an explicit count
+above 1, in which case the job is spread over worker processes like a local run.
+
+Usage:
+    python transcription_service.py serve
+    python transcription_service.py submit <craig.zip> <transcript.txt> [--model medium]
+    python transcription_service.py status
+    python transcription_service.py cancel
+    python transcription_service.py stop
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+CONFIG_FILE = "config.json"
+DEFAULT_SOCKET = str(Path.home() / ".dungeonscribe" / "transcriber.sock")
+DEFAULT_TCP_PORT = 8765
+DEFAULT_IDLE_TIMEOUT = 15 * 60  # seconds
+DEFAULT_MAX_MODELS = 2
+STARTUP_TIMEOUT = 30  # seconds a client waits for an auto-started service
+
+# AF_UNIX is not available on every Windows Python; fall back to loopback TCP there.
+USE_UNIX_SOCKET = hasattr(socket, "AF_UNIX")
+
+# Config keys a job never needs and that are not sent to the service with it.
+PRIVATE_KEYS = ("openai_api_key",)
+
+def read_config() -> dict:
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, 'r') as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                print("⚠️ Warning: Could not parse config.json")
+    return {}
+
+def load_service_config() -> dict:
+    config = read_config()
+    return {
+        "socket": config.get("service_socket", DEFAULT_SOCKET),
+        "port": config.get("service_port", DEFAULT_TCP_PORT),
+        "idle_timeout": config.get("service_idle_timeout", DEFAULT_IDLE_TIMEOUT),
+        "max_models": config.get("service_max_models", DEFAULT_MAX_MODELS),
+    }
+
+# === Model Cache ===
+class ModelCache:
+    """LRU of loaded Whisper models keyed by (model name, backend, device, compute type)."""
+
+    def __init__(self, max_models: int = DEFAULT_MAX_MODELS):
+        self.max_models = max(1, max_models)
+        self.models = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, model_name: str, config: dict):
+        from whisper_backends import backend_spec, describe, load_backend
+
+        spec = backend_spec(config)
+        key = (model_name, spec["backend"], spec["device"], spec["compute_type"])
+        with self.lock:
+            if key in self.models:
+                self.models.move_to_end(key)
+                print(f"♻️ Using warm Whisper model '{model_name}' ({describe(spec)}).")
+                return self.models[key]
+
+            while len(self.models) >= self.max_models:
+                evicted, _ = self.models.popitem(last=False)
+                print(f"🧹 Evicting Whisper model '{evicted[0]}' ({evicted[1]}, {evicted[3]}, {evicted[2]}).")
+                if evicted[1] == "whisper" and evicted[2] == "cuda":
+                    import torch
+                    torch.cuda.empty_cache()
+
+            print(f"Loading Whisper model '{model_name}' ({describe(spec)})...")
+            model = load_backend(model_name, spec)
+            self.models[key] = model
+            return model
+
+    def keys(self) -> list[str]:
+        with self.lock:
+            return [f"{name} ({backend}, {compute_type}, {device})" for name, backend, device, compute_type in self.models]
+
+# === Server ===
+class _ProgressWriter:
+    """File-like object that forwards printed lines to the client as progress events."""
+
+    def __init__(self, send):
+        self.send = send
+        self.buffer = ""
+
+    def write(self, text: str):
+        self.buffer += text
+        while "\n" in self.buffer:
+            line, self.buffer = self.buffer.split("\n", 1)
+            if line.strip():
+                self.send({"event": "progress", "message": line})
+        return len(text)
+
+    def flush(self):
+        pass
+
+class _JobOutput:
+    """
+    The service's sys.stdout: what the running job prints goes to its client, everything
+    else to the console.
+
+    The service's own threads (the main thread, the idle watcher, every request handler)
+    name their output with own(); the job's handler names its client's writer. Threads
+    that never did were started by the running job (decoder threads, the merge producer),
+    so their lines belong to it too. Only one job runs at a time.
+    """
+
+    def __init__(self, console):
+        self.console = console
+        self.job = None  # the running job's writer
+        self.local = threading.local()
+
+    def own(self, writer=None):
+        """Send this thread's output to `writer`, or to the console."""
+        self.local.writer = writer
+
+    def _target(self):
+        if hasattr(self.local, "writer"):
+            return self.local.writer or self.console
+        return self.job or self.console
+
+    def write(self, text: str):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    def send(self, message: dict):
+        self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def handle(self):
+        service = self.server.service
+        service.output.own()
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError:
+            self.send({"event": "error", "message": "Malformed request"})
+            return
+
+        service.touch()
+        op = request.get("op")
+        if op == "ping":
+            self.send({"event": "pong", "models": service.models.keys(), "busy": service.job_lock.locked()})
+        elif op == "cancel":
+            # A job's own id cancels it, even while it waits for the lock; no id means the running job.
+            cancel = service.jobs.get(request.get("job") or service.running)
+            if cancel is not None:
+                cancel.set()
+            self.send({"event": "cancelling", "busy": cancel is not None})
+        elif op == "stop":
+            self.send({"event": "stopping"})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        elif op == "transcribe":
+            self.transcribe(service, request)
+        else:
+            self.send({"event": "error", "message": f"Unknown op: {op}"})
+
+    def transcribe(self, service, request: dict):
+        from craig_audio import PipelineCancelled
+
+        job = request.get("job") or uuid.uuid4().hex
+        cancel = service.jobs[job] = threading.Event()
+        try:
+            # One job at a time: a second job would only compete for the same cores or GPU.
+            if service.job_lock.locked():
+                self.send({"event": "progress", "message": "⏳ Waiting for the current job to finish..."})
+            with service.job_lock:
+                if cancel.is_set():
+                    self.send({"event": "cancelled"})  # cancelled while it was waiting
+                    return
+                writer = _ProgressWriter(self.send)
+                service.running, service.output.job = job, writer
+                service.output.own(writer)
+                try:
+                    import telemetry
+                    import transcribe_audacity_zip as transcriber
+
+                    metrics = telemetry.start_run()
+                    # The submitting run's settings; a client that sent none gets config.json as it is now.
+                    transcriber.load_settings(request.get("config"))
+                    model = None
+                    if not service_uses_pool(transcriber.transcription_workers):
+                        model = service.models.get(request["model"], transcriber.config)
+                    transcriber.transcribe_zip(request["zip"], request["output"], request["model"], model=model,
+                                               cancel=cancel)
+                    self.send({"event": "done", "output": request["output"], "metrics": metrics.finish().to_dict()})
+                except PipelineCancelled:
+                    self.send({"event": "cancelled"})
+                except Exception as e:
+                    self.send({"event": "error", "message": str(e)})
+                finally:
+                    service.running, service.output.job = None, None
+                    service.output.own()
+                    service.touch()
+        finally:
+            del service.jobs[job]
+
+def service_uses_pool(workers) -> bool:
+    """An explicit worker count above 1 runs the job on worker processes instead of the warm model."""
+    return isinstance(workers, int) and not isinstance(workers, bool) and workers > 1
+
+if USE_UNIX_SOCKET:
+    class _Server(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+else:
+    class _Server(socketserver.ThreadingTCPServer):
+        daemon_threads = True
+        allow_reuse_address = True
+
+class TranscriptionService:
+    def __init__(self, settings: dict):
+        self.settings = settings
+        self.models = ModelCache(settings["max_models"])
+        self.job_lock = threading.Lock()
+        self.jobs = {}      # job id -> its cancel event, for running and waiting jobs
+        self.running = None  # id of the job holding job_lock
+        self.output = _JobOutput(sys.stdout)
+        self.last_activity = time.monotonic()
+
+    def touch(self):
+        self.last_activity = time.monotonic()
+
+    def _watch_idle(self, server):
+        self.output.own()
+        timeout = self.settings["idle_timeout"]
+        while True:
+            time.sleep(min(30, max(1, timeout / 4)))
+            if not self.job_lock.locked() and time.monotonic() - self.last_activity > timeout:
+                print(f"💤 Idle for {timeout}s, shutting down and releasing models.")
+                server.shutdown()
+                return
+
+    def serve(self):
+        if USE_UNIX_SOCKET:
+            address = self.settings["socket"]
+            os.makedirs(os.path.dirname(address), exist_ok=True)
+            if os.path.exists(address):
+                os.remove(address)  # stale socket from a previous run
+        else:
+            address = ("127.0.0.1", self.settings["port"])
+
+        with _Server(address, _JobHandler) as server:
+            server.service = self
+            self.output.own()
+            sys.stdout = self.output  # routes each job's output to its own client
+            if self.settings["idle_timeout"]:
+                threading.Thread(target=self._watch_idle, args=(server,), daemon=True).start()
+            print(f"🎧 Transcription service listening on {address}")
+            try:
+                server.serve_forever()
+            finally:
+                sys.stdout = self.output.console
+                if USE_UNIX_SOCKET and os.path.exists(address):
+                    os.remove(address)
+
+# === Client ===
+def _connect(settings: dict) -> socket.socket:
+    if USE_UNIX_SOCKET:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(settings["socket"])
+    else:
+        sock = socket.create_connection(("127.0.0.1", settings["port"]))
+    return sock
+
+def start_service():
+    """Launch the service as a detached background process."""
+    kwargs = {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL, "stdin": subprocess.DEVNULL}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    script = os.path.abspath(__file__)
+    subprocess.Popen([sys.executable, script, "serve"], cwd=os.getcwd(), **kwargs)
+
+def request(message: dict, on_event=None, autostart: bool = True) -> dict:
+    """
+    Send one request to the service and return its final event.
+
+    Progress events are passed to `on_event` as they arrive. If no service is running and
+    `autostart` is set, one is started in the background first.
+    """
+    settings = load_service_config()
+    try:
+        sock = _connect(settings)
+    except OSError:
+        if not autostart:
+            raise
+        start_service()
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            time.sleep(0.25)
+            try:
+                sock = _connect(settings)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("Transcription service did not start.")
+
+    with sock, sock.makefile("rwb") as stream:
+        stream.write((json.dumps(message) + "\n").encode("utf-8"))
+        stream.flush()
+        final = {}
+        for line in stream:
+            event = json.loads(line)
+            if event.get("event") == "progress":
+                if on_event:
+                    on_event(event)
+                continue
+            final = event
+            break
+    return final
+
+def submit_job(zip_path: str, output_path: str, model_name: str, on_progress=print, cancel=None,
+               config: dict = None) -> str:
+    """
+    Transcribe a Craig zip through the service, reporting progress lines as they arrive.
+
+    The job runs with `config` (default: this directory's config.json), whatever the service
+    itself was started with. Setting the `cancel` event asks the service to stop this job, or to drop it if it is still
+    waiting for another one; PipelineCancelled is raised once it has.
+    """
+    finished = threading.Event()
+    job = uuid.uuid4().hex
+
+    def forward_cancel():
+        while not finished.wait(0.2):
+            if cancel.is_set():
+                request({"op": "cancel", "job": job}, autostart=False)
+                return
+
+    if cancel is not None:
+        threading.Thread(target=forward_cancel, daemon=True).start()
+    job_config = {key: value for key, value in (read_config() if config is None else config).items()
+                  if key not in PRIVATE_KEYS}
+    try:
+        final = request(
+            {"op": "transcribe", "job": job, "zip": os.path.abspath(zip_path), "output": os.path.abspath(output_path),
+             "model": model_name, "config": job_config},
+            on_event=lambda event: on_progress(event["message"]),
+        )
+    finally:
+        finished.set()
+    if final.get("event") == "cancelled":
+        from craig_audio import PipelineCancelled
+        raise PipelineCancelled("Transcription cancelled.")
+    if final.get("event") != "done":
+        raise RuntimeError(final.get("message", "Transcription service closed the connection."))
+    if "metrics" in final:
+        import telemetry
+        telemetry.current().merge(final["metrics"], process="service")
+    return final["output"]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm-model Whisper transcription service.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("serve", help="Run the service in the foreground.")
+    submit = sub.add_parser("submit", help="Transcribe a Craig zip through the service.")
+    submit.add_argument("zip")
+    submit.add_argument("output")
+    submit.add_argument("--model", default=os.environ.get("WHISPER_MODEL", "base"))
+    sub.add_parser("status", help="Show whether the service is running and which models are warm.")
+    sub.add_parser("cancel", help="Cancel the job the service is running.")
+    sub.add_parser("stop", help="Stop a running service.")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        TranscriptionService(load_service_config()).serve()
+    elif args.command == "submit":
+        output = submit_job(args.zip, args.output, args.model)
+        print(f"✅ Transcript written to: {output}")
+    elif args.command == "status":
+        try:
+            reply = request({"op": "ping"}, autostart=False)
+            print(f"🎧 Running. Warm models: {', '.join(reply['models']) or 'none'}. Busy: {reply['busy']}")
+        except OSError:
+            print("Service is not running.")
+    elif args.command == "cancel":
+        try:
+            reply = request({"op": "cancel"}, autostart=False)
+            print("Cancelling the running job." if reply.get("busy") else "No job is running.")
+        except OSError:
+            print("Service is not running.")
+    elif args.command == "stop":
+        try:
+            request({"op": "stop"}, autostart=False)
+            print("Service stopped.")
+        except OSError:
+            print("Service is not running.")
+
+if __name__ == "__main__":
+    main()
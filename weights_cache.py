@@ -0,0 +1,196 @@
+"""
+Weights Cache - The Dungeon Scribe
+
+A local cache of openai-whisper models that are ready to memory-map. whisper.load_model()
+unpickles the whole checkpoint, converts its float16 weights to float32 and copies them into
+a freshly initialised model. That takes seconds to a minute for the larger models, and every
+worker process ends up with its own private copy of the weights.
+
+This cache does that work once per model. The converted float32 weights go into an
+uncompressed torch file in ~/.dungeonscribe/whisper_weights. Later loads memory-map the file
+and build the model around the mapped tensors without copying them. A load is then mostly
+page-cache reads, and every process on the host shares the same read-only pages. Entries are
+twice the size of the float16 checkpoints, and a model's old entry is deleted when its
+checkpoint changes. With int8 compute the quantized Linear weights are still built per process;
+the rest of the model stays mapped.
+
+Entries are keyed on the model name and the checkpoint's SHA-256 (taken from whisper's
+download URL), or on the path, size and modification time of a local checkpoint file. If an
+entry no longer loads, e.g. after a whisper upgrade, it is converted again. Memory-mapped
+loading needs torch 2.1 or later; older versions load the checkpoint as before.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import hashlib
+import os
+import pickle
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict
+from pathlib import Path
+
+DEFAULT_WEIGHTS_DIR = str(Path.home() / ".dungeonscribe" / "whisper_weights")
+LOCK_POLL_SECONDS = 1.0
+LOCK_HEARTBEAT_SECONDS = 30  # the converting process touches its lock this often
+LOCK_STALE_SECONDS = 120     # a lock untouched for this long was left by a killed process
+
+# === Entries ===
+def checkpoint_id(model_name: str) -> str:
+    """Identifies the checkpoint behind `model_name`, so a new checkpoint gets a new entry."""
+    import whisper
+
+    if model_name in whisper._MODELS:
+        return whisper._MODELS[model_name].split("/")[-2][:16]  # .../models/<sha256>/<name>.pt
+    stat = os.stat(model_name)
+    source = f"{os.path.abspath(model_name)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+
+def entry_label(model_name: str) -> str:
+    """A model name ("medium.en") as is, or a local checkpoint's file name without its suffix."""
+    import whisper
+    return model_name if model_name in whisper._MODELS else Path(model_name).stem
+
+def weights_path(model_name: str, cache_dir: str = DEFAULT_WEIGHTS_DIR) -> Path:
+    return Path(cache_dir) / f"{entry_label(model_name)}-{checkpoint_id(model_name)}.pt"
+
+def mmap_supported() -> bool:
+    import torch
+    return tuple(int(part) for part in torch.__version__.split(".")[:2]) >= (2, 1)
+
+def _lock_owner_gone(lock: Path) -> bool:
+    """True when the lock was taken by a process on this host that is no longer running."""
+    try:
+        host, pid = lock.read_text().split()
+        pid = int(pid)
+    except (OSError, ValueError):
+        return False  # gone already, or its owner has not written its name yet
+    if host != socket.gethostname() or os.name == "nt":
+        return False  # os.kill(pid, 0) would terminate the process on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass  # running, under another user
+    return False
+
+@contextmanager
+def conversion_lock(path: Path):
+    """
+    Hold `path`'s lock, so parallel workers starting together convert a model only once.
+
+    The lock names its owner (host and PID) and is touched every LOCK_HEARTBEAT_SECONDS
+    while held, however long the conversion takes. Waiters break it when its owner on this
+    host has died, or when it has not been touched for LOCK_STALE_SECONDS (an owner on
+    another host sharing the cache folder).
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lock = path.with_suffix(".lock")
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if _lock_owner_gone(lock) or time.time() - lock.stat().st_mtime > LOCK_STALE_SECONDS:
+                    lock.unlink()
+                    continue
+            except FileNotFoundError:
+                continue
+            time.sleep(LOCK_POLL_SECONDS)
+    os.write(fd, f"{socket.gethostname()} {os.getpid()}".encode("utf-8"))
+
+    released = threading.Event()
+
+    def heartbeat():
+        while not released.wait(LOCK_HEARTBEAT_SECONDS):
+            try:
+                os.utime(lock)
+            except OSError:
+                return
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+    try:
+        yield
+    finally:
+        released.set()
+        os.close(fd)
+        lock.unlink(missing_ok=True)
+
+# === Conversion ===
+def convert(model_name: str, path: Path):
+    """Load `model_name` the usual way and write its float32 weights to `path`; returns the model."""
+    import torch
+    import whisper
+
+    print(f"📦 Converting Whisper model '{model_name}' for fast loading (once per model)...")
+    model = whisper.load_model(model_name, device="cpu")
+    state = model.state_dict()
+    # Non-persistent buffers (the decoder mask, the alignment heads) are not in the state dict.
+    buffers = {name: buffer for name, buffer in model.named_buffers() if name not in state}
+    entry = {
+        "dims": asdict(model.dims),
+        "state": state,
+        "buffers": {name: buffer.to_dense() if buffer.is_sparse else buffer for name, buffer in buffers.items()},
+        "sparse": [name for name, buffer in buffers.items() if buffer.is_sparse],
+    }
+
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    torch.save(entry, tmp_path)
+    os.replace(tmp_path, path)  # atomic, so a killed conversion never leaves a half-written entry
+    for old in path.parent.glob("*.pt"):
+        if old != path and old.stem.rpartition("-")[0] == entry_label(model_name):
+            old.unlink(missing_ok=True)  # the entry of an earlier checkpoint of this model
+    return model
+
+def _empty_model(dims: dict):
+    """A Whisper model with unallocated weights, ready for load_state_dict(assign=True)."""
+    import torch
+    from whisper.model import ModelDimensions, Whisper
+
+    try:
+        with torch.device("meta"):
+            return Whisper(ModelDimensions(**dims))
+    except (NotImplementedError, RuntimeError):
+        return Whisper(ModelDimensions(**dims))  # torch builds without sparse meta tensors
+
+def load_mapped(path: Path):
+    """Build a CPU model whose weights are memory-mapped from `path`, without copying them."""
+    import torch
+
+    entry = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+    model = _empty_model(entry["dims"])
+    model.load_state_dict(entry["state"], assign=True)
+    for name, buffer in entry["buffers"].items():
+        module_name, _, attr = name.rpartition(".")
+        buffer = buffer.to_sparse() if name in entry["sparse"] else buffer
+        model.get_submodule(module_name).register_buffer(attr, buffer, persistent=False)
+    if any(tensor.is_meta for tensor in (*model.parameters(), *model.buffers())):
+        raise ValueError("some weights are missing")
+    return model.eval()
+
+# === Loading ===
+def load_model(model_name: str, device: str = "cpu", cache_dir: str = DEFAULT_WEIGHTS_DIR):
+    """whisper.load_model(), through the weights cache."""
+    import whisper
+
+    if not mmap_supported():
+        print("⚠️ Memory-mapped Whisper weights need torch 2.1 or later; loading the checkpoint directly.")
+        return whisper.load_model(model_name, device=device)
+
+    path = weights_path(model_name, cache_dir)
+    model = None
+    if path.exists():
+        try:
+            model = load_mapped(path)
+        except (RuntimeError, KeyError, TypeError, ValueError, pickle.UnpicklingError) as e:
+            print(f"⚠️ Cached weights {path.name} are unusable ({e}); converting them again.")
+            path.unlink(missing_ok=True)
+    if model is None:
+        with conversion_lock(path):
+            model = load_mapped(path) if path.exists() else convert(model_name, path)
+    return model.to(device)  # a no-op on the CPU; a GPU gets its own copy
@@ -0,0 +1,166 @@
+"""
+Whisper Backends - The Dungeon Scribe
+
+The speech-to-text engine behind transcription, chosen in config.json:
+
+    "whisper_backend":      "whisper" (openai-whisper on torch, the default)
+                            or "faster-whisper" (CTranslate2)
+    "whisper_device":       "auto", "cpu" or "cuda"
+    "whisper_compute_type": "auto", "float32", "float16" or "int8" (faster-whisper also takes
+                            its other types, e.g. "int8_float16")
+    "whisper_threads":      CPU threads for inference; 0 keeps the library default
+    "whisper_weights_cache": load openai-whisper models from memory-mapped, pre-converted
+                            weights (weights_cache.py); true by default
+    "whisper_weights_dir":  where those are kept ("" for ~/.dungeonscribe/whisper_weights)
+
+"auto" picks float16 on a GPU. On a CPU it picks float32 for openai-whisper (what it has
+always done) and int8 for faster-whisper. openai-whisper can also run int8 on a CPU: every
+Linear layer is dynamically quantized with torch, trading a little accuracy for speed, and
+CTranslate2's int8 kernels go further. `python -m benchmarks.backends` measures speed
+against word error rate for any set of these on your own hardware.
+
+Every backend returns an object with the same transcribe(audio, **options) call as a loaded
+openai-whisper model, returning {"segments": [...]} with start, end, text and the confidence
+fields. The batched engine (batched_whisper.py) drives openai-whisper's internals directly,
+so it is only available with that backend.
+
+Author: Jeremy Witchel
+Project: The Dungeon Scribe
+"""
+
+import weights_cache
+
+DEFAULT_BACKEND = "whisper"
+BACKENDS = ("whisper", "faster-whisper")
+WHISPER_COMPUTE_TYPES = ("float32", "float16", "int8")
+
+# === Settings ===
+def detect_device(backend: str) -> str:
+    if backend == "faster-whisper":
+        import ctranslate2
+        return "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+def default_compute_type(backend: str, device: str) -> str:
+    if device == "cuda":
+        return "float16"
+    return "int8" if backend == "faster-whisper" else "float32"
+
+def backend_spec(config: dict) -> dict:
+    """The backend settings of a config, with "auto" device and compute type resolved."""
+    backend = config.get("whisper_backend", DEFAULT_BACKEND)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown whisper_backend '{backend}'; choose one of {', '.join(BACKENDS)}.")
+    device = config.get("whisper_device", "auto")
+    if device == "auto":
+        device = detect_device(backend)
+    compute_type = config.get("whisper_compute_type", "auto")
+    if compute_type == "auto":
+        compute_type = default_compute_type(backend, device)
+
+    if backend == "whisper":
+        if compute_type not in WHISPER_COMPUTE_TYPES:
+            raise ValueError(f"openai-whisper supports compute types {', '.join(WHISPER_COMPUTE_TYPES)}, not '{compute_type}'.")
+        if compute_type == "int8" and device != "cpu":
+            raise ValueError("int8 with openai-whisper is dynamic quantization, which runs on the CPU only.")
+        if compute_type == "float16" and device != "cuda":
+            raise ValueError("float16 needs a GPU; use float32 or int8 on the CPU.")
+    return {
+        "backend": backend,
+        "device": device,
+        "compute_type": compute_type,
+        "threads": config.get("whisper_threads", 0),
+        "weights_dir": (config.get("whisper_weights_dir") or weights_cache.DEFAULT_WEIGHTS_DIR)
+                       if config.get("whisper_weights_cache", True) else None,
+    }
+
+def describe(spec: dict) -> str:
+    return f"{spec['backend']}, {spec['compute_type']} on {spec['device'].upper()}"
+
+# === openai-whisper ===
+class OpenAIWhisperBackend:
+    """A loaded openai-whisper model; `whisper_model` is the model itself, for the batched engine."""
+
+    def __init__(self, model, spec: dict):
+        self.whisper_model = model
+        self.spec = spec
+
+    @property
+    def fp16(self) -> bool:
+        return self.spec["compute_type"] == "float16"
+
+    def transcribe(self, audio, **options) -> dict:
+        return self.whisper_model.transcribe(audio, fp16=self.fp16, **options)
+
+def quantize_int8(model):
+    """Dynamically quantize every Linear layer of a CPU model to int8 weights."""
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+
+    if "fbgemm" not in torch.backends.quantized.supported_engines:
+        torch.backends.quantized.engine = "qnnpack"  # ARM CPUs
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear):
+            # whisper's Linear subclass only casts its weights to the input dtype, a no-op in
+            # float32; quantize_dynamic only swaps modules that are exactly nn.Linear.
+            module.__class__ = torch.nn.Linear
+    # In place: a copy would also duplicate the memory-mapped float weights into private memory.
+    return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+def _load_openai_whisper(model_name: str, spec: dict) -> OpenAIWhisperBackend:
+    import torch
+    import whisper
+
+    if spec["threads"]:
+        torch.set_num_threads(spec["threads"])
+    if spec["weights_dir"]:
+        model = weights_cache.load_model(model_name, spec["device"], spec["weights_dir"])
+    else:
+        model = whisper.load_model(model_name, device=spec["device"])
+    if spec["compute_type"] == "int8":
+        model = quantize_int8(model)
+    return OpenAIWhisperBackend(model, spec)
+
+# === faster-whisper ===
+class FasterWhisperBackend:
+    """A CTranslate2 model behind faster-whisper, answering like openai-whisper's transcribe()."""
+
+    whisper_model = None  # no openai-whisper internals for the batched engine
+
+    def __init__(self, model, spec: dict):
+        self.model = model
+        self.spec = spec
+
+    def transcribe(self, audio, **options) -> dict:
+        # openai-whisper decodes greedily unless asked for a beam; faster-whisper defaults to 5.
+        options = {"beam_size": 1, **options}
+        segments, _ = self.model.transcribe(audio, **options)
+        return {"segments": [
+            {
+                "start": seg.start,
+                "end": seg.end,
+                "text": seg.text,
+                "avg_logprob": seg.avg_logprob,
+                "no_speech_prob": seg.no_speech_prob,
+                "compression_ratio": seg.compression_ratio,
+            }
+            for seg in segments
+        ]}
+
+def _load_faster_whisper(model_name: str, spec: dict) -> FasterWhisperBackend:
+    try:
+        from faster_whisper import WhisperModel
+    except ImportError as e:
+        raise ImportError("whisper_backend 'faster-whisper' needs the faster-whisper package (pip install faster-whisper).") from e
+
+    model = WhisperModel(model_name, device=spec["device"], compute_type=spec["compute_type"],
+                         cpu_threads=spec["threads"] or 0)
+    return FasterWhisperBackend(model, spec)
+
+# === Loading ===
+def load_backend(model_name: str, spec: dict):
+    """Load `model_name` with the backend described by backend_spec()."""
+    if spec["backend"] == "faster-whisper":
+        return _load_faster_whisper(model_name, spec)
+    return _load_openai_whisper(model_name, spec)